@@ -1,4 +1,5 @@
 import threading
+import multiprocessing
 import sys
 import os
 
@@ -6,10 +7,11 @@ from argparse import ArgumentParser
 from RankedDST.ui.window import create_window, get_window
 from RankedDST.ui.updates import show_popup
 
-from RankedDST.networking.proxy import start_proxy_server
+from RankedDST.networking.proxy import start_proxy
 from RankedDST.networking.socket import connect_websocket, disconnect_websocket
 
 from RankedDST.dedicated_server.world_cleanup import clean_old_files
+from RankedDST.dedicated_server.world_launcher import adopt_running_clusters
 
 from RankedDST.tools.state import load_initial_state, set_developing
 from RankedDST.tools.logger import logger
@@ -25,14 +27,37 @@ def init():
         if window: 
             break
     
+    state_loaded = True
     try:
         load_initial_state()
+    except Exception as e:
+        # The proxy still starts, on the default runtime, so the website can reach the app to fix the config
+        logger.error(f"❌ Failed to load the initial state: {e}")
+        show_popup(window=window, popup_msg=f"A critical error occurred: {e}", button_msg="Seriously?")
+        state_loaded = False
+
+    # Started once the config selected the runtime it runs on. Without it the dedicated server cannot reach the
+    # backend, but the app can still connect and manage its clusters.
+    try:
+        start_proxy(host="127.0.0.1", port=3035)
+    except OSError as e:
+        logger.error(f"❌ Failed to start the proxy: {e}")
+        show_popup(window=window, popup_msg=f"Could not start the proxy on port 3035: {e}", button_msg="Okay")
+
+    if not state_loaded:
+        return
+
+    try:
+        adopt_running_clusters(window=window)
         clean_old_files()
         connect_websocket()
     except Exception as e:
         show_popup(window=window, popup_msg=f"A critical error occurred: {e}", button_msg="Seriously?")
 
 if __name__ == "__main__":
+    # Archiving worker processes re-run the frozen executable
+    multiprocessing.freeze_support()
+
     if getattr(sys, "frozen", False):
         exe_name = os.path.basename(sys.executable).lower()
 
@@ -63,16 +88,6 @@ if __name__ == "__main__":
         set_developing(developing=True)
 
     create_kill_on_close_job()
-    proxy_thread = threading.Thread(
-        target=start_proxy_server,
-        kwargs={
-            "host": "127.0.0.1",
-            "port": 3035,
-        },
-        daemon=True,
-    )
-    proxy_thread.start()
-
     init_thread = threading.Thread(
         target=init,
         daemon=True
@@ -0,0 +1,334 @@
+"""
+RankedDST/dedicated_server/archive_index.py
+
+This module keeps a persistent index of the archives in `Past Ranked Matches`, stored in
+`Past Ranked Matches/archive_index.json`.
+
+Every archive is recorded with its match number, backend, size, creation time and checksum when it is written, and
+the index also counts how many stored matches use each blob of the archive store. Listing, restoring and retention
+then work from the index alone: pruning only touches the archives it deletes and the blobs nothing else uses.
+
+The directory is only scanned when the index does not exist yet, such as on the first run after updating.
+"""
+import json
+import os
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from RankedDST.tools.atomic_file import atomic_write_json, hash_file
+from RankedDST.tools.logger import logger
+import RankedDST.dedicated_server.world_archive as world_archive
+
+INDEX_FILE_NAME = "archive_index.json"
+DEFAULT_MAX_COUNT = 5
+
+
+@dataclass
+class ArchiveEntry:
+    """
+    A single archived match.
+    """
+    name: str
+    match_number: int
+    backend: str
+    path: str # relative to the past matches directory
+    size: int # bytes. For stored matches, the bytes it added to the store.
+    created_at: float
+    checksum: str
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Which archives to keep. Archives are kept newest first (by match number) until any limit is reached. The newest
+    archive is always kept.
+    """
+    max_count: int | None = DEFAULT_MAX_COUNT
+    max_bytes: int | None = None
+    max_age: float | None = None # seconds
+
+
+retention_policy = RetentionPolicy()
+
+def set_retention_policy(
+    max_count: int | None = DEFAULT_MAX_COUNT,
+    max_bytes: int | None = None,
+    max_age: float | None = None,
+) -> None:
+    """
+    Sets the retention policy applied after every archiving job.
+    """
+    for limit in [max_count, max_bytes, max_age]:
+        if limit is not None and limit <= 0:
+            raise ValueError(f"Retention limits must be positive, got {limit}")
+
+    global retention_policy
+    retention_policy = RetentionPolicy(max_count=max_count, max_bytes=max_bytes, max_age=max_age)
+
+
+class ArchiveIndex:
+    """
+    The archives of a past matches directory and the reference counts of its archive store blobs.
+    """
+    def __init__(self, past_dir: Path, entries: dict[str, ArchiveEntry], blob_refs: dict[str, int]):
+        self.past_dir = past_dir
+        self.entries = entries
+        self.blob_refs = blob_refs
+        self.lock = threading.RLock()
+
+    @property
+    def path(self) -> Path:
+        return self.past_dir / INDEX_FILE_NAME
+
+    @property
+    def store_dir(self) -> Path:
+        return self.past_dir / world_archive.STORE_DIR_NAME
+
+    @classmethod
+    def load(cls, past_dir: str | Path, match_number_of: callable) -> "ArchiveIndex":
+        """
+        Reads the index of the directory. Rebuilds it from the directory if it does not exist or cannot be read.
+
+        Parameters
+        ----------
+        past_dir: str | Path
+            The past matches directory
+        match_number_of: callable
+            Returns the match number of an archive name, or None if the name is not an archive
+        """
+        past_dir = Path(past_dir)
+        try:
+            with open(past_dir / INDEX_FILE_NAME, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            entries = {name: ArchiveEntry(**entry) for name, entry in data["archives"].items()}
+            return cls(past_dir=past_dir, entries=entries, blob_refs=dict(data.get("blobs", {})))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Rebuilding the unreadable archive index of '{past_dir}': {e}")
+
+        index = cls.rebuild(past_dir, match_number_of)
+        index.save()
+        return index
+
+    @classmethod
+    def rebuild(cls, past_dir: Path, match_number_of: callable) -> "ArchiveIndex":
+        """
+        Builds the index by scanning the directory and the archive store.
+        """
+        index = cls(past_dir=past_dir, entries={}, blob_refs={})
+
+        for zip_fp in past_dir.glob("*.zip"):
+            match_number = match_number_of(zip_fp.stem)
+            if match_number is None:
+                continue
+            stat = zip_fp.stat()
+            index.entries[zip_fp.stem] = ArchiveEntry(
+                name=zip_fp.stem, match_number=match_number, backend="zip", path=zip_fp.name,
+                size=stat.st_size, created_at=stat.st_mtime, checksum=hash_file(zip_fp),
+            )
+
+        stored = [(match_number_of(name), name) for name in world_archive.list_stored(index.store_dir)]
+        for match_number, name in sorted((n, name) for n, name in stored if n is not None):
+            try:
+                manifest = world_archive.read_manifest(index.store_dir, name)
+                blobs = world_archive.manifest_blobs(index.store_dir, name)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable stored match {name}: {e}")
+                continue
+
+            # A match is charged for the blobs no earlier match used
+            size = sum(world_archive.blob_size(index.store_dir, b) for b in blobs if b not in index.blob_refs)
+            manifest_path = f"{world_archive.STORE_DIR_NAME}/manifests/{name}.json"
+            index.add(
+                name=name,
+                match_number=match_number,
+                result={
+                    "backend": "store", "path": manifest_path, "size": size,
+                    "checksum": hash_file(past_dir / manifest_path), "blobs": blobs,
+                },
+                created_at=manifest.get("created_at", time.time()),
+            )
+
+        logger.info(f"Indexed {len(index.entries)} archived matches in '{past_dir}'")
+        return index
+
+    def save(self) -> None:
+        with self.lock:
+            atomic_write_json(self.path, {
+                "archives": {name: asdict(entry) for name, entry in self.entries.items()},
+                "blobs": self.blob_refs,
+            }, indent=None)
+
+    def contains(self, name: str) -> bool:
+        return name in self.entries
+
+    def add(self, name: str, match_number: int, result: dict, created_at: float | None = None) -> ArchiveEntry:
+        """
+        Records an archive written by `world_archive.archive_directory`. Call `save` afterwards.
+        """
+        entry = ArchiveEntry(
+            name=name,
+            match_number=match_number,
+            backend=result["backend"],
+            path=result["path"],
+            size=result["size"],
+            created_at=created_at if created_at is not None else time.time(),
+            checksum=result["checksum"],
+        )
+        with self.lock:
+            self.entries[name] = entry
+            for digest in result.get("blobs", []):
+                self.blob_refs[digest] = self.blob_refs.get(digest, 0) + 1
+        return entry
+
+    def _stored_blobs(self, name: str) -> list[str]:
+        try:
+            return world_archive.manifest_blobs(self.store_dir, name)
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def _release_blobs(self, blobs: list[str]) -> list[str]:
+        orphaned: list[str] = []
+        for digest in blobs:
+            refs = self.blob_refs.get(digest, 0) - 1
+            if refs > 0:
+                self.blob_refs[digest] = refs
+            else:
+                self.blob_refs.pop(digest, None)
+                orphaned.append(digest)
+        return orphaned
+
+    def remove(self, name: str) -> int:
+        """
+        Deletes an archive along with the blobs only it used. Call `save` afterwards.
+
+        Returns
+        -------
+        freed: int
+            The bytes deleted
+        """
+        with self.lock:
+            entry = self.entries.pop(name, None)
+            if entry is None:
+                return 0
+
+            if entry.backend == "store":
+                orphaned = self._release_blobs(self._stored_blobs(name))
+                return world_archive.delete_stored(self.store_dir, name, orphaned_blobs=orphaned)
+
+            fp = self.past_dir / entry.path
+            try:
+                freed = fp.stat().st_size
+                fp.unlink()
+            except FileNotFoundError:
+                freed = 0
+            return freed
+
+    def list_entries(self) -> list[ArchiveEntry]:
+        """
+        Returns every archive, newest first.
+        """
+        with self.lock:
+            return sorted(self.entries.values(), key=lambda entry: entry.match_number, reverse=True)
+
+    def total_size(self) -> int:
+        with self.lock:
+            return sum(entry.size for entry in self.entries.values())
+
+    def select_expired(self, policy: RetentionPolicy, now: float | None = None) -> list[ArchiveEntry]:
+        """
+        Returns the archives the policy does not keep.
+        """
+        now = now if now is not None else time.time()
+        expired: list[ArchiveEntry] = []
+        kept_bytes = 0
+        for i, entry in enumerate(self.list_entries()):
+            if i == 0:
+                kept_bytes += entry.size
+                continue
+
+            over_count = policy.max_count is not None and i >= policy.max_count
+            over_bytes = policy.max_bytes is not None and kept_bytes + entry.size > policy.max_bytes
+            over_age = policy.max_age is not None and now - entry.created_at > policy.max_age
+            if over_count or over_bytes or over_age:
+                expired.append(entry)
+            else:
+                kept_bytes += entry.size
+        return expired
+
+    def apply_retention(self, policy: RetentionPolicy | None = None) -> list[ArchiveEntry]:
+        """
+        Deletes the archives the policy does not keep and saves the index.
+
+        Returns
+        -------
+        removed: list[ArchiveEntry]
+            The deleted archives
+        """
+        policy = policy if policy is not None else retention_policy
+        with self.lock:
+            expired = self.select_expired(policy)
+            freed = 0
+            for entry in expired:
+                logger.info(f"Deleting old archive {entry.name}")
+                freed += self.remove(entry.name)
+            if expired:
+                self.save()
+                logger.info(f"Freed {freed / (1024 * 1024):.1f} MB of old archives")
+        return expired
+
+    def verify(self, name: str) -> bool:
+        """
+        Whether the archive on disk still matches the checksum it was recorded with.
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return False
+        try:
+            return hash_file(self.past_dir / entry.path) == entry.checksum
+        except OSError:
+            return False
+
+    def restore(self, name: str, dst: str | Path) -> Path:
+        """
+        Extracts an archived match folder to `dst`.
+
+        Returns
+        -------
+        dst: Path
+            The extracted match folder
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            raise ValueError(f"No archive named '{name}'")
+        if not self.verify(name):
+            raise ValueError(f"The archive of '{name}' does not match its checksum")
+
+        dst = Path(dst)
+        if entry.backend == "store":
+            return world_archive.extract_stored(self.store_dir, name, dst)
+
+        with zipfile.ZipFile(self.past_dir / entry.path, "r") as zf:
+            zf.extractall(dst)
+        return dst
+
+
+_index_cache: dict[Path, ArchiveIndex] = {}
+_index_lock = threading.Lock()
+
+def get_archive_index(past_dir: str | Path, match_number_of: callable) -> ArchiveIndex:
+    """
+    Returns the index of the past matches directory, loading it once per run of the app.
+    """
+    past_dir = Path(past_dir)
+    with _index_lock:
+        index = _index_cache.get(past_dir)
+        if index is None:
+            os.makedirs(past_dir, exist_ok=True)
+            index = ArchiveIndex.load(past_dir, match_number_of)
+            _index_cache[past_dir] = index
+        return index
@@ -0,0 +1,249 @@
+"""
+RankedDST/dedicated_server/launch_timeline.py
+
+This module records how long each phase of a world launch takes, from receiving `generate_world` to both shards
+being ready. Every launch produces one timeline per match which is appended to `~/ranked_dst/launch_history.jsonl`
+so world-ready times can be compared across DST updates and hardware. The history is trimmed to its most recent
+timelines once it grows past `MAX_HISTORY_BYTES`.
+
+Shard phases are keyed as `<Shard>:<phase>`, such as `Master:sim_paused`.
+"""
+import json
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+
+from RankedDST.tools.config import get_data_dir
+from RankedDST.tools.atomic_file import atomic_write_text
+from RankedDST.tools.logger import logger
+
+HISTORY_FILE_NAME = "launch_history.jsonl"
+MAX_HISTORY_ENTRIES = 500
+MAX_HISTORY_BYTES = 4 * 1024 * 1024
+
+PhaseGenerateWorld = "generate_world"
+PhaseClusterWritten = "cluster_written"
+PhaseModsReady = "mods_ready"
+PhaseSpawned = "spawned"
+PhaseModDownloadStarted = "mod_download_started"
+PhaseModDownloadFinished = "mod_download_finished"
+PhaseWorldgenStarted = "worldgen_started"
+PhaseWorldgenFinished = "worldgen_finished"
+PhaseSimPaused = "sim_paused"
+PhaseWorldReady = "world_ready"
+
+# Shard output line substrings that mark a phase. Only the first matching line counts.
+SHARD_LOG_MARKERS: list[tuple[str, str]] = [
+    ("DownloadServerMods", PhaseModDownloadStarted),
+    ("FinishDownloadingServerMods", PhaseModDownloadFinished),
+    ("Generating world", PhaseWorldgenStarted),
+    ("Serializing world", PhaseWorldgenFinished),
+    ("Sim paused", PhaseSimPaused),
+]
+
+
+class LaunchTimeline:
+    """
+    The timestamps of a single world launch. Offsets are seconds since `generate_world` was received.
+    """
+    def __init__(self, match_id: str, dedi_path: str | None = None):
+        self.match_id = str(match_id)
+        self.dedi_path = dedi_path
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.phases: dict[str, float] = {PhaseGenerateWorld: 0.0}
+        self.outcome: str | None = None
+        self.lock = threading.Lock()
+
+    def mark(self, phase: str, shard: str | None = None) -> None:
+        """
+        Records the current time for the phase. Phases are only recorded the first time they are marked.
+        """
+        key = f"{shard}:{phase}" if shard else phase
+        with self.lock:
+            if key in self.phases or self.outcome is not None:
+                return
+            self.phases[key] = round(time.perf_counter() - self._start, 3)
+
+    def mark_shard_line(self, shard: str, line: str) -> None:
+        """
+        Marks any phase the shard output line indicates.
+        """
+        for marker, phase in SHARD_LOG_MARKERS:
+            if marker in line:
+                self.mark(phase=phase, shard=shard)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "match_id": self.match_id,
+                "started_at": self.started_at,
+                "outcome": self.outcome,
+                "dst_version": _read_dst_version(self.dedi_path),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "phases": dict(sorted(self.phases.items(), key=lambda item: item[1])),
+            }
+
+    def report(self) -> str:
+        """
+        Returns a readable breakdown of the launch with the time spent between consecutive phases.
+        """
+        data = self.to_dict()
+        lines = [f"Launch timeline for match {self.match_id} ({data['outcome']}):"]
+        previous = 0.0
+        for phase, offset in data["phases"].items():
+            lines.append(f"\t{offset:8.2f}s (+{offset - previous:6.2f}s) {phase}")
+            previous = offset
+        return "\n".join(lines)
+
+
+def _read_dst_version(dedi_path: str | None) -> str | None:
+    if not dedi_path:
+        return None
+
+    version_fp = Path(dedi_path) / "version.txt"
+    try:
+        return version_fp.read_text().strip()
+    except OSError:
+        return None
+
+
+def get_history_path() -> Path:
+    return Path(get_data_dir()) / HISTORY_FILE_NAME
+
+
+_timelines: dict[str, LaunchTimeline] = {}
+_timelines_lock = threading.Lock()
+
+def start_timeline(match_id: str, dedi_path: str | None = None) -> LaunchTimeline:
+    """
+    Starts the timeline for a match launch, replacing any unfinished timeline of the same match.
+    """
+    timeline = LaunchTimeline(match_id=match_id, dedi_path=dedi_path)
+    with _timelines_lock:
+        _timelines[timeline.match_id] = timeline
+    return timeline
+
+def get_timeline(match_id: str) -> LaunchTimeline | None:
+    with _timelines_lock:
+        return _timelines.get(str(match_id))
+
+def finish_timeline(match_id: str, outcome: str) -> LaunchTimeline | None:
+    """
+    Ends the timeline of a match, logs its report and appends it to the launch history.
+
+    Parameters
+    ----------
+    match_id: str
+        The match whose launch ended
+    outcome: str
+        How the launch ended, such as `'ready', 'failed' or 'stopped'`
+
+    Returns
+    -------
+    timeline: LaunchTimeline | None
+        The finished timeline. None if the match had no running timeline.
+    """
+    with _timelines_lock:
+        timeline = _timelines.pop(str(match_id), None)
+
+    if timeline is None:
+        return None
+
+    if outcome == "ready":
+        timeline.mark(PhaseWorldReady)
+    with timeline.lock:
+        timeline.outcome = outcome
+
+    logger.info(timeline.report())
+    try:
+        _append_history(timeline.to_dict())
+    except OSError as e:
+        logger.warning(f"Failed to save the launch timeline: {e}")
+
+    return timeline
+
+
+def _append_history(entry: dict) -> None:
+    """
+    Appends one timeline to the history file. The file is only rewritten once it grows past `MAX_HISTORY_BYTES`.
+    """
+    history_fp = get_history_path()
+    with open(history_fp, "a", encoding="utf-8") as file:
+        file.write(json.dumps(entry) + "\n")
+
+    if history_fp.stat().st_size > MAX_HISTORY_BYTES:
+        _trim_history(history_fp)
+
+
+def _trim_history(history_fp: Path) -> None:
+    """
+    Keeps the most recent `MAX_HISTORY_ENTRIES` timelines that fit in half of `MAX_HISTORY_BYTES`, so the file is
+    trimmed again only after many more launches.
+    """
+    kept: list[str] = []
+    kept_bytes = 0
+    for entry in reversed(load_launch_history(limit=MAX_HISTORY_ENTRIES)):
+        line = json.dumps(entry) + "\n"
+        kept_bytes += len(line.encode("utf-8"))
+        if kept and kept_bytes > MAX_HISTORY_BYTES // 2:
+            break
+        kept.append(line)
+
+    atomic_write_text(history_fp, "".join(reversed(kept)))
+
+
+def load_launch_history(limit: int | None = None) -> list[dict]:
+    """
+    Reads the saved launch timelines, oldest first.
+
+    Parameters
+    ----------
+    limit: int | None (default None)
+        If provided, only the most recent `limit` timelines are returned.
+    """
+    history_fp = get_history_path()
+    if not history_fp.exists():
+        return []
+
+    entries: list[dict] = []
+    with open(history_fp, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+    if limit is not None:
+        entries = entries[-limit:]
+    return entries
+
+
+def summarize_launch_history() -> dict[str, dict[str, float]]:
+    """
+    Summarizes the successful launches in the history by DST version.
+
+    Returns
+    -------
+    summary: dict[str, dict[str, float]]
+        The median offset in seconds of every phase, keyed by DST version and then by phase.
+    """
+    offsets: dict[str, dict[str, list[float]]] = {}
+    for entry in load_launch_history():
+        if entry.get("outcome") != "ready":
+            continue
+
+        version = str(entry.get("dst_version"))
+        for phase, offset in entry.get("phases", {}).items():
+            offsets.setdefault(version, {}).setdefault(phase, []).append(offset)
+
+    summary: dict[str, dict[str, float]] = {}
+    for version, phases in offsets.items():
+        summary[version] = {}
+        for phase, values in phases.items():
+            values.sort()
+            summary[version][phase] = values[len(values) // 2]
+    return summary
@@ -0,0 +1,269 @@
+"""
+RankedDST/dedicated_server/mod_cache.py
+
+This module downloads workshop mods ahead of a match so the shards do not have to while the world generates.
+
+The prefetch runs the nullrenderer with `-only_update_server_mods`, which downloads every mod in the mod setup file
+into `<dedi_path>/ugc_mods` and exits. The installed version of each mod is read from the workshop manifest
+(`appworkshop_322330.acf`) and recorded in `~/ranked_dst/mod_cache.json`. The shards are only launched with
+`-skip_update_server_mods` when a prefetch of every mod of the match succeeded within the last `CACHE_MAX_AGE` seconds
+and the installed versions are still the ones it recorded. Otherwise a mod may have been updated on the Workshop
+since, so the shards update the mods themselves.
+
+The binary is a parameter everywhere so the prefetch can be run against a stand-in executable.
+"""
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from RankedDST.tools.config import get_data_dir
+from RankedDST.tools.atomic_file import atomic_write_json
+from RankedDST.tools.logger import logger, server_logger
+from RankedDST.tools.path_checker import get_nullrender_path
+from RankedDST.tools.job_object import spawn_process
+from RankedDST.dedicated_server.mod_setup import add_mods, clean_mod_ids
+
+DST_APP_ID = "322330"
+UGC_DIR_NAME = "ugc_mods"
+MOD_CACHE_FILE_NAME = "mod_cache.json"
+PREFETCH_TIMEOUT = 15 * 60
+CACHE_MAX_AGE = 30 * 60 # seconds a successful prefetch is trusted to hold the latest version of its mods
+
+_VDF_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([{}])')
+
+_prefetch_lock = threading.Lock()
+
+
+@dataclass
+class CachedMod:
+    """
+    The installed state of a single workshop mod.
+    """
+    mod_id: str
+    installed: bool
+    location: str | None
+    manifest: str | None # workshop manifest id of the installed version
+    time_updated: int | None
+    size: int | None
+
+
+def get_ugc_path(dedi_path: str | Path) -> Path:
+    return Path(dedi_path) / UGC_DIR_NAME
+
+
+def _parse_vdf(text: str) -> dict:
+    """
+    Parses Valve's KeyValues text format (used by .acf files) into nested dictionaries.
+    """
+    root: dict = {}
+    stack = [root]
+    key: str | None = None
+
+    for m in _VDF_TOKEN_RE.finditer(text):
+        string, brace = m.groups()
+        if brace == "{":
+            child: dict = {}
+            stack[-1][key] = child
+            stack.append(child)
+            key = None
+        elif brace == "}":
+            if len(stack) > 1:
+                stack.pop()
+            key = None
+        elif key is None:
+            key = string
+        else:
+            stack[-1][key] = string
+            key = None
+    return root
+
+
+def read_installed_mods(dedi_path: str | Path) -> dict[str, dict]:
+    """
+    Reads the installed workshop items from the dedicated server's workshop manifest.
+
+    Returns
+    -------
+    installed: dict[str, dict]
+        The `WorkshopItemsInstalled` entries keyed by mod id. Empty if the manifest does not exist.
+    """
+    acf_fp = get_ugc_path(dedi_path) / f"appworkshop_{DST_APP_ID}.acf"
+    try:
+        text = acf_fp.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return {}
+
+    app = _parse_vdf(text).get("AppWorkshop", {})
+    installed = app.get("WorkshopItemsInstalled", {})
+    return installed if isinstance(installed, dict) else {}
+
+
+def scan_mod_cache(dedi_path: str | Path, mod_ids: list[str]) -> dict[str, CachedMod]:
+    """
+    Finds the installed version and location of each mod.
+    """
+    installed = read_installed_mods(dedi_path)
+    content_dir = get_ugc_path(dedi_path) / "content" / DST_APP_ID
+
+    def to_int(value) -> int | None:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    cache: dict[str, CachedMod] = {}
+    for mod_id in mod_ids:
+        mod_id = str(mod_id).strip()
+        entry = installed.get(mod_id, {})
+        location = content_dir / mod_id
+        present = bool(entry) and location.is_dir()
+        cache[mod_id] = CachedMod(
+            mod_id=mod_id,
+            installed=present,
+            location=str(location) if present else None,
+            manifest=entry.get("manifest"),
+            time_updated=to_int(entry.get("timeupdated")),
+            size=to_int(entry.get("size")),
+        )
+    return cache
+
+
+def load_cache_record() -> dict:
+    """
+    Reads the record of the last prefetch. Empty if there is none.
+    """
+    try:
+        with open(Path(get_data_dir()) / MOD_CACHE_FILE_NAME, "r", encoding="utf-8") as file:
+            record = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return record if isinstance(record, dict) else {}
+
+
+def is_cache_warm(
+    dedi_path: str | Path,
+    mod_ids: list[str],
+    max_age: float = CACHE_MAX_AGE,
+    now: float | None = None,
+) -> bool:
+    """
+    Whether the mods can be launched without updating them: no prefetch is running, the last prefetch of the
+    dedicated server included every mod, finished with exit code 0 less than `max_age` seconds ago, and the installed
+    version of each mod is still the one it recorded.
+    """
+    if _prefetch_lock.locked():
+        return False
+
+    record = load_cache_record()
+    now = now if now is not None else time.time()
+    prefetched_at = record.get("prefetched_at")
+    if record.get("returncode") != 0 or record.get("dedi_path") != str(dedi_path):
+        return False
+    if not isinstance(prefetched_at, (int, float)) or now - prefetched_at > max_age:
+        return False
+
+    recorded = record.get("mods") or {}
+    for mod_id, mod in scan_mod_cache(dedi_path, mod_ids).items():
+        entry = recorded.get(mod_id)
+        if not mod.installed or not isinstance(entry, dict) or entry.get("manifest") != mod.manifest:
+            return False
+    return True
+
+
+def _save_cache_record(
+    cache: dict[str, CachedMod], dedi_path: str, returncode: int | None, duration: float
+) -> None:
+    record = {
+        "prefetched_at": time.time(),
+        "dedi_path": str(dedi_path),
+        "duration": round(duration, 3),
+        "returncode": returncode,
+        "mods": {mod_id: asdict(mod) for mod_id, mod in cache.items()},
+    }
+    try:
+        atomic_write_json(Path(get_data_dir()) / MOD_CACHE_FILE_NAME, record)
+    except OSError as e:
+        logger.warning(f"Failed to save the mod cache record: {e}")
+
+
+def prefetch_mods(
+    mod_ids: list[str],
+    dedi_path: str,
+    nullrender_fp: str | None = None,
+    timeout: float = PREFETCH_TIMEOUT,
+) -> dict[str, CachedMod]:
+    """
+    Adds the mods to the mod setup file and runs the dedicated server in update only mode to download them.
+    Blocking; `queue_prefetch.start_queue_prefetch` runs it in the background.
+
+    Parameters
+    ----------
+    mod_ids: list[str]
+        The workshop ids of the mods to download
+    dedi_path: str
+        The full path to the dedicated server tools
+    nullrender_fp: str | None (default None)
+        The binary to run. Defaults to the nullrenderer of the dedicated server tools.
+    timeout: float (default PREFETCH_TIMEOUT)
+        Seconds to wait for the update to finish before killing it
+
+    Returns
+    -------
+    cache: dict[str, CachedMod]
+        The installed state of each mod after the update
+    """
+    mod_ids = clean_mod_ids(mod_ids)
+    if nullrender_fp is None:
+        nullrender_fp = str(get_nullrender_path(dedi_path))
+
+    with _prefetch_lock:
+        add_mods(steam_mods_path=os.path.join(dedi_path, "mods"), mod_ids=mod_ids)
+
+        cmd = [
+            nullrender_fp,
+            "-only_update_server_mods",
+            "-ugc_directory", str(get_ugc_path(dedi_path)),
+        ]
+        popen_kwargs = {
+            "cwd": os.path.dirname(nullrender_fp),
+            "stdout": subprocess.PIPE,
+            "stderr": subprocess.STDOUT,
+            "text": True,
+            "bufsize": 1,
+        }
+
+        logger.info(f"📦 Pre-fetching {len(mod_ids)} mod(s) 📦")
+        start = time.perf_counter()
+        proc = spawn_process(cmd, **popen_kwargs)
+
+        # Reading on a separate thread lets the timeout apply while the binary is silent
+        def stream_output():
+            for line in proc.stdout:
+                server_logger.info("[Mod Update] %s", line.rstrip())
+
+        reader = threading.Thread(target=stream_output, daemon=True)
+        reader.start()
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Mod update did not finish after {timeout}s. Killing it.")
+            proc.kill()
+            proc.wait()
+        reader.join(timeout=1.0)
+        duration = time.perf_counter() - start
+
+    cache = scan_mod_cache(dedi_path, mod_ids)
+    _save_cache_record(cache=cache, dedi_path=dedi_path, returncode=proc.returncode, duration=duration)
+
+    missing = [mod_id for mod_id, mod in cache.items() if not mod.installed]
+    if missing:
+        logger.warning(f"Mod pre-fetch finished in {duration:.1f}s but {len(missing)} mod(s) are missing: {missing}")
+    else:
+        logger.info(f"Mod cache is warm. Pre-fetch took {duration:.1f}s")
+    return cache
+
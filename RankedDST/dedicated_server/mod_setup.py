@@ -0,0 +1,269 @@
+"""
+RankedDST/dedicated_server/mod_setup.py
+
+This module keeps a parsed index of the `dedicated_server_mods_setup.lua` file found in the dedicated server tools.
+
+The file is parsed into its `ServerModSetup("<id>")` and `ServerModCollectionSetup("<id>")` entries once and cached
+until its modification time changes. Lookups are set based and updates are written back atomically, keeping every
+other line of the file (comments, the user's own entries) as it was.
+
+Mods added by the app are remembered in `~/ranked_dst/mod_usage.json` along with the mods used by recent matches,
+which allows optionally pruning mods the app added that no recent match needed.
+"""
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+from RankedDST.tools.config import get_data_dir
+from RankedDST.tools.atomic_file import atomic_write_text, atomic_write_json
+from RankedDST.tools.logger import logger
+
+MOD_SETUP_FILE_NAME = "dedicated_server_mods_setup.lua"
+MOD_USAGE_FILE_NAME = "mod_usage.json"
+RECENT_MATCHES = 10
+
+SetupMod = "ServerModSetup"
+SetupCollection = "ServerModCollectionSetup"
+
+SETUP_LINE_RE = re.compile(r'^\s*(ServerModSetup|ServerModCollectionSetup)\(\s*"(\d+)"\s*\)\s*$')
+VALID_ID_RE = re.compile(r"^[0-9]{6,12}$")
+
+
+class ModSetupIndex:
+    """
+    The parsed contents of a `dedicated_server_mods_setup.lua` file.
+    """
+    def __init__(self, path: Path, lines: list[str], mtime_ns: int | None):
+        self.path = path
+        self.lines = lines
+        self.mtime_ns = mtime_ns
+
+        # (kind, id) -> index of its line
+        self.entries: dict[tuple[str, str], int] = {}
+        for i, line in enumerate(lines):
+            m = SETUP_LINE_RE.match(line)
+            if m:
+                self.entries.setdefault((m.group(1), m.group(2)), i)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "ModSetupIndex":
+        path = Path(path)
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+            lines = path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            mtime_ns, lines = None, []
+        return cls(path=path, lines=lines, mtime_ns=mtime_ns)
+
+    @property
+    def mod_ids(self) -> set[str]:
+        return {mod_id for kind, mod_id in self.entries if kind == SetupMod}
+
+    @property
+    def collection_ids(self) -> set[str]:
+        return {mod_id for kind, mod_id in self.entries if kind == SetupCollection}
+
+    def contains(self, mod_id: str, kind: str = SetupMod) -> bool:
+        return (kind, mod_id) in self.entries
+
+    def add(self, mod_ids: list[str], kind: str = SetupMod) -> list[str]:
+        """
+        Adds an entry for every mod id not yet present. New entries go right after the last existing entry.
+
+        Returns
+        -------
+        added: list[str]
+            The mod ids that were added
+        """
+        added: list[str] = []
+        for mod_id in mod_ids:
+            if (kind, mod_id) in self.entries or mod_id in added:
+                continue
+            added.append(mod_id)
+
+        if not added:
+            return added
+
+        insert_at = max(self.entries.values()) + 1 if self.entries else len(self.lines)
+        new_lines = [f'{kind}("{mod_id}")' for mod_id in added]
+        self.lines[insert_at:insert_at] = new_lines
+        self._reindex()
+        return added
+
+    def remove(self, mod_ids: set[str], kind: str = SetupMod) -> list[str]:
+        """
+        Removes the entries of the given mod ids.
+
+        Returns
+        -------
+        removed: list[str]
+            The mod ids that were removed
+        """
+        removed = [mod_id for mod_id in mod_ids if (kind, mod_id) in self.entries]
+        if not removed:
+            return removed
+
+        drop = {self.entries[(kind, mod_id)] for mod_id in removed}
+        self.lines = [line for i, line in enumerate(self.lines) if i not in drop]
+        self._reindex()
+        return removed
+
+    def _reindex(self) -> None:
+        self.entries = ModSetupIndex(path=self.path, lines=self.lines, mtime_ns=self.mtime_ns).entries
+
+    def save(self) -> None:
+        """
+        Atomically writes the index back to its file.
+        """
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(self.path, "\n".join(self.lines) + "\n")
+            self.mtime_ns = self.path.stat().st_mtime_ns
+        except OSError:
+            # The cached index no longer matches the file
+            _index_cache.pop(self.path, None)
+            raise
+
+
+_index_cache: dict[Path, ModSetupIndex] = {}
+_index_lock = threading.Lock()
+
+def get_mod_setup_index(steam_mods_path: str | Path) -> ModSetupIndex:
+    """
+    Returns the parsed index of the mod setup file under the steam mods path. The file is only re-read when its
+    modification time changed since it was last parsed.
+    """
+    path = Path(steam_mods_path) / MOD_SETUP_FILE_NAME
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+
+    cached = _index_cache.get(path)
+    if cached is not None and cached.mtime_ns == mtime_ns:
+        return cached
+
+    index = ModSetupIndex.load(path)
+    _index_cache[path] = index
+    return index
+
+
+def clean_mod_ids(mod_ids: list[str]) -> list[str]:
+    """
+    Strips the mod ids and raises a ValueError if any of them is not a valid workshop id.
+    """
+    cleaned_ids: list[str] = []
+    for mod_id in mod_ids:
+        mod_id = str(mod_id).strip()
+        if not VALID_ID_RE.match(mod_id):
+            raise ValueError(
+                f"Invalid workshop ID: {mod_id!r} (must be 6-12 digits)"
+            )
+        cleaned_ids.append(mod_id)
+    return cleaned_ids
+
+
+# -------------------- MOD USAGE -------------------- #
+def _usage_path() -> Path:
+    return Path(get_data_dir()) / MOD_USAGE_FILE_NAME
+
+def load_mod_usage() -> dict:
+    """
+    Reads the mod usage file.
+
+    Returns
+    -------
+    usage: dict
+        `managed_ids` are the mod ids the app added to the setup file and `matches` are the mods used by the most
+        recent matches, oldest first.
+    """
+    try:
+        with open(_usage_path(), "r", encoding="utf-8") as file:
+            usage = json.load(file)
+    except (OSError, ValueError):
+        usage = {}
+
+    if not isinstance(usage, dict):
+        usage = {}
+    usage.setdefault("managed_ids", [])
+    usage.setdefault("matches", [])
+    return usage
+
+def record_mod_usage(match_id: str | None, mod_ids: list[str], added_ids: list[str]) -> None:
+    """
+    Remembers the mods used by a match and the mods the app added to the setup file.
+    """
+    usage = load_mod_usage()
+    usage["managed_ids"] = sorted(set(usage["managed_ids"]) | set(added_ids))
+
+    if match_id is not None:
+        matches = [m for m in usage["matches"] if m.get("match_id") != str(match_id)]
+        matches.append({"match_id": str(match_id), "mod_ids": mod_ids, "used_at": time.time()})
+        usage["matches"] = matches[-RECENT_MATCHES:]
+
+    try:
+        atomic_write_json(_usage_path(), usage)
+    except OSError as e:
+        logger.warning(f"Failed to save mod usage: {e}")
+
+
+def prune_unused_mods(steam_mods_path: str | Path, recent_matches: int = RECENT_MATCHES) -> list[str]:
+    """
+    Removes the mods the app added to the setup file that none of the recent matches used. Entries the
+    user added themselves are never removed.
+
+    Parameters
+    ----------
+    steam_mods_path: str | Path
+        The directory containing the `dedicated_server_mods_setup.lua` file
+    recent_matches: int (default RECENT_MATCHES)
+        How many of the most recent matches count as recent
+
+    Returns
+    -------
+    removed: list[str]
+        The mod ids that were pruned
+    """
+    usage = load_mod_usage()
+    recently_used: set[str] = set()
+    for match in usage["matches"][-recent_matches:]:
+        recently_used |= set(match.get("mod_ids", []))
+
+    stale = set(usage["managed_ids"]) - recently_used
+    if not stale:
+        return []
+
+    with _index_lock:
+        index = get_mod_setup_index(steam_mods_path)
+        removed = index.remove(stale)
+        if removed:
+            index.save()
+
+    usage["managed_ids"] = sorted(set(usage["managed_ids"]) - stale)
+    try:
+        atomic_write_json(_usage_path(), usage)
+    except OSError as e:
+        logger.warning(f"Failed to save mod usage: {e}")
+
+    if removed:
+        logger.info(f"Pruned {len(removed)} unused mod(s) from {index.path}")
+    return removed
+
+
+def add_mods(steam_mods_path: str | Path, mod_ids: list[str]) -> list[str]:
+    """
+    Adds a `ServerModSetup` entry for each mod id missing from the setup file and saves it if anything changed.
+
+    Returns
+    -------
+    added: list[str]
+        The mod ids that were added
+    """
+    with _index_lock:
+        index = get_mod_setup_index(steam_mods_path)
+        added = index.add(mod_ids)
+        if added:
+            index.save()
+    return added
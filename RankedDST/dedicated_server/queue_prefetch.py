@@ -0,0 +1,73 @@
+"""
+RankedDST/dedicated_server/queue_prefetch.py
+
+This module starts a mod prefetch when the player opens the queue page from the app, so the mods of the coming match
+are usually downloaded before `generate_world` arrives and the shards can skip updating them.
+
+The prefetch is skipped when the dedicated server paths are not set, when DST and the dedicated server tools have
+different versions, or when the mod cache is already warm (see `mod_cache.is_cache_warm`). Opening the queue page
+does not guarantee a match, so nothing match specific is prepared.
+"""
+import threading
+
+import RankedDST.tools.state as state
+from RankedDST.tools.logger import logger
+from RankedDST.tools.path_checker import check_dst_versions
+from RankedDST.dedicated_server.mod_setup import load_mod_usage
+from RankedDST.dedicated_server.mod_cache import is_cache_warm, prefetch_mods
+
+_prefetch_lock = threading.Lock()
+_prefetch_thread: threading.Thread | None = None
+
+
+def prefetch_for_queue(mod_ids: list[str] | None = None) -> bool:
+    """
+    Downloads the mods of the coming match. Blocking; use `start_queue_prefetch` to run it in the background.
+
+    Parameters
+    ----------
+    mod_ids: list[str] | None (default None)
+        The mods to download. If omitted, the mods of the most recent match are used.
+
+    Returns
+    -------
+    prefetched: bool
+        Whether a prefetch ran
+    """
+    dedi_path = state.get_user_data(get_key="dedi_path")
+    if not dedi_path:
+        logger.info("Cannot pre-fetch mods without the dedicated server path")
+        return False
+
+    if not check_dst_versions(dedi_fp=dedi_path, raise_error=False):
+        logger.info("Cannot pre-fetch mods while DST and the dedicated server tools have different versions")
+        return False
+
+    if mod_ids is None:
+        recent_matches = load_mod_usage()["matches"]
+        mod_ids = recent_matches[-1].get("mod_ids", []) if recent_matches else []
+
+    if not mod_ids or is_cache_warm(dedi_path=dedi_path, mod_ids=mod_ids):
+        return False
+
+    prefetch_mods(mod_ids=mod_ids, dedi_path=dedi_path)
+    return True
+
+
+def start_queue_prefetch(mod_ids: list[str] | None = None) -> None:
+    """
+    Starts `prefetch_for_queue` in a background thread unless it is already running.
+    """
+    global _prefetch_thread
+    with _prefetch_lock:
+        if _prefetch_thread is not None and _prefetch_thread.is_alive():
+            return
+
+        def run():
+            try:
+                prefetch_for_queue(mod_ids=mod_ids)
+            except Exception as e:
+                logger.warning(f"Mod pre-fetch failed: {e}")
+
+        _prefetch_thread = threading.Thread(target=run, name="queue-prefetch", daemon=True)
+        _prefetch_thread.start()
@@ -1,39 +1,137 @@
 """
-RankedDST/dedicated_server/manager.py
+RankedDST/dedicated_server/server_manager.py
 
-This module creates the DedicatedServerManager class which is used for controlling the dedicated server created by the app.
+This module creates the DedicatedServerManager class which is used for controlling the dedicated servers created by the app.
 
-The object contains a master and caves subprocess that can be set/cleared
+The manager tracks any number of clusters keyed by their match id. Each cluster owns a master and caves subprocess,
+their statuses, the ports allocated to it, and a log prefix used for its shard output. A host level capacity limit
+decides how many clusters may run at the same time.
 """
+import re
 import subprocess
 import threading
+from collections import deque
 from typing import Optional
 
-class DedicatedServerManager:
-    def __init__(self):
-        self.master: Optional[subprocess.Popen] = None
-        self.caves: Optional[subprocess.Popen] = None
+from RankedDST.tools.logger import logger
+
+SHARDS = ["Master", "Caves"]
+SHARD_STATUSES = ["down", "launching", "launched"]
+
+DEFAULT_MAX_CLUSTERS = 1
+PORT_STRIDE = 2 # how far apart the port blocks of two clusters are
+MAX_PORT_SLOTS = 32
+SHUTDOWN_HISTORY_SIZE = 50
+
+# The ini keys that hold a port, by the server_configs key of the file they live in
+PORT_KEYS = {
+    "ClusterIni": ["master_port"],
+    "MasterServerIni": ["server_port", "master_server_port", "authentication_port"],
+    "CavesServerIni": ["server_port", "master_server_port", "authentication_port"],
+}
+
+def _port_re(ini_key: str) -> re.Pattern:
+    return re.compile(rf"^(\s*{ini_key}\s*=\s*)(\d+)", re.MULTILINE)
+
+
+def read_ports(server_configs: dict[str, str]) -> dict[tuple[str, str], int]:
+    """
+    Reads every port set in the ini files of the server configs.
+
+    Parameters
+    ----------
+    server_configs: dict[str, str]
+        The cluster files sent by the backend. Only the ini files are read.
+
+    Returns
+    -------
+    ports: dict[tuple[str, str], int]
+        The ports found, keyed by `(config_key, ini_key)`. Ports that are not set are left out.
+    """
+    ports: dict[tuple[str, str], int] = {}
+    for config_key, ini_keys in PORT_KEYS.items():
+        text = server_configs.get(config_key)
+        if not isinstance(text, str):
+            continue
+
+        for ini_key in ini_keys:
+            m = _port_re(ini_key).search(text)
+            if m:
+                ports[(config_key, ini_key)] = int(m.group(2))
+    return ports
+
+
+def apply_port_offset(server_configs: dict[str, str], offset: int) -> dict[str, str]:
+    """
+    Returns a copy of the server configs with every port in the ini files shifted by the offset.
+    An offset of 0 returns the configs unchanged.
+    """
+    shifted = dict(server_configs)
+    if offset == 0:
+        return shifted
+
+    for config_key, ini_keys in PORT_KEYS.items():
+        text = shifted.get(config_key)
+        if not isinstance(text, str):
+            continue
+
+        for ini_key in ini_keys:
+            text = _port_re(ini_key).sub(lambda m: f"{m.group(1)}{int(m.group(2)) + offset}", text)
+        shifted[config_key] = text
+    return shifted
+
+
+class ClusterHandle:
+    """
+    The processes, statuses and ports of a single cluster (one ranked match).
+    """
+    def __init__(
+        self,
+        match_id: str,
+        cluster_name: str,
+        port_offset: int,
+        ports: set[int],
+        cluster_dir: str | None = None,
+    ):
+        self.match_id = match_id
+        self.cluster_name = cluster_name
+        self.cluster_dir = cluster_dir
+        self.port_offset = port_offset
+        self.ports = ports
+
+        self.processes: dict[str, Optional[subprocess.Popen]] = {shard: None for shard in SHARDS}
+        self.statuses: dict[str, str] = {shard: "down" for shard in SHARDS}
         self.lock = threading.Lock()
 
-        self.master_status = 'down'
-        self.caves_status = 'down'
-    
-    def set_shard_status(self, shard: str, status: str):
+    @property
+    def master(self) -> Optional[subprocess.Popen]:
+        return self.processes["Master"]
+
+    @property
+    def caves(self) -> Optional[subprocess.Popen]:
+        return self.processes["Caves"]
+
+    def log_prefix(self, shard: str) -> str:
+        """
+        The prefix written in front of every output line of the shard. Keeps the log streams of
+        concurrent clusters apart in the `dedi-server` log.
+        """
+        return f"[Match {self.match_id}] [{shard}]"
+
+    def set_shard_status(self, shard: str, status: str) -> None:
         """
         Update the current status of the shard.
-        
+
         shard: str
             The shard the status is updated for. Must be either `'Master' or 'Caves'`
         status: str
             The status to be updated. Must be either `'down', 'launching', or 'launched'`
         """
-        assert shard in ['Master', 'Caves'], f"Shard must be either 'Caves' or 'Master'. Was given: {shard}"
-        assert status in ['down', 'launching', 'launched'], f"Status must be either 'down', 'launching', or 'launched'. Was given: {status}"
+        assert shard in SHARDS, f"Shard must be either 'Caves' or 'Master'. Was given: {shard}"
+        assert status in SHARD_STATUSES, f"Status must be either 'down', 'launching', or 'launched'. Was given: {status}"
 
-        if shard == 'Master':
-            self.master_status = status
-        elif shard == 'Caves':
-            self.caves_status = status
+        with self.lock:
+            self.statuses[shard] = status
 
     def get_shard_status(self) -> tuple[str, str]:
         """
@@ -48,33 +146,196 @@ class DedicatedServerManager:
         caves_status: str
             The status of the caves shard.
         """
-        return self.master_status, self.caves_status
+        with self.lock:
+            return self.statuses["Master"], self.statuses["Caves"]
+
+    def all_launched(self) -> bool:
+        return all(status == "launched" for status in self.get_shard_status())
 
     def is_running(self) -> bool:
-        return (
-            self.master is not None
-            and self.master.poll() is None
-            and self.caves is not None
-            and self.caves.poll() is None
-        )
+        with self.lock:
+            return all(proc is not None and proc.poll() is None for proc in self.processes.values())
+
+    def has_exited(self) -> bool:
+        """
+        Whether the cluster was launched and none of its shards are running anymore, such as after both crashed.
+        A cluster still being set up has no processes yet and has not exited.
+        """
+        with self.lock:
+            processes = [proc for proc in self.processes.values() if proc is not None]
+            return bool(processes) and all(proc.poll() is not None for proc in processes)
+
+    def set_subprocess(self, shard: str, proc: subprocess.Popen) -> None:
+        """
+        Stores the subprocess for the given shard
+        """
+        assert shard in SHARDS, f"Shard must be either 'Caves' or 'Master'. Was given: {shard}"
+        with self.lock:
+            self.processes[shard] = proc
+
+    def get_subprocesses(self) -> dict[str, Optional[subprocess.Popen]]:
+        with self.lock:
+            return dict(self.processes)
+
+
+class DedicatedServerManager:
+    def __init__(self, max_clusters: int = DEFAULT_MAX_CLUSTERS):
+        self.clusters: dict[str, ClusterHandle] = {}
+        self.max_clusters = max_clusters
+        self.lock = threading.Lock()
+
+        # Results of the most recent shard shutdowns (ShardShutdownResult objects), oldest first
+        self.shutdown_history: deque = deque(maxlen=SHUTDOWN_HISTORY_SIZE)
+
+    def set_max_clusters(self, max_clusters: int) -> None:
+        """
+        Sets how many clusters may be hosted on this machine at once.
+        """
+        if not isinstance(max_clusters, int) or max_clusters < 1:
+            raise ValueError(f"max_clusters must be a positive integer. Was given: {max_clusters}")
+
+        with self.lock:
+            self.max_clusters = max_clusters
+
+    def _allocate_port_offset(self, requested_ports: set[int], port_offset: int | None = None) -> tuple[int, set[int]]:
+        """
+        Finds the smallest port offset where none of the requested ports collide with a port used by
+        another cluster. If a port offset is given, then only that offset is tried. Must be called while
+        holding the lock.
+        """
+        used_ports: set[int] = set()
+        for cluster in self.clusters.values():
+            used_ports |= cluster.ports
+
+        if port_offset is not None:
+            shifted = {port + port_offset for port in requested_ports}
+            if shifted & used_ports:
+                raise RuntimeError(f"The ports at offset {port_offset} are already in use")
+            return port_offset, shifted
+
+        for slot in range(MAX_PORT_SLOTS):
+            offset = slot * PORT_STRIDE
+            shifted = {port + offset for port in requested_ports}
+            if not shifted & used_ports:
+                return offset, shifted
+
+        raise RuntimeError("No free ports left for another cluster")
+
+    def _reap_exited_clusters(self) -> None:
+        """
+        Releases the clusters whose shards all exited without being stopped, so they stop counting against the
+        capacity and holding their ports. Must be called while holding the lock.
+        """
+        for match_id, cluster in list(self.clusters.items()):
+            if not cluster.has_exited():
+                continue
+            del self.clusters[match_id]
+            for shard in SHARDS:
+                cluster.set_shard_status(shard=shard, status="down")
+            logger.info(f"Released the cluster of match {match_id}: its shards are no longer running")
+
+    def reserve_cluster(
+        self,
+        match_id: str,
+        cluster_name: str,
+        server_configs: dict[str, str],
+        cluster_dir: str | None = None,
+        port_offset: int | None = None,
+    ) -> ClusterHandle:
+        """
+        Registers a new cluster for the match and allocates its ports. The ports in the server configs
+        are not modified; use `apply_port_offset` with the handle's `port_offset` before writing them.
+
+        Clusters whose shards all exited are released first. Raises a RuntimeError if the host is still at capacity
+        or the match already has a cluster.
+
+        Parameters
+        ----------
+        match_id: str
+            The id of the match the cluster is hosted for
+        cluster_name: str
+            The folder name of the cluster
+        server_configs: dict[str, str]
+            The cluster files sent by the backend. Used to read the ports the cluster asks for.
+        cluster_dir: str | None (default None)
+            The full path to the cluster folder
+        port_offset: int | None (default None)
+            Reserves exactly this port offset instead of the first free one. Used for clusters whose
+            ports were already written to disk. In that case server_configs holds the shifted ports.
 
-    def set_subprocesses(self, master: subprocess.Popen, caves: subprocess.Popen) -> None:
+        Returns
+        -------
+        cluster: ClusterHandle
+            The handle used to store the cluster's processes and statuses
+        """
+        match_id = str(match_id)
+        with self.lock:
+            self._reap_exited_clusters()
+            if match_id in self.clusters:
+                raise RuntimeError(f"Match {match_id} already has a cluster")
+
+            if len(self.clusters) >= self.max_clusters:
+                raise RuntimeError(
+                    f"Cannot host more than {self.max_clusters} cluster(s) at once"
+                )
+
+            requested_ports = set(read_ports(server_configs).values())
+            if port_offset is not None:
+                # The configs were already shifted by the offset
+                requested_ports = {port - port_offset for port in requested_ports}
+
+            offset, ports = self._allocate_port_offset(requested_ports, port_offset=port_offset)
+            cluster = ClusterHandle(
+                match_id=match_id,
+                cluster_name=cluster_name,
+                port_offset=offset,
+                ports=ports,
+                cluster_dir=cluster_dir
+            )
+            self.clusters[match_id] = cluster
+            return cluster
+
+    def get_cluster(self, match_id: str) -> Optional[ClusterHandle]:
+        with self.lock:
+            return self.clusters.get(str(match_id))
+
+    def get_clusters(self) -> list[ClusterHandle]:
+        with self.lock:
+            return list(self.clusters.values())
+
+    def release_cluster(self, match_id: str) -> None:
         """
-        Stores the subprocesses for the master and caves shard
+        Forgets the cluster for the match, freeing its ports and capacity. Its statuses are set to 'down'
         """
         with self.lock:
-            self.master = master
-            self.caves = caves
+            cluster = self.clusters.pop(str(match_id), None)
+
+        if cluster is None:
+            return
 
-    def clear_subprocesses(self) -> None:
+        for shard in SHARDS:
+            cluster.set_shard_status(shard=shard, status="down")
+
+    def record_shutdown(self, results: list) -> None:
         """
-        Clears out the master and caves subprocesses and sets their statuses to 'down'
+        Stores the shutdown latency and outcome of each shard.
         """
         with self.lock:
-            self.master = None
-            self.caves = None
-        
-        self.set_shard_status(shard="Master", status="down")
-        self.set_shard_status(shard="Caves", status="down")
+            self.shutdown_history.extend(results)
+
+    def get_shutdown_history(self) -> list:
+        with self.lock:
+            return list(self.shutdown_history)
+
+    def is_running(self, match_id: str | None = None) -> bool:
+        """
+        Whether the cluster for the match is running. If no match id is given, then whether any cluster is
+        running.
+        """
+        if match_id is not None:
+            cluster = self.get_cluster(match_id)
+            return cluster is not None and cluster.is_running()
+
+        return any(cluster.is_running() for cluster in self.get_clusters())
 
 SERVER_MANAGER = DedicatedServerManager()
@@ -0,0 +1,119 @@
+"""
+RankedDST/dedicated_server/shard_output.py
+
+This module keeps the most recent output lines of every shard in memory, so the UI can show live logs without reading
+the `dedi-server` log file.
+
+Each shard of a match gets a bounded ring buffer. Every line gets a sequence number, which the UI uses as a cursor to
+only ask for the lines it has not seen yet. The buffers of the last `RECENT_MATCHES` matches are kept, so the output of
+a shard that crashed stays readable after its cluster is released.
+"""
+import threading
+from collections import deque, OrderedDict
+from itertools import islice
+
+BUFFER_LINES = 2000
+MAX_LINE_LENGTH = 1000
+MAX_PAGE_LINES = 500
+RECENT_MATCHES = 2
+
+
+class ShardOutputBuffer:
+    """
+    The last `capacity` output lines of a shard.
+    """
+    def __init__(self, capacity: int = BUFFER_LINES):
+        self._lines: deque[str] = deque(maxlen=capacity)
+        self._next_seq = 0 # sequence number of the next appended line
+        self._lock = threading.Lock()
+
+    def append(self, line: str) -> None:
+        line = line.rstrip("\r\n")
+        if len(line) > MAX_LINE_LENGTH:
+            line = line[:MAX_LINE_LENGTH] + "…"
+        with self._lock:
+            self._lines.append(line)
+            self._next_seq += 1
+
+    def read(self, cursor: int | None = None, limit: int = MAX_PAGE_LINES) -> dict[str, list[str] | int | bool]:
+        """
+        Returns the lines from the cursor onward.
+
+        Parameters
+        ----------
+        cursor: int | None (default None)
+            The `cursor` returned by the previous read. If None, reading starts `limit` lines before the end.
+        limit: int (default MAX_PAGE_LINES)
+            The most lines to return. Capped at MAX_PAGE_LINES.
+
+        Returns
+        -------
+        page: dict[str, list[str] | int | bool]
+            `lines`, the `cursor` to pass to the next read, `missed` (lines that left the buffer before they were
+            read) and `more` (whether more lines are already waiting).
+        """
+        limit = max(0, min(int(limit), MAX_PAGE_LINES))
+        with self._lock:
+            first_seq = self._next_seq - len(self._lines)
+            if cursor is None or cursor > self._next_seq:
+                start = max(first_seq, self._next_seq - limit)
+                missed = 0
+            else:
+                start = max(int(cursor), first_seq)
+                missed = start - int(cursor)
+
+            lines = list(islice(self._lines, start - first_seq, start - first_seq + limit))
+            end = start + len(lines)
+            return {"lines": lines, "cursor": end, "missed": missed, "more": end < self._next_seq}
+
+
+_buffers: OrderedDict[str, dict[str, ShardOutputBuffer]] = OrderedDict()
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(match_id: str, shard: str) -> ShardOutputBuffer:
+    """
+    Returns the output buffer of a shard, creating it if needed. Creating the buffers of a new match drops those of
+    the oldest one beyond RECENT_MATCHES.
+    """
+    match_id = str(match_id)
+    with _buffers_lock:
+        shards = _buffers.get(match_id)
+        if shards is None:
+            shards = _buffers[match_id] = {}
+            while len(_buffers) > RECENT_MATCHES:
+                _buffers.popitem(last=False)
+        buffer = shards.get(shard)
+        if buffer is None:
+            buffer = shards[shard] = ShardOutputBuffer()
+        return buffer
+
+
+def latest_match_id() -> str | None:
+    """
+    Returns the match whose shards most recently started producing output.
+    """
+    with _buffers_lock:
+        return next(reversed(_buffers), None)
+
+
+def read_output(shard: str, cursor: int | None = None, limit: int = MAX_PAGE_LINES, match_id: str | None = None) -> dict:
+    """
+    Reads the output of a shard. See `ShardOutputBuffer.read`.
+
+    Parameters
+    ----------
+    match_id: str | None (default None)
+        Defaults to the latest match.
+
+    Returns
+    -------
+    page: dict
+        The page along with its `match_id` and `shard`. Empty if the shard has no output.
+    """
+    match_id = str(match_id) if match_id is not None else latest_match_id()
+    with _buffers_lock:
+        buffer = _buffers.get(match_id, {}).get(shard) if match_id is not None else None
+
+    page = buffer.read(cursor=cursor, limit=limit) if buffer else {"lines": [], "cursor": 0, "missed": 0, "more": False}
+    return {"match_id": match_id, "shard": shard, **page}
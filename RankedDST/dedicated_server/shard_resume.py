@@ -0,0 +1,325 @@
+"""
+RankedDST/dedicated_server/shard_resume.py
+
+This module lets the app get back into a live match after it crashed or was restarted.
+
+While a cluster runs, its shard PIDs, cluster folder, ports and shard statuses are kept in `~/ranked_dst/runtime.json`.
+On startup the recorded shards that are still alive are adopted through `AdoptedProcess`, which offers the parts of the
+`subprocess.Popen` interface the rest of the app uses.
+
+By default shards die with the app (see `job_object`), and a match can only be resumed by relaunching its cluster.
+With `"resume_shards": true` shards are instead launched so they survive a crash of the app (see
+`job_object.spawn_process`), and their output goes to a file in the shard's folder instead of a pipe: a pipe would
+break with the app and kill the shard with SIGPIPE on its next line. The app follows that file while it runs, and the
+next run follows it again after adopting the shard.
+"""
+import asyncio
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+from RankedDST.tools.config import get_data_dir
+from RankedDST.tools.atomic_file import atomic_write_json
+from RankedDST.tools.logger import logger
+from RankedDST.dedicated_server.server_manager import ClusterHandle
+
+if sys.platform == "win32":
+    import pywintypes
+    import win32api
+    import win32con
+    import win32event
+    import win32process
+
+RUNTIME_FILE_NAME = "runtime.json"
+SHARD_OUTPUT_FILE_NAME = "ranked_dst_output.txt" # in the shard's folder of the cluster
+SHARD_BINARY_NAME = "dontstarve_dedicated_server"
+STILL_ACTIVE = 259 # GetExitCodeProcess code of a running process
+
+resume_shards = False
+
+_runtime_lock = threading.Lock()
+
+
+def set_resume_shards(enabled: bool) -> None:
+    """
+    Selects whether shards launched from now on survive a crash of the app so they can be adopted again.
+
+    Raises
+    ------
+    ValueError
+        If the value is not a boolean
+    """
+    if not isinstance(enabled, bool):
+        raise ValueError(f"resume_shards must be true or false, got '{enabled}'")
+
+    global resume_shards
+    resume_shards = enabled
+
+
+def shard_output_path(cluster_dir: str | Path, shard: str) -> Path:
+    """
+    The file the output of a resumable shard is written to.
+    """
+    return Path(cluster_dir) / shard / SHARD_OUTPUT_FILE_NAME
+
+
+# -------------------- RUNTIME FILE -------------------- #
+def _runtime_path() -> Path:
+    return Path(get_data_dir()) / RUNTIME_FILE_NAME
+
+def load_runtime() -> dict[str, dict]:
+    """
+    Reads the runtime file.
+
+    Returns
+    -------
+    clusters: dict[str, dict]
+        The recorded clusters keyed by match id
+    """
+    try:
+        with open(_runtime_path(), "r", encoding="utf-8") as file:
+            clusters = json.load(file).get("clusters", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+    return clusters if isinstance(clusters, dict) else {}
+
+def _write_runtime(clusters: dict[str, dict]) -> None:
+    try:
+        atomic_write_json(_runtime_path(), {"clusters": clusters})
+    except OSError as e:
+        logger.warning(f"Failed to save the runtime file: {e}")
+
+def save_cluster(cluster: ClusterHandle, dedi_path: str) -> None:
+    """
+    Records the cluster's shard PIDs and statuses in the runtime file.
+    """
+    statuses = dict(zip(["Master", "Caves"], cluster.get_shard_status()))
+    shards = {
+        shard: {"pid": proc.pid if proc is not None else None, "status": statuses[shard]}
+        for shard, proc in cluster.get_subprocesses().items()
+    }
+
+    with _runtime_lock:
+        clusters = load_runtime()
+        clusters[cluster.match_id] = {
+            "cluster_name": cluster.cluster_name,
+            "cluster_dir": cluster.cluster_dir,
+            "dedi_path": dedi_path,
+            "port_offset": cluster.port_offset,
+            "ports": sorted(cluster.ports),
+            "shards": shards,
+            "resumable": resume_shards, # launched to survive a crash of the app, with their output in a file
+            "updated_at": time.time(),
+        }
+        _write_runtime(clusters)
+
+def forget_cluster(match_id: str) -> None:
+    """
+    Removes the cluster from the runtime file.
+    """
+    with _runtime_lock:
+        clusters = load_runtime()
+        if clusters.pop(str(match_id), None) is not None:
+            _write_runtime(clusters)
+
+
+# -------------------- ADOPTED PROCESSES -------------------- #
+def _unix_command_line(pid: int) -> str:
+    cmdline_fp = Path(f"/proc/{pid}/cmdline")
+    if cmdline_fp.exists():
+        return cmdline_fp.read_bytes().replace(b"\0", b" ").decode(errors="replace")
+
+    result = subprocess.run(["ps", "-p", str(pid), "-o", "command="], capture_output=True, text=True)
+    return result.stdout
+
+
+def _is_zombie(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat", "r") as file:
+            return file.read().rsplit(")", 1)[1].split()[0] == "Z"
+    except (OSError, IndexError):
+        return False # no /proc, such as on macOS
+
+
+def is_shard_process(pid: int | None) -> bool:
+    """
+    Whether the PID belongs to a running dedicated server process. Guards against the PID having been reused.
+    """
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+
+    if sys.platform == "win32":
+        try:
+            handle = win32api.OpenProcess(win32con.PROCESS_ALL_ACCESS, False, pid)
+            if win32process.GetExitCodeProcess(handle) != STILL_ACTIVE:
+                return False
+            return SHARD_BINARY_NAME in win32process.GetModuleFileNameEx(handle, 0)
+        except pywintypes.error:
+            return False
+
+    try:
+        os.kill(pid, 0)
+        return not _is_zombie(pid) and SHARD_BINARY_NAME in _unix_command_line(pid)
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+class AdoptedProcess:
+    """
+    A running shard process that was not started by this instance of the app. Implements the `poll`, `wait`,
+    `terminate` and `kill` parts of `subprocess.Popen`. There are no pipes to the process, so on POSIX it is asked to
+    save and quit with SIGINT (see `shard_shutdown`). On Windows `terminate` and `kill` both end it without saving.
+    """
+    stdin = None
+    stdout = None
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode: int | None = None
+        self._handle = None
+        if sys.platform == "win32":
+            self._handle = win32api.OpenProcess(win32con.PROCESS_ALL_ACCESS, False, pid)
+
+    def poll(self) -> int | None:
+        if self.returncode is not None:
+            return self.returncode
+
+        if sys.platform == "win32":
+            code = win32process.GetExitCodeProcess(self._handle)
+            if code != STILL_ACTIVE:
+                self.returncode = code
+        else:
+            try:
+                os.kill(self.pid, 0)
+                if _is_zombie(self.pid):
+                    # Exited, but nobody reaped it yet (such as a container init that does not reap)
+                    self.returncode = 0
+            except ProcessLookupError:
+                # The exit code of a process that is not our child cannot be read
+                self.returncode = 0
+            except PermissionError:
+                pass
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        if sys.platform == "win32":
+            wait_ms = win32event.INFINITE if timeout is None else int(timeout * 1000)
+            if win32event.WaitForSingleObject(self._handle, wait_ms) == win32event.WAIT_TIMEOUT:
+                raise subprocess.TimeoutExpired(cmd=str(self.pid), timeout=timeout)
+            return self.poll()
+
+        if hasattr(os, "pidfd_open"):
+            try:
+                pidfd = os.pidfd_open(self.pid)
+            except ProcessLookupError:
+                return self.poll()
+            except OSError:
+                pidfd = None # such as a kernel older than 5.3
+            if pidfd is not None:
+                # A pidfd turns readable once the process exits, even one that is not our child
+                try:
+                    ready, _, _ = select.select([pidfd], [], [], timeout)
+                finally:
+                    os.close(pidfd)
+                if not ready:
+                    raise subprocess.TimeoutExpired(cmd=str(self.pid), timeout=timeout)
+                if self.poll() is None:
+                    self.returncode = 0 # exited, but its exit code cannot be read
+                return self.returncode
+
+        # Processes that are not our children cannot be waited on, so poll them
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(cmd=str(self.pid), timeout=timeout)
+            time.sleep(0.25)
+        return self.returncode
+
+    def terminate(self) -> None:
+        if sys.platform == "win32":
+            win32api.TerminateProcess(self._handle, 1)
+        else:
+            os.kill(self.pid, signal.SIGTERM)
+
+    def kill(self) -> None:
+        if sys.platform == "win32":
+            win32api.TerminateProcess(self._handle, 1)
+        else:
+            os.kill(self.pid, signal.SIGKILL)
+
+
+def follow_log(log_fp: str | Path, proc, poll_interval: float = 0.5, from_start: bool = False) -> Iterator[str]:
+    """
+    Yields the lines appended to the log file until the process exits. Lines already in the file are skipped unless
+    `from_start` is set.
+    """
+    try:
+        file = open(log_fp, "r", encoding="utf-8", errors="replace")
+    except OSError as e:
+        logger.warning(f"Cannot follow '{log_fp}': {e}")
+        return
+
+    with file:
+        if not from_start:
+            file.seek(0, os.SEEK_END)
+        partial = ""
+        exited = False
+        while True:
+            chunk = file.readline()
+            if chunk:
+                partial += chunk
+                if partial.endswith("\n"):
+                    yield partial
+                    partial = ""
+                continue
+
+            if exited:
+                if partial:
+                    yield partial
+                return
+            # One more read after the exit picks up the lines written right before it
+            exited = proc.poll() is not None
+            if not exited:
+                time.sleep(poll_interval)
+
+
+async def follow_log_async(
+    log_fp: str | Path, proc, poll_interval: float = 0.5, from_start: bool = False
+) -> AsyncIterator[str]:
+    """
+    `follow_log` for the asyncio runtime. Waits on the event loop instead of holding a thread per followed log.
+    """
+    try:
+        file = open(log_fp, "r", encoding="utf-8", errors="replace")
+    except OSError as e:
+        logger.warning(f"Cannot follow '{log_fp}': {e}")
+        return
+
+    with file:
+        if not from_start:
+            file.seek(0, os.SEEK_END)
+        partial = ""
+        exited = False
+        while True:
+            chunk = file.readline()
+            if chunk:
+                partial += chunk
+                if partial.endswith("\n"):
+                    yield partial
+                    partial = ""
+                continue
+
+            if exited:
+                if partial:
+                    yield partial
+                return
+            exited = proc.poll() is not None
+            if not exited:
+                await asyncio.sleep(poll_interval)
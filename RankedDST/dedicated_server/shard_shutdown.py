@@ -0,0 +1,201 @@
+"""
+RankedDST/dedicated_server/shard_shutdown.py
+
+This module shuts down the shards of a cluster. Every shard is stopped on its own thread so the shards save
+and exit in parallel.
+
+A shard walks an escalation ladder until it exits:
+1. `console` - sends `c_shutdown(true)` over stdin so the world is saved before exiting. Shards without a stdin pipe,
+   such as adopted ones, are sent SIGINT instead, which the dedicated server also handles by saving and quitting.
+   Windows has no such signal for a process of another console, so there adopted shards skip this step and their
+   world is not saved.
+2. `terminate` - SIGTERM to the process group (terminate on Windows)
+3. `kill` - SIGKILL to the process group (kill on Windows)
+
+Each step waits for the process exit notification for up to its timeout before moving to the next step.
+"""
+import os
+import sys
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from RankedDST.tools.logger import logger
+
+ESCALATION_STEPS = ["console", "terminate", "kill"]
+
+# (step, seconds to wait for the shard to exit after the step)
+DEFAULT_ESCALATION: list[tuple[str, float]] = [
+    ("console", 20.0),
+    ("terminate", 5.0),
+    ("kill", 2.0),
+]
+
+CONSOLE_SHUTDOWN_COMMAND = "c_shutdown(true)\n"
+
+
+@dataclass
+class ShardShutdownResult:
+    """
+    The outcome of shutting down a single shard.
+
+    outcome is the escalation step that made the shard exit, `'already_down'` if it was not running, or
+    `'failed'` if it was still running after the whole ladder.
+    """
+    match_id: str
+    shard: str
+    outcome: str
+    latency: float
+    returncode: Optional[int]
+
+
+def _watch_exit(proc: subprocess.Popen) -> threading.Event:
+    """
+    Returns an event that is set once the process exits. A daemon thread blocks on `proc.wait()` so
+    nothing has to poll the process.
+    """
+    exited = threading.Event()
+
+    def wait_for_exit():
+        try:
+            proc.wait()
+        finally:
+            exited.set()
+
+    threading.Thread(target=wait_for_exit, daemon=True).start()
+    return exited
+
+
+def _run_step(step: str, proc: subprocess.Popen) -> None:
+    if step == "console":
+        if proc.stdin is not None:
+            proc.stdin.write(CONSOLE_SHUTDOWN_COMMAND)
+            proc.stdin.flush()
+        elif sys.platform != "win32":
+            os.kill(proc.pid, signal.SIGINT)
+        else:
+            raise OSError("The shard was not launched with a stdin pipe")
+    elif step == "terminate":
+        if sys.platform == "win32":
+            proc.terminate()
+        else:
+            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+    elif step == "kill":
+        if sys.platform == "win32":
+            proc.kill()
+        else:
+            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+
+
+def shutdown_shard(
+    match_id: str,
+    shard: str,
+    proc: Optional[subprocess.Popen],
+    escalation: list[tuple[str, float]] = DEFAULT_ESCALATION,
+) -> ShardShutdownResult:
+    """
+    Shuts down a single shard by walking the escalation ladder until the process exits.
+
+    Parameters
+    ----------
+    match_id: str
+        The match the shard belongs to. Only used for logging and the result.
+    shard: str
+        Either `'Master' or 'Caves'`
+    proc: subprocess.Popen | None
+        The shard's process
+    escalation: list[tuple[str, float]] (default DEFAULT_ESCALATION)
+        The steps to try, in order, with the seconds to wait for an exit after each one.
+
+    Returns
+    -------
+    result: ShardShutdownResult
+        Which step stopped the shard and how long it took.
+    """
+    start = time.perf_counter()
+    if proc is None or proc.poll() is not None:
+        return ShardShutdownResult(
+            match_id=match_id,
+            shard=shard,
+            outcome="already_down",
+            latency=0.0,
+            returncode=proc.returncode if proc is not None else None
+        )
+
+    exited = _watch_exit(proc)
+    outcome = "failed"
+
+    for step, step_timeout in escalation:
+        assert step in ESCALATION_STEPS, f"Escalation step must be in {ESCALATION_STEPS}. Was given: {step}"
+        if exited.is_set():
+            break
+        if step == "console" and proc.stdin is None and sys.platform == "win32":
+            # Adopted shards have no console pipe. Waiting for a save nobody asked for only delays the shutdown.
+            continue
+
+        logger.info(f"Shutting down the {shard} shard of match {match_id} ({step})")
+        try:
+            _run_step(step=step, proc=proc)
+        except (OSError, ValueError) as e:
+            # Raised when the pipe is closed or the process group is already gone
+            logger.warning(f"Shutdown step '{step}' failed for the {shard} shard: {e}")
+
+        if exited.wait(timeout=step_timeout):
+            outcome = step
+            break
+
+    latency = time.perf_counter() - start
+    if outcome == "failed":
+        logger.error(f"💀 The {shard} shard of match {match_id} is still running after {latency:.2f}s 💀")
+    else:
+        logger.info(f"The {shard} shard of match {match_id} stopped after {latency:.2f}s ({outcome})")
+
+    return ShardShutdownResult(
+        match_id=match_id,
+        shard=shard,
+        outcome=outcome,
+        latency=latency,
+        returncode=proc.poll()
+    )
+
+
+def shutdown_shards(
+    match_id: str,
+    processes: dict[str, Optional[subprocess.Popen]],
+    escalation: list[tuple[str, float]] = DEFAULT_ESCALATION,
+) -> list[ShardShutdownResult]:
+    """
+    Shuts down every shard of a cluster in parallel. Blocks until all of them are done.
+
+    Parameters
+    ----------
+    match_id: str
+        The match the shards belong to
+    processes: dict[str, subprocess.Popen | None]
+        The shard processes keyed by shard name
+    escalation: list[tuple[str, float]] (default DEFAULT_ESCALATION)
+        The escalation ladder used for every shard
+
+    Returns
+    -------
+    results: list[ShardShutdownResult]
+        One result per shard, in the order of the processes given
+    """
+    results: dict[str, ShardShutdownResult] = {}
+
+    def run(shard: str, proc: Optional[subprocess.Popen]):
+        results[shard] = shutdown_shard(match_id=match_id, shard=shard, proc=proc, escalation=escalation)
+
+    threads = [
+        threading.Thread(target=run, args=(shard, proc), daemon=True)
+        for shard, proc in processes.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return [results[shard] for shard in processes]
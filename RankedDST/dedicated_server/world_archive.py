@@ -0,0 +1,276 @@
+"""
+RankedDST/dedicated_server/world_archive.py
+
+This module holds the archive backends used by `world_cleanup`. The work runs inside its archiving worker processes.
+
+- `zip`: every match folder is deflated into its own ZIP
+- `store`: a content addressed store. Every file is stored once as a compressed blob named by the SHA-256 of its
+  contents (`Archive Store/objects/ab/abcdef...`) and each match gets a manifest mapping its files to their blobs
+  (`Archive Store/manifests/<match folder>.json`). Consecutive matches share most of their files, so only the
+  changed files take up new space.
+
+It only imports the standard library (and the stdlib-only `atomic_file`), since every worker process imports it on
+start up.
+"""
+import hashlib
+import json
+import os
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+from RankedDST.tools.atomic_file import hash_file
+
+TMP_SUFFIX = ".tmp"
+
+ARCHIVE_BACKENDS = ["zip", "store"]
+STORE_DIR_NAME = "Archive Store"
+BLOB_COMPRESSION_LEVEL = 6 # the ZIP_DEFLATED default
+
+archive_backend = "zip"
+
+
+def set_archive_backend(backend: str) -> None:
+    """
+    Selects the backend new archives are written with. Existing archives of either backend stay readable.
+    """
+    if backend not in ARCHIVE_BACKENDS:
+        raise ValueError(f"Archive backend must be one of {ARCHIVE_BACKENDS}, got '{backend}'")
+
+    global archive_backend
+    archive_backend = backend
+
+
+def lower_priority() -> None:
+    """
+    Pool initializer. Archiving yields the CPU to the shards and the UI.
+    """
+    if hasattr(os, "nice"):
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}{TMP_SUFFIX}")
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+# -------------------- ZIP BACKEND -------------------- #
+def zip_directory(src: str | Path, dst_zip: str | Path) -> int:
+    """
+    Deflates the directory into a ZIP. The archive is written next to its destination and moved into place once
+    complete, so an interrupted worker never leaves a truncated ZIP behind.
+
+    Returns
+    -------
+    size: int
+        The size of the ZIP in bytes
+    """
+    src, dst_zip = Path(src), Path(dst_zip)
+    tmp_zip = dst_zip.with_name(dst_zip.name + TMP_SUFFIX)
+    try:
+        with zipfile.ZipFile(tmp_zip, "w", zipfile.ZIP_DEFLATED) as zf:
+            for p in src.rglob("*"):
+                zf.write(p, p.relative_to(src))
+        os.replace(tmp_zip, dst_zip)
+    except BaseException:
+        tmp_zip.unlink(missing_ok=True)
+        raise
+    return dst_zip.stat().st_size
+
+
+# -------------------- CONTENT ADDRESSED STORE -------------------- #
+def _blob_path(store_dir: Path, digest: str) -> Path:
+    return store_dir / "objects" / digest[:2] / digest
+
+
+def _manifest_path(store_dir: Path, name: str) -> Path:
+    return store_dir / "manifests" / f"{name}.json"
+
+
+def store_directory(src: str | Path, store_dir: str | Path) -> int:
+    """
+    Adds every file of the directory to the store and writes its manifest last, so a manifest only exists once all
+    of its blobs do. The manifest is named after the directory.
+
+    Returns
+    -------
+    size: int
+        The bytes newly written to the store. Files whose blob already exists cost nothing.
+    """
+    src, store_dir = Path(src), Path(store_dir)
+    (store_dir / "manifests").mkdir(parents=True, exist_ok=True)
+
+    files: dict[str, dict] = {}
+    written = 0
+    for p in sorted(src.rglob("*")):
+        if not p.is_file():
+            continue
+
+        data = p.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        files[p.relative_to(src).as_posix()] = {"hash": digest, "size": len(data), "mtime": p.stat().st_mtime}
+
+        blob_fp = _blob_path(store_dir, digest)
+        if blob_fp.exists():
+            continue
+        blob_fp.parent.mkdir(parents=True, exist_ok=True)
+        blob = zlib.compress(data, BLOB_COMPRESSION_LEVEL)
+        _write_atomic(blob_fp, blob)
+        written += len(blob)
+
+    manifest = {
+        "name": src.name,
+        "created_at": time.time(),
+        "files": files,
+        "size": sum(entry["size"] for entry in files.values()),
+    }
+    manifest_data = json.dumps(manifest, indent=1).encode("utf-8")
+    _write_atomic(_manifest_path(store_dir, src.name), manifest_data)
+    return written + len(manifest_data)
+
+
+def list_stored(store_dir: str | Path) -> list[str]:
+    """
+    Returns the names of the matches in the store.
+    """
+    manifests_dir = Path(store_dir) / "manifests"
+    if not manifests_dir.is_dir():
+        return []
+    return sorted(p.stem for p in manifests_dir.glob("*.json"))
+
+
+def read_manifest(store_dir: str | Path, name: str) -> dict:
+    """
+    Returns the manifest of a stored match. Raises FileNotFoundError if the match is not stored.
+    """
+    with open(_manifest_path(Path(store_dir), name), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def extract_stored(store_dir: str | Path, name: str, dst: str | Path) -> Path:
+    """
+    Rebuilds a stored match folder at `dst`. Every blob is checked against its hash.
+
+    Returns
+    -------
+    dst: Path
+        The folder the match was extracted to
+    """
+    store_dir, dst = Path(store_dir), Path(dst)
+    manifest = read_manifest(store_dir, name)
+
+    for rel_path, entry in manifest["files"].items():
+        data = zlib.decompress(_blob_path(store_dir, entry["hash"]).read_bytes())
+        if hashlib.sha256(data).hexdigest() != entry["hash"]:
+            raise ValueError(f"Blob of '{rel_path}' in '{name}' is corrupt")
+
+        file_fp = dst / rel_path
+        file_fp.parent.mkdir(parents=True, exist_ok=True)
+        file_fp.write_bytes(data)
+        os.utime(file_fp, (entry["mtime"], entry["mtime"]))
+    return dst
+
+
+def manifest_blobs(store_dir: str | Path, name: str) -> list[str]:
+    """
+    Returns the distinct blobs the manifest of a stored match refers to.
+    """
+    return sorted({entry["hash"] for entry in read_manifest(store_dir, name)["files"].values()})
+
+
+def delete_stored(store_dir: str | Path, name: str, orphaned_blobs: list[str] | None = None) -> int:
+    """
+    Removes the manifest of a match along with the given blobs, which no other manifest may use. Without
+    `orphaned_blobs`, the blobs stay until `collect_garbage` runs.
+
+    Returns
+    -------
+    freed: int
+        The bytes deleted
+    """
+    store_dir = Path(store_dir)
+    freed = 0
+    for fp in [_manifest_path(store_dir, name)] + [_blob_path(store_dir, digest) for digest in orphaned_blobs or []]:
+        try:
+            freed += fp.stat().st_size
+            fp.unlink()
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+def blob_size(store_dir: str | Path, digest: str) -> int:
+    try:
+        return _blob_path(Path(store_dir), digest).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def collect_garbage(store_dir: str | Path) -> int:
+    """
+    Deletes the blobs no manifest refers to, along with files left behind by interrupted writes. Must not run while
+    matches are being stored.
+
+    Returns
+    -------
+    freed: int
+        The bytes deleted
+    """
+    store_dir = Path(store_dir)
+    objects_dir = store_dir / "objects"
+    if not objects_dir.is_dir():
+        return 0
+
+    referenced: set[str] = set()
+    for name in list_stored(store_dir):
+        try:
+            referenced.update(entry["hash"] for entry in read_manifest(store_dir, name)["files"].values())
+        except (OSError, ValueError, KeyError):
+            # An unreadable manifest keeps everything, rather than risk deleting blobs it may refer to
+            return 0
+
+    freed = 0
+    for blob_fp in objects_dir.glob("*/*"):
+        if blob_fp.name in referenced:
+            continue
+        freed += blob_fp.stat().st_size
+        blob_fp.unlink(missing_ok=True)
+    return freed
+
+
+def archive_directory(src: str | Path, past_dir: str | Path, backend: str) -> dict[str, str | int | list[str]]:
+    """
+    Archives a match folder into `past_dir` with the given backend. The entry point of the worker processes.
+
+    Returns
+    -------
+    result: dict[str, str | int | list[str]]
+        `backend`, `path` (relative to `past_dir`), `size` (the bytes written), `checksum` (SHA-256 of the ZIP or of
+        the manifest) and `blobs` (the distinct blobs the manifest refers to, empty for ZIPs)
+    """
+    src, past_dir = Path(src), Path(past_dir)
+    if backend == "store":
+        store_dir = past_dir / STORE_DIR_NAME
+        size = store_directory(src, store_dir)
+        manifest_fp = _manifest_path(store_dir, src.name)
+        return {
+            "backend": backend,
+            "path": manifest_fp.relative_to(past_dir).as_posix(),
+            "size": size,
+            "checksum": hash_file(manifest_fp),
+            "blobs": manifest_blobs(store_dir, src.name),
+        }
+
+    zip_fp = past_dir / f"{src.name}.zip"
+    size = zip_directory(src, zip_fp)
+    return {"backend": backend, "path": zip_fp.name, "size": size, "checksum": hash_file(zip_fp), "blobs": []}
@@ -1,19 +1,31 @@
 """
 RankedDST/dedicated_server/world_cleanup.py
 
-This module is tasked with zipping up old ranked DST worlds and moving them to a
-new location. Up to 5 will be kept. The rest are deleted.
+This module is tasked with archiving old ranked DST worlds (as ZIPs or into the content addressed
+archive store, see `world_archive`) and moving them to a new location. Archives the retention policy of
+`archive_index` does not keep are deleted. It also deletes old logs.
+
+Archiving runs in the background in a pool of worker processes, so it never holds up connecting or launching.
 """
-from datetime import datetime, timedelta
 from pathlib import Path
+import multiprocessing
+import os
 import shutil
-import zipfile
+import threading
+import time
 import re
 
 import RankedDST.tools.state as state
 from RankedDST.tools.logger import logger, LOG_DIR
+from RankedDST.tools.log_rotation import prune_logs
+from RankedDST.dedicated_server.server_manager import SERVER_MANAGER
+from RankedDST.dedicated_server.shard_resume import load_runtime
+from RankedDST.dedicated_server.world_snapshot import remove_snapshots
+import RankedDST.dedicated_server.world_archive as world_archive
+from RankedDST.dedicated_server.world_archive import TMP_SUFFIX, lower_priority, archive_directory
+from RankedDST.dedicated_server.archive_index import ArchiveEntry, ArchiveIndex, get_archive_index
 
-NUM_SAVES = 5
+ARCHIVE_WORKERS = max(1, (os.cpu_count() or 2) // 2)
 
 MATCH_RE = re.compile(r"^Ranked DST Match (\d+)$")
 
@@ -29,48 +41,255 @@ def _extract_match_number(path: Path) -> int | None:
     return int(m.group(1))
 
 
-def _zip_directory(src: Path, dst_zip: Path) -> None:
-    with zipfile.ZipFile(dst_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        for p in src.rglob("*"):
-            zf.write(p, p.relative_to(src))
+def _clusters_in_use() -> set[str]:
+    """
+    The folder names of the clusters that are running or reserved, and of the live matches that can still be resumed.
+    """
+    in_use = {cluster.cluster_name for cluster in SERVER_MANAGER.get_clusters()}
+    in_use |= {record.get("cluster_name") for record in load_runtime().values()}
+    return in_use
+
+
+def _clean_old_logs() -> None:
+    logger.info("Cleaning 1 week old logs")
+    deleted = prune_logs(LOG_DIR, max_age_days=7)
+    for log_file in deleted:
+        logger.info(f"Deleted old log: {log_file.name}")
 
 
-def clean_old_files() -> None:
+class ArchiveJob:
     """
-    1. Move ALL 'Ranked DST Match *' folders into 'Past Ranked Matches' as ZIPs
-    2. In 'Past Ranked Matches', keep only the 5 most recent ZIPs
-       (by match number), delete the rest
-    3. Delete 1 week old logs
+    A background run that zips match folders in parallel worker processes. Folders are only deleted once their
+    ZIP is complete, so a cancelled job leaves the remaining folders for the next run. A folder whose cluster was
+    launched again while it was being archived is kept, and its archive is discarded.
     """
-    
-    
-    log_path = Path(LOG_DIR)
-    if log_path.exists():
-        logger.info("Cleaning 1 week old logs")
-        cutoff_date = datetime.now().date() - timedelta(days=7)
-
-        for log_file in log_path.glob("*.log"):
-            try:
-                date_str = log_file.name.split("-")[0:3]
-                date_str = "-".join(date_str)  # YYYY-MM-DD
-                log_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            except Exception:
-                logger.warning(f"Skipping unexpected log format: {log_file.name}")
+
+    def __init__(self, folders: list[Path], past_dir: Path, backend: str, workers: int = ARCHIVE_WORKERS):
+        self.folders = folders
+        self.past_dir = past_dir
+        self.index: ArchiveIndex | None = None # loaded by `run`, as a missing index is rebuilt by hashing every archive
+        self.backend = backend
+        self.workers = max(1, min(workers, len(folders)))
+        self.total = len(folders)
+        self.completed = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.cancelled = False
+
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._pool = None
+        self._start_time = time.perf_counter()
+
+    def progress(self) -> dict[str, int | bool | float]:
+        """
+        Returns
+        -------
+        progress: dict[str, int | bool | float]
+            The number of folders in the job, how many were archived or failed, and whether it is finished.
+        """
+        with self._lock:
+            return {
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "bytes_written": self.bytes_written,
+                "cancelled": self.cancelled,
+                "finished": self._finished.is_set(),
+                "elapsed": round(time.perf_counter() - self._start_time, 3),
+            }
+
+    def is_finished(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Waits for the job to finish. Returns False on timeout.
+        """
+        return self._finished.wait(timeout=timeout)
+
+    def cancel(self) -> None:
+        """
+        Stops the job. ZIPs being written are discarded and their folders are left in place.
+        """
+        with self._lock:
+            if self._finished.is_set():
+                return
+            self.cancelled = True
+            pool = self._pool
+
+        if pool is not None:
+            pool.terminate()
+        logger.info(f"Archiving cancelled after {self.completed}/{self.total} match folder(s)")
+        self._finished.set()
+
+    def _store_archive(self, folder: Path, result: dict) -> bool:
+        """
+        Records the archive in the index and deletes the folder. Returns False if the folder is kept instead.
+        """
+        self.index.add(name=folder.name, match_number=_extract_match_number(folder), result=result)
+        if folder.name in _clusters_in_use():
+            # Removing the entry also deletes the archive and the blobs only it used
+            self.index.remove(folder.name)
+            logger.warning(f"Kept {folder.name}: its cluster was launched again while it was archived")
+            return False
+
+        try:
+            self.index.save()
+        except OSError:
+            # The folder stays, so the archive is discarded rather than recorded only in memory
+            self.index.remove(folder.name)
+            raise
+        shutil.rmtree(folder, ignore_errors=True)
+        remove_snapshots(folder)
+        return True
+
+    def _on_archived(self, folder: Path, result: dict) -> None:
+        # Runs on the pool's result handler thread, which must not die or the job never finishes
+        try:
+            stored = self._store_archive(folder, result)
+        except Exception as e:
+            self._on_failed(folder, e)
+            return
+
+        with self._lock:
+            if stored:
+                self.completed += 1
+                self.bytes_written += result["size"]
+            else:
+                self.failed += 1
+            done = self.completed + self.failed
+        if stored:
+            logger.info(f"Archived {folder.name} ({done}/{self.total})")
+        self._check_finished()
+
+    def _on_failed(self, folder: Path, error: BaseException) -> None:
+        with self._lock:
+            self.failed += 1
+        logger.error(f"Failed to archive {folder.name}: {error}")
+        self._check_finished()
+
+    def _check_finished(self) -> None:
+        with self._lock:
+            if self.completed + self.failed < self.total or self.cancelled:
+                return
+            pool, self._pool = self._pool, None
+
+        try:
+            if pool is not None:
+                pool.close()
+            self.index.apply_retention()
+        except Exception as e:
+            logger.error(f"Failed to apply the archive retention policy: {e}")
+        finally:
+            self._finished.set()
+        logger.info(
+            f"Archived {self.completed} match folder(s) in {time.perf_counter() - self._start_time:.1f}s "
+            f"with {self.workers} worker(s)"
+        )
+
+    def _prepare(self) -> None:
+        """
+        Loads the archive index, deletes the folders that are already archived and collects the blobs left in the
+        archive store by cancelled jobs.
+        """
+        self.index = _get_index(self.past_dir)
+        in_use = _clusters_in_use()
+
+        folders: list[Path] = []
+        for folder in self.folders:
+            if folder.name in in_use:
+                continue
+            if not self.index.contains(folder.name):
+                folders.append(folder)
                 continue
+            logger.info(f"{folder.name} is already archived")
+            shutil.rmtree(folder, ignore_errors=True)
+            remove_snapshots(folder)
+
+        with self._lock:
+            self.folders = folders
+            self.total = len(folders)
+            self.workers = max(1, min(self.workers, len(folders)))
+
+        # Nothing is being stored yet, as only one job runs at a time
+        freed = world_archive.collect_garbage(self.index.store_dir)
+        if freed:
+            logger.info(f"Freed {freed / (1024 * 1024):.1f} MB of unused archive blobs")
+
+    def run(self) -> None:
+        """
+        Loads the archive index, then starts the worker processes and queues every folder. Returns without waiting for
+        the workers.
+        """
+        try:
+            self._prepare()
+        except Exception as e:
+            logger.error(f"Failed to prepare archiving: {e}")
+            self._finished.set()
+            return
+
+        if self.total == 0:
+            self._check_finished()
+            return
+
+        # Spawned rather than forked, as forking a process with running threads can deadlock the children
+        context = multiprocessing.get_context("spawn")
+        with self._lock:
+            if self.cancelled:
+                return
+            self._pool = context.Pool(processes=self.workers, initializer=lower_priority)
+
+        logger.info(f"🗜️ Archiving {self.total} match folder(s) with {self.workers} worker(s) ({self.backend}) 🗜️")
+        for folder in self.folders:
+            self._pool.apply_async(
+                archive_directory,
+                (str(folder), str(self.past_dir), self.backend),
+                callback=lambda result, folder=folder: self._on_archived(folder, result),
+                error_callback=lambda error, folder=folder: self._on_failed(folder, error),
+            )
+
+
+_archive_job: ArchiveJob | None = None
+_archive_lock = threading.Lock()
 
-            if log_date < cutoff_date:
-                try:
-                    logger.info(f"Deleting old log: {log_file.name}")
-                    log_file.unlink()
-                except Exception as e:
-                    logger.error(f"Failed to delete {log_file.name}: {e}")
+
+def _get_past_dir() -> Path | None:
+    base_dir = state.get_user_data(get_key="cluster_path")
+    if not isinstance(base_dir, str) or not base_dir:
+        return None
+    return Path(base_dir) / "Past Ranked Matches"
+
+
+def _get_index(past_dir: Path) -> ArchiveIndex:
+    return get_archive_index(past_dir, match_number_of=lambda name: _extract_match_number(Path(name)))
+
+
+def clean_old_files() -> ArchiveJob | None:
+    """
+    1. Delete 1 week old logs
+    2. Move ALL 'Ranked DST Match *' folders into 'Past Ranked Matches' as archives
+    3. In 'Past Ranked Matches', delete the archives the retention policy does not keep
+       (by default all but the 5 most recent by match number, see `archive_index`)
+
+    Steps 2 and 3, along with loading the archive index, run in the background and do not block the caller. Use the
+    returned job to follow or cancel them.
+
+    Returns
+    -------
+    job: ArchiveJob | None
+        The archiving job. None if there is no cluster path. If a job is already running, that job is returned.
+    """
+    global _archive_job
+
+    _clean_old_logs()
 
     logger.info("Cleaning old Ranked DST matches (simple mode)...")
 
     base_dir = state.get_user_data(get_key="cluster_path")
     if not isinstance(base_dir, str) or not base_dir:
         logger.debug("Cannot cleanup without a cluster path")
-        return
+        return None
     
     base_dir = Path(base_dir)
 
@@ -78,42 +297,85 @@ def clean_old_files() -> None:
     past_dir = base_dir / "Past Ranked Matches"
     past_dir.mkdir(exist_ok=True)
 
-    for p in base_dir.iterdir():
-        if not p.is_dir():
-            continue
+    with _archive_lock:
+        if _archive_job is not None and not _archive_job.is_finished():
+            return _archive_job
+
+        # ZIPs left behind by a cancelled job
+        for tmp_zip in past_dir.glob(f"*.zip{TMP_SUFFIX}"):
+            tmp_zip.unlink(missing_ok=True)
+
+        # Running clusters are in use, and clusters of live matches can still be resumed
+        in_use = _clusters_in_use()
 
-        match_num = _extract_match_number(p)
-        if match_num is None:
-            continue
+        folders: list[Path] = []
+        for p in base_dir.iterdir():
+            if not p.is_dir() or p.name in in_use:
+                continue
+
+            match_num = _extract_match_number(p)
+            if match_num is None:
+                continue
+
+            folders.append(p)
+
+        _archive_job = ArchiveJob(folders=folders, past_dir=past_dir, backend=world_archive.archive_backend)
+        job = _archive_job
+
+    threading.Thread(target=job.run, daemon=True).start()
+    return job
+
+
+def get_archive_job() -> ArchiveJob | None:
+    """
+    Returns the most recent archiving job, if any.
+    """
+    return _archive_job
 
-        zip_path = past_dir / f"{p.name}.zip"
 
-        logger.info(f"Archiving {p.name} -> {zip_path.name}")
+def cancel_archiving() -> None:
+    """
+    Cancels the running archiving job, if any.
+    """
+    job = _archive_job
+    if job is not None:
+        job.cancel()
 
-        if not zip_path.exists():
-            _zip_directory(p, zip_path)
 
-        shutil.rmtree(p, ignore_errors=True)
+def list_archives() -> list[ArchiveEntry]:
+    """
+    Returns the archived matches, newest first. Read from the archive index without scanning the directory.
+    """
+    past_dir = _get_past_dir()
+    if past_dir is None or not past_dir.exists():
+        return []
+    return _get_index(past_dir).list_entries()
 
-    zips: list[Path] = []
 
-    for p in past_dir.iterdir():
-        if not p.is_file():
-            continue
+def restore_archive(name: str, dst: str | Path | None = None) -> Path:
+    """
+    Extracts an archived match folder.
 
-        match_num = _extract_match_number(p)
-        if match_num is not None:
-            zips.append(p)
+    Parameters
+    ----------
+    name: str
+        The match folder name, such as 'Ranked DST Match 12'
+    dst: str | Path | None (default None)
+        Where to extract the folder to. Defaults to its original place in the cluster path.
 
-    # Sort newest to oldest
-    zips.sort(
-        key=lambda p: _extract_match_number(p),
-        reverse=True,
-    )
+    Returns
+    -------
+    dst: Path
+        The extracted match folder
+    """
+    past_dir = _get_past_dir()
+    if past_dir is None:
+        raise ValueError("Cannot restore an archive without a cluster path")
 
-    logger.info(f"Found {len(zips)} archived matches")
+    dst = Path(dst) if dst is not None else past_dir.parent / name
+    if dst.exists():
+        raise ValueError(f"'{dst}' already exists")
 
-    # Delete everything beyond the newest NUM_SAVES
-    for old_zip in zips[NUM_SAVES:]:
-        logger.info(f"Deleting old archive {old_zip.name}")
-        old_zip.unlink(missing_ok=True)
+    restored = _get_index(past_dir).restore(name, dst)
+    logger.info(f"Restored {name} to '{restored}'")
+    return restored
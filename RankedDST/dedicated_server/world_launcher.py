@@ -5,33 +5,64 @@ Production is implemented in the GoLang app.
 """
 
 import os
-import sys
-import signal
-import re
+import json
 import subprocess
-import time
 import threading
+from typing import AsyncIterable, Callable, Iterable
 import webview
-import socketio
 
 import RankedDST.tools.state as state
-from RankedDST.tools.secret import hash_string
-from RankedDST.tools.job_object import assign_process
+from RankedDST.tools.job_object import spawn_process, get_job_usage
+from RankedDST.tools.path_checker import get_nullrender_path
+from RankedDST.tools.atomic_file import hash_bytes, atomic_write_bytes, atomic_write_json, atomic_link_or_copy
+from RankedDST.tools.async_runtime import RUNTIME, asyncio_enabled, open_output_pipe, read_lines
 
 from pathlib import Path
 from RankedDST.tools.logger import logger, server_logger
-from RankedDST.dedicated_server.server_manager import SERVER_MANAGER
+from RankedDST.dedicated_server.server_manager import SERVER_MANAGER, SHARDS, ClusterHandle, apply_port_offset
+from RankedDST.dedicated_server.shard_shutdown import DEFAULT_ESCALATION, shutdown_shards
+import RankedDST.dedicated_server.shard_resume as shard_resume
+import RankedDST.dedicated_server.launch_timeline as timeline
+import RankedDST.dedicated_server.world_snapshot as world_snapshot
+import RankedDST.dedicated_server.shard_output as shard_output
+from RankedDST.networking.outbox import OUTBOX
+from RankedDST.dedicated_server.mod_cache import is_cache_warm
+from RankedDST.dedicated_server.mod_setup import add_mods, clean_mod_ids, prune_unused_mods, record_mod_usage
 from RankedDST.dedicated_server.world_cleanup import clean_old_files
 
 CREATE_NO_WINDOW = 0x08000000
 
 
+# Where each cluster file is written, relative to the cluster directory
+CLUSTER_FILE_PATHS: dict[str, list[str]] = {
+    "ClusterIni": ["cluster.ini"],
+    "MasterServerIni": [os.path.join("Master", "server.ini")],
+    "CavesServerIni": [os.path.join("Caves", "server.ini")],
+    "MasterWorldGenOverride": [os.path.join("Master", "worldgenoverride.lua")],
+    "CavesWorldGenOverride": [os.path.join("Caves", "worldgenoverride.lua")],
+    "ModOverrides": [os.path.join("Master", "modoverrides.lua"), os.path.join("Caves", "modoverrides.lua")],
+}
+CLUSTER_MANIFEST = ".ranked_dst_manifest.json"
+
+
+def _read_cluster_manifest(manifest_fp: str) -> dict[str, dict]:
+    try:
+        with open(manifest_fp, "r", encoding="utf-8") as file:
+            files = json.load(file).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+    return files if isinstance(files, dict) else {}
+
+
 def create_cluster(
     cluster_dir: str,
     server_configs: dict[str, str],
 ) -> None:
     """
-    Writes the cluster files to disk if not already present
+    Writes the cluster files to disk. Files are keyed by the hash of their contents in a manifest stored in the
+    cluster directory, so only files whose contents changed since the last write are replaced. Changed files are
+    replaced atomically and files shared by both shards (such as `modoverrides.lua`) are written once and hard
+    linked. The manifest is written last, which makes retrying after a crash safe.
 
     Parameters
     ----------
@@ -47,50 +78,64 @@ def create_cluster(
         "MasterWorldGenOverride", "CavesWorldGenOverride", "ModOverrides" # .lua files
         ```
     """
-    if os.path.exists(cluster_dir):
-        logger.info("Cluster directory already exists!")
-        return
+    if any(required_key not in server_configs.keys() for required_key in CLUSTER_FILE_PATHS):
+        logger.error("Missing required file")
+        raise ValueError("Missing required file")
 
-    logger.info(f"Creating cluster directory at: '{cluster_dir}'")
-    os.makedirs(cluster_dir, exist_ok=True)
+    logger.info(f"Writing cluster directory at: '{cluster_dir}'")
     os.makedirs(os.path.join(cluster_dir, "Master"), exist_ok=True)
     os.makedirs(os.path.join(cluster_dir, "Caves"), exist_ok=True)
 
-    required_keys = ["ClusterIni", "MasterServerIni", "CavesServerIni", "MasterWorldGenOverride", "CavesWorldGenOverride", "ModOverrides"]
-    if any(required_key not in server_configs.keys() for required_key in required_keys):
-        logger.error("Missing required file")
-        raise ValueError("Missing required file")
-    
-    # Location at cluster_dir
-    key_to_path = {
-        "ClusterIni": "cluster.ini",
-        "MasterServerIni" : os.path.join("Master", "server.ini"),
-        "CavesServerIni" : os.path.join("Caves", "server.ini"),
-        "MasterWorldGenOverride" : os.path.join("Master", "worldgenoverride.lua"),
-        "CavesWorldGenOverride" : os.path.join("Caves", "worldgenoverride.lua"),
-    }
+    manifest_fp = os.path.join(cluster_dir, CLUSTER_MANIFEST)
+    manifest = _read_cluster_manifest(manifest_fp)
+    new_manifest: dict[str, dict] = {}
+
+    skipped, written, linked = 0, 0, 0
+    for key, rel_paths in CLUSTER_FILE_PATHS.items():
+        data = server_configs[key].encode("utf-8")
+        digest = hash_bytes(data)
+
+        # The first up to date copy is reused for every other path with the same contents
+        source_fp: str | None = None
+        for rel_path in rel_paths:
+            write_fp = os.path.join(cluster_dir, rel_path)
+            new_manifest[rel_path] = {"sha256": digest, "size": len(data)}
+
+            recorded = manifest.get(rel_path, {})
+            try:
+                up_to_date = recorded.get("sha256") == digest and os.path.getsize(write_fp) == len(data)
+            except OSError:
+                up_to_date = False
+
+            if up_to_date:
+                skipped += 1
+            elif source_fp is not None:
+                atomic_link_or_copy(source_fp, write_fp)
+                linked += 1
+            else:
+                atomic_write_bytes(write_fp, data)
+                written += 1
+
+            if source_fp is None:
+                source_fp = write_fp
 
-    for key, path in key_to_path.items():
-        write_fp = os.path.join(cluster_dir, path)
-        write_text = server_configs.get(key)
-        with open(write_fp, mode="w", encoding="utf-8") as file:
-            file.write(write_text)
+    if new_manifest != manifest:
+        atomic_write_json(manifest_fp, {"files": new_manifest})
 
-    for shard in ["Master", "Caves"]:
-        write_fp = os.path.join(cluster_dir, shard, "modoverrides.lua")
-        write_text = server_configs.get("ModOverrides")
-        with open(write_fp, mode="w", encoding="utf-8") as file:
-            file.write(write_text)
+    logger.info(f"Cluster files: {written} written, {linked} shared, {skipped} unchanged")
 
 def ensure_mods(
     mod_ids: list[str],
     steam_mods_path: str,
+    match_id: str | None = None,
+    prune: bool = False,
 ) -> None:
     """
     Ensures that the `dedicated_server_mods_setup.lua` file at the **steam_mods_path** contains all the
     mod ids provided. If not, then they will be added to the file.
 
-    Each mod id must have a corresponding `ServerModSetup("<id>")` line in the file.
+    Each mod id must have a corresponding `ServerModSetup("<id>")` line in the file. The file is read through
+    the cached index in `mod_setup.py`.
 
     Parameters
     ----------
@@ -98,52 +143,35 @@ def ensure_mods(
         A list of workshop ids for the mods that must exist at the `dedicated_server_mods_setup.lua` file.
     steam_mods_path: str
         The directory that must contain the `dedicated_server_mods_setup.lua` file.
+    match_id: str | None (default None)
+        The match the mods are needed for. Used to remember which mods recent matches used.
+    prune: bool (default False)
+        If true, mods previously added by the app that no recent match used are removed from the file.
     """
+    cleaned_ids = clean_mod_ids(mod_ids)
 
-    mod_setup_file = Path(steam_mods_path) / "dedicated_server_mods_setup.lua"
-    valid_id = re.compile(r"^[0-9]{6,12}$")
+    added = add_mods(steam_mods_path=steam_mods_path, mod_ids=cleaned_ids)
+    record_mod_usage(match_id=match_id, mod_ids=cleaned_ids, added_ids=added)
 
-    cleaned_ids: list[str] = []
-    for mod_id in mod_ids:
-        mod_id = mod_id.strip()
-        if not valid_id.match(mod_id):
-            raise ValueError(
-                f"Invalid workshop ID: {mod_id!r} (must be 6-12 digits)"
-            )
-        cleaned_ids.append(mod_id)
-
-    existing = ""
-    if mod_setup_file.exists():
-        existing = mod_setup_file.read_text(encoding="utf-8")
+    if prune:
+        prune_unused_mods(steam_mods_path=steam_mods_path)
 
-    missing_lines: list[str] = []
-    for mod_id in cleaned_ids:
-        line = f'ServerModSetup("{mod_id}")'
-        if line not in existing:
-            missing_lines.append(line)
-    
-    if not missing_lines:
-        logger.info(f" All {len(cleaned_ids)} mods already present in {mod_setup_file}")
+    if not added:
+        logger.info(f" All {len(cleaned_ids)} mods already present in {steam_mods_path}")
         return
 
-    mod_setup_file.parent.mkdir(parents=True, exist_ok=True)
-
-    with mod_setup_file.open("a", encoding="utf-8") as f:
-        for line in missing_lines:
-            f.write(line + "\n")
-
-    logger.info(f"🧩 Added {len(missing_lines)} new mod(s) to {mod_setup_file}")
+    logger.info(f"🧩 Added {len(added)} new mod(s) to {steam_mods_path}")
 
 
 def launch_shard(
     nullrender_fp: str,
     shard: str,
-    cluster_name: str,
+    cluster: ClusterHandle,
     window: webview.Window | None,
-    client_socket: socketio.Client | None
+    skip_mod_updates: bool = False,
 ) -> subprocess.Popen:
     """
-    Uses the nullrenderer binary to launch a server; either the master or caves. The cluster_name folder
+    Uses the nullrenderer binary to launch a server; either the master or caves. The cluster's folder
     is expected to exist and the shard must be either 'Master' or 'Caves'
 
     Parameters
@@ -152,83 +180,183 @@ def launch_shard(
         The full path to the executable that launches and hosts the DST world.
     shard: str
         Determines the type of server to be launched. Must be either `'Master' or 'Caves'`
-    cluster_name: str
-        The folder name containing valid world files, such as cluster.ini, server.ini... etc.
+    cluster: ClusterHandle
+        The cluster being launched. Its folder contains valid world files, such as cluster.ini, server.ini... etc.
     window: webview.Window | None
         The webview window object. Needed to update the UI when world state changes.
-    client_socket: socketio.Client | None
-        The global socketio object. Needed to emit events to the server when certain events take place.
+    skip_mod_updates: bool (default False)
+        If true, the shard does not check for mod updates. Only safe when every mod is already downloaded.
     """
 
     assert shard in ["Master", "Caves"], "Shard must be 'Master' or 'Caves'"
     logger.info(f" Launching {shard} Shard!")
     cmd = [
         nullrender_fp,
-        "-cluster", cluster_name,
+        "-cluster", cluster.cluster_name,
         "-shard", shard,
     ]
+    if skip_mod_updates:
+        cmd.append("-skip_update_server_mods")
 
     popen_kwargs = {
         "cwd": os.path.dirname(nullrender_fp),
+        "stdin": subprocess.PIPE, # console commands such as c_shutdown
         "stdout": subprocess.PIPE,
         "stderr": subprocess.STDOUT,
         "text": True,
         "bufsize": 1,
     }
-    if sys.platform == "win32":
-        popen_kwargs["creationflags"] = 0x08000000  # CREATE_NO_WINDOW
+
+    if shard_resume.resume_shards:
+        # The shard outlives a crash of the app, which its output has to as well: a pipe would break with the app
+        output_fp = shard_resume.shard_output_path(cluster.cluster_dir, shard)
+        with open(output_fp, "wb") as output_file:
+            popen_kwargs["stdout"] = output_file
+            proc = spawn_process(cmd, outlive_app=True, **popen_kwargs)
+        if asyncio_enabled():
+            lines = shard_resume.follow_log_async(log_fp=output_fp, proc=proc, from_start=True)
+        else:
+            lines = shard_resume.follow_log(log_fp=output_fp, proc=proc, from_start=True)
+    elif asyncio_enabled():
+        # The output is read by the event loop instead of a thread per shard
+        read_end, write_fd = open_output_pipe()
+        popen_kwargs["stdout"] = write_fd
+        try:
+            proc = spawn_process(cmd, **popen_kwargs)
+        except BaseException:
+            read_end.close()
+            raise
+        finally:
+            os.close(write_fd)
+        lines = read_lines(read_end)
     else:
-        popen_kwargs["preexec_fn"] = os.setsid  # create process group
-
-    proc = subprocess.Popen(cmd, **popen_kwargs)
-
-    assign_process(proc)
-    SERVER_MANAGER.set_shard_status(shard=shard, status='launching')
-
-    def stream_output():
-        launched: bool = False
-        for line in proc.stdout:
-            server_logger.info("[%s] %s", shard, line.rstrip())
-
-            if not launched and "Sim paused" in line:
-                logger.info(f"The {shard} shard is launched!")
-                SERVER_MANAGER.set_shard_status(shard=shard, status='launched')
-                launched = True
-
-                master_status, caves_status = SERVER_MANAGER.get_shard_status()
-                if master_status == caves_status and master_status == 'launched':
-                    logger.info("Both shards are launched!")
-                    state.set_match_state(new_state=state.MatchWorldReady, window=window)
-                    raw_secret = state.get_user_data("proxy_secret")
-                    hashed = hash_string(raw_secret)
-
-                    logger.info("Player has generated the world")
-                    client_socket.emit(
-                        "world_generated",
-                        {"proxy_secret_hash": hashed},
-                        namespace="/proxy"
-                    )
-            elif "Leave Announcement" in line:
-                if isinstance(client_socket, socketio.Client) and client_socket.connected and shard == 'Master': # Master shard to avoid duplicate emissions
-                    raw_secret = state.get_user_data("proxy_secret")
-                    hashed = hash_string(raw_secret)
-
-                    logger.info("Player has left the world")
-                    client_socket.emit(
-                        "world_left",
-                        {"proxy_secret_hash": hashed},
-                        namespace="/proxy"
-                    )
-
-    threading.Thread(target=stream_output, daemon=True).start()
+        proc = spawn_process(cmd, **popen_kwargs)
+        lines = proc.stdout
+    cluster.set_shard_status(shard=shard, status='launching')
 
+    launch_timeline = timeline.get_timeline(cluster.match_id)
+    if launch_timeline:
+        launch_timeline.mark(timeline.PhaseSpawned, shard=shard)
+
+    _follow_shard_output(lines=lines, shard=shard, cluster=cluster, window=window)
     return proc
 
 
+def _follow_shard_output(
+    lines: Iterable[str] | AsyncIterable[str],
+    shard: str,
+    cluster: ClusterHandle,
+    window: webview.Window | None,
+) -> None:
+    """
+    Streams the output lines of a shard in the background: on the event loop with the asyncio runtime, otherwise
+    on a thread of its own.
+    """
+    if asyncio_enabled():
+        RUNTIME.submit(_stream_shard_output_async(lines=lines, shard=shard, cluster=cluster, window=window))
+        return
+
+    threading.Thread(
+        target=_stream_shard_output,
+        kwargs={
+            "lines": lines,
+            "shard": shard,
+            "cluster": cluster,
+            "window": window,
+        },
+        daemon=True
+    ).start()
+
+
+def _shard_line_handler(
+    shard: str,
+    cluster: ClusterHandle,
+    window: webview.Window | None,
+) -> Callable[[str], Callable[[], None] | None]:
+    """
+    Creates the handler of a shard's output lines. The handler logs and buffers a line, and returns the reaction to
+    run if the line changes the match state. Reactions may block (they save the cluster and update the UI), so the
+    asyncio runtime runs them off the event loop.
+    """
+    log_prefix = cluster.log_prefix(shard)
+    launch_timeline = timeline.get_timeline(cluster.match_id)
+    launched: bool = cluster.get_shard_status()[SHARDS.index(shard)] == 'launched'
+    output_buffer = shard_output.get_buffer(match_id=cluster.match_id, shard=shard)
+
+    def shard_launched() -> None:
+        shard_resume.save_cluster(cluster=cluster, dedi_path=state.get_user_data("dedi_path"))
+        if cluster.all_launched():
+            logger.info(f"Both shards of match {cluster.match_id} are launched!")
+            timeline.finish_timeline(match_id=cluster.match_id, outcome="ready")
+            world_snapshot.start_snapshots(cluster)
+            state.set_match_state(new_state=state.MatchWorldReady, window=window)
+
+            logger.info("Player has generated the world")
+            OUTBOX.emit("world_generated", {"match_id": cluster.match_id})
+
+    def world_left() -> None:
+        logger.info("Player has left the world")
+        OUTBOX.emit("world_left", {"match_id": cluster.match_id})
+
+    def handle(line: str) -> Callable[[], None] | None:
+        nonlocal launched
+        server_logger.info("%s %s", log_prefix, line.rstrip())
+        output_buffer.append(line)
+        if launch_timeline and not launched:
+            launch_timeline.mark_shard_line(shard=shard, line=line)
+
+        if not launched and "Sim paused" in line:
+            logger.info(f"The {shard} shard of match {cluster.match_id} is launched!")
+            cluster.set_shard_status(shard=shard, status='launched')
+            launched = True
+            return shard_launched
+        elif "Leave Announcement" in line:
+            if shard == 'Master': # Master shard to avoid duplicate emissions
+                return world_left
+        return None
+
+    return handle
+
+
+def _stream_shard_output(
+    lines: Iterable[str],
+    shard: str,
+    cluster: ClusterHandle,
+    window: webview.Window | None,
+) -> None:
+    """
+    Logs the output lines of a shard and reacts to the ones that change the match state.
+    """
+    handle = _shard_line_handler(shard=shard, cluster=cluster, window=window)
+    for line in lines:
+        reaction = handle(line)
+        if reaction is not None:
+            reaction()
+
+
+async def _stream_shard_output_async(
+    lines: AsyncIterable[str],
+    shard: str,
+    cluster: ClusterHandle,
+    window: webview.Window | None,
+) -> None:
+    """
+    `_stream_shard_output` for the asyncio runtime. Lines are handled on the event loop and their reactions on the
+    runtime's pool, one at a time so they keep their order.
+    """
+    handle = _shard_line_handler(shard=shard, cluster=cluster, window=window)
+    try:
+        async for line in lines:
+            reaction = handle(line)
+            if reaction is not None:
+                await RUNTIME.run_blocking(reaction)
+    except Exception as e:
+        logger.error(f"❌ Reading the output of the {shard} shard of match {cluster.match_id} failed: {e}")
+
+
 def start_dedicated_server(
     server_configs: dict[str, str],
     window: webview.Window | None = None,
-    client_socket: socketio.Client | None = None,
 ) -> None:
     """
     Parameters
@@ -245,8 +373,6 @@ def start_dedicated_server(
         ```
     window: webview.Window (default None)
         The webview window object. Needed to update the UI when world state changes.
-    client_socket: socketio.Client (default None)
-        The global socketio object. Needed to emit events to the server when certain events take place.
     """
     base_dir = state.get_user_data(get_key="cluster_path")
     if not isinstance(base_dir, str) or not base_dir:
@@ -255,9 +381,12 @@ def start_dedicated_server(
     
     base_cluster_dir = Path(base_dir)
 
+    match_id = server_configs.pop("MatchId")
+    mod_ids = server_configs.pop("ModIds")
+
     dedi_path = state.get_user_data(get_key='dedi_path')
     logger.info(f"dedi path is: {dedi_path}")
-    nullrender_fp = os.path.join(dedi_path, 'bin64', 'dontstarve_dedicated_server_nullrenderer_x64.exe')
+    nullrender_fp = str(get_nullrender_path(dedi_path))
 
     steam_mods_path = os.path.join(dedi_path, "mods")
 
@@ -266,93 +395,266 @@ def start_dedicated_server(
     assert os.path.exists(nullrender_fp), "Nullrender binary must exist"
     assert os.path.exists(base_cluster_dir), f"Base cluster directory must exist at {base_cluster_dir}"
 
-    if SERVER_MANAGER.is_running():
-        logger.info("⚠️ Dedicated server already running ⚠️")
-        return
+    existing_cluster = SERVER_MANAGER.get_cluster(match_id)
+    if existing_cluster is not None:
+        if existing_cluster.is_running():
+            logger.info(f"⚠️ Dedicated server for match {match_id} already running ⚠️")
+            return
+        SERVER_MANAGER.release_cluster(match_id)
 
-    match_id = server_configs.pop("MatchId")
-    mod_ids = server_configs.pop("ModIds")
+    timeline.start_timeline(match_id=match_id, dedi_path=dedi_path)
 
     cluster_name = f"Ranked DST Match {match_id}"
-    cluster_dir = os.path.join(base_cluster_dir, cluster_name)
-    create_cluster(cluster_dir=cluster_dir, server_configs=server_configs)
-
-    ensure_mods(mod_ids=mod_ids, steam_mods_path=steam_mods_path)
-
-    raw_secret = state.get_user_data("proxy_secret")
-    hashed = hash_string(raw_secret)
+    try:
+        cluster = SERVER_MANAGER.reserve_cluster(
+            match_id=match_id,
+            cluster_name=cluster_name,
+            server_configs=server_configs,
+            cluster_dir=os.path.join(base_cluster_dir, cluster_name)
+        )
+    except Exception:
+        timeline.finish_timeline(match_id=match_id, outcome="failed")
+        raise
+
+    if cluster.port_offset:
+        logger.info(f"Shifting the ports of match {match_id} by {cluster.port_offset}")
+    server_configs = apply_port_offset(server_configs, cluster.port_offset)
+
+    cluster_dir = cluster.cluster_dir
+    try:
+        launch_timeline = timeline.get_timeline(match_id)
+        create_cluster(cluster_dir=cluster_dir, server_configs=server_configs)
+        if launch_timeline:
+            launch_timeline.mark(timeline.PhaseClusterWritten)
+
+        ensure_mods(mod_ids=mod_ids, steam_mods_path=steam_mods_path, match_id=match_id)
+        if launch_timeline:
+            launch_timeline.mark(timeline.PhaseModsReady)
+    except Exception:
+        SERVER_MANAGER.release_cluster(match_id)
+        timeline.finish_timeline(match_id=match_id, outcome="failed")
+        raise
 
     logger.info("Generating World")
-    client_socket.emit(
-        "generating_world",
-        {"proxy_secret_hash": hashed},
-        namespace="/proxy"
-    )
+    OUTBOX.emit("generating_world", {"match_id": match_id})
+
+    skip_mod_updates = is_cache_warm(dedi_path=dedi_path, mod_ids=mod_ids)
+    if skip_mod_updates:
+        logger.info("Every mod was pre-fetched recently. Skipping mod updates.")
 
     state.set_match_state(new_state=state.MatchWorldGenerating, window=window)
-    master_process = launch_shard(
-        nullrender_fp=nullrender_fp,
-        shard="Master",
-        cluster_name=cluster_name,
-        window=window,
-        client_socket=client_socket
-    )
+    try:
+        for shard in ["Master", "Caves"]:
+            shard_process = launch_shard(
+                nullrender_fp=nullrender_fp,
+                shard=shard,
+                cluster=cluster,
+                window=window,
+                skip_mod_updates=skip_mod_updates
+            )
+            cluster.set_subprocess(shard=shard, proc=shard_process)
+    except Exception:
+        _abort_launch(cluster)
+        raise
 
-    caves_process = launch_shard(
-        nullrender_fp=nullrender_fp,
-        shard="Caves",
-        cluster_name=cluster_name,
-        window=window,
-        client_socket=client_socket
-    )
+    shard_resume.save_cluster(cluster=cluster, dedi_path=dedi_path)
+    logger.info(f"Launched both master and caves for match {match_id}!")
 
-    SERVER_MANAGER.set_subprocesses(master_process, caves_process)
-    logger.info("Launched both master and caves!")
 
-def stop_dedicated_server(timeout: float = 1.0) -> None:
+def _abort_launch(cluster: ClusterHandle) -> None:
+    """
+    Undoes a launch that failed part way: stops the shard that was already started and releases the reservation.
     """
-    Shuts down the dedicated server if up and updates match state.
+    logger.error(f"❌ Launching the shards of match {cluster.match_id} failed")
+    shutdown_shards(match_id=cluster.match_id, processes=cluster.get_subprocesses())
+    SERVER_MANAGER.release_cluster(cluster.match_id)
+    timeline.finish_timeline(match_id=cluster.match_id, outcome="failed")
+
+
+def adopt_running_clusters(window: webview.Window | None = None) -> list[str]:
+    """
+    Re-attaches to the shards recorded in the runtime file that are still running, such as after the app crashed
+    mid-match. Only shards launched with `resume_shards` are adopted: the others died with the app or lost their
+    output pipe. Records whose shards are not both alive are left for `relaunch_cluster`.
 
     Parameters
     ----------
-    timeout: flaot (default 1.0)
-        The time in seconds to wait before force killing the processes.
+    window: webview.Window | None (default None)
+        The webview window object. Needed to update the UI when world state changes.
+
+    Returns
+    -------
+    match_ids: list[str]
+        The matches whose clusters were adopted
+    """
+    adopted: list[str] = []
+    for match_id, record in shard_resume.load_runtime().items():
+        shards = record.get("shards", {})
+        if SERVER_MANAGER.get_cluster(match_id) is not None or not record.get("resumable", False):
+            continue
+        if not all(shard_resume.is_shard_process(shards.get(shard, {}).get("pid")) for shard in SHARDS):
+            continue
+
+        try:
+            cluster = SERVER_MANAGER.reserve_cluster(
+                match_id=match_id,
+                cluster_name=record["cluster_name"],
+                server_configs={},
+                cluster_dir=record["cluster_dir"],
+                port_offset=record.get("port_offset", 0)
+            )
+        except (KeyError, RuntimeError) as e:
+            logger.warning(f"Cannot adopt the cluster of match {match_id}: {e}")
+            continue
+        cluster.ports = set(record.get("ports", []))
+
+        for shard in SHARDS:
+            proc = shard_resume.AdoptedProcess(pid=shards[shard]["pid"])
+            cluster.set_subprocess(shard=shard, proc=proc)
+            cluster.set_shard_status(shard=shard, status=shards[shard].get("status", "launching"))
+
+            log_fp = shard_resume.shard_output_path(cluster.cluster_dir, shard)
+            if asyncio_enabled():
+                lines = shard_resume.follow_log_async(log_fp=log_fp, proc=proc)
+            else:
+                lines = shard_resume.follow_log(log_fp=log_fp, proc=proc)
+            _follow_shard_output(lines=lines, shard=shard, cluster=cluster, window=window)
+
+        if cluster.all_launched():
+            world_snapshot.start_snapshots(cluster)
+        match_state = state.MatchWorldReady if cluster.all_launched() else state.MatchWorldGenerating
+        state.set_match_state(new_state=match_state, window=window)
+        logger.info(f"♻️ Adopted the running shards of match {match_id} ♻️")
+        adopted.append(match_id)
+
+    return adopted
+
+
+def relaunch_cluster(
+    match_id: str,
+    window: webview.Window | None = None,
+) -> bool:
     """
-    if not SERVER_MANAGER.is_running():
+    Launches the shards of a match whose cluster is still on disk from a previous run of the app, without asking
+    the backend for the world files again.
+
+    Returns
+    -------
+    relaunched: bool
+        False if the match has no complete cluster on disk.
+    """
+    record = shard_resume.load_runtime().get(str(match_id))
+    if record is None or SERVER_MANAGER.is_running(match_id):
+        return False
+
+    cluster_dir = record.get("cluster_dir")
+    dedi_path = state.get_user_data(get_key='dedi_path')
+    if not cluster_dir or not dedi_path or not os.path.exists(os.path.join(cluster_dir, CLUSTER_MANIFEST)):
+        shard_resume.forget_cluster(match_id)
+        return False
+
+    # Leftover shards of the record that are half alive must not hold on to the cluster's ports
+    leftovers = {
+        shard: shard_resume.AdoptedProcess(pid=shard_record.get("pid"))
+        for shard, shard_record in record.get("shards", {}).items()
+        if shard_resume.is_shard_process(shard_record.get("pid"))
+    }
+    if leftovers:
+        shutdown_shards(match_id=str(match_id), processes=leftovers)
+
+    existing_cluster = SERVER_MANAGER.get_cluster(match_id)
+    if existing_cluster is not None:
+        SERVER_MANAGER.release_cluster(match_id)
+
+    try:
+        cluster = SERVER_MANAGER.reserve_cluster(
+            match_id=match_id,
+            cluster_name=record["cluster_name"],
+            server_configs={},
+            cluster_dir=cluster_dir,
+            port_offset=record.get("port_offset", 0)
+        )
+    except (KeyError, RuntimeError) as e:
+        logger.warning(f"Cannot relaunch the cluster of match {match_id}: {e}")
+        return False
+    cluster.ports = set(record.get("ports", []))
+
+    logger.info(f"♻️ Relaunching the existing cluster of match {match_id} ♻️")
+    timeline.start_timeline(match_id=match_id, dedi_path=dedi_path)
+    state.set_match_state(new_state=state.MatchWorldGenerating, window=window)
+    try:
+        for shard in SHARDS:
+            shard_process = launch_shard(
+                nullrender_fp=str(get_nullrender_path(dedi_path)),
+                shard=shard,
+                cluster=cluster,
+                window=window
+            )
+            cluster.set_subprocess(shard=shard, proc=shard_process)
+    except Exception:
+        _abort_launch(cluster)
+        raise
+
+    shard_resume.save_cluster(cluster=cluster, dedi_path=dedi_path)
+    return True
+
+def stop_dedicated_server(
+    match_id: str | None = None,
+    escalation: list[tuple[str, float]] = DEFAULT_ESCALATION,
+) -> None:
+    """
+    Shuts down the dedicated server of a match if up and releases its cluster. Shards are asked to save and
+    shut down through their console first, and every shard (of every cluster) is stopped in parallel.
+
+    Parameters
+    ----------
+    match_id: str | None (default None)
+        The match whose cluster is shut down. If omitted, every cluster on this host is shut down.
+    escalation: list[tuple[str, float]] (default DEFAULT_ESCALATION)
+        The shutdown steps tried for each shard with the seconds to wait for it to exit after each step.
+        See `shard_shutdown.py`.
+    """
+    if match_id is None:
+        clusters = SERVER_MANAGER.get_clusters()
+    else:
+        cluster = SERVER_MANAGER.get_cluster(match_id)
+        clusters = [cluster] if cluster is not None else []
+
+    if not clusters:
         logger.info("Dedicated server was not running. Nothing to shutdown.")
         return
-    
-    logger.info("🛑 STOPPING DEDICATED SERVER 🛑")
-
-    with SERVER_MANAGER.lock:
-        processes = {
-            "Master" : SERVER_MANAGER.master, 
-            "Caves" : SERVER_MANAGER.caves
-        }
-
-    # Gracefully terminate
-    for shard, proc in processes.items():
-        if proc and proc.poll() is None:
-            logger.info(f"Gracefully terminating {shard} process")
-            if sys.platform == "win32":
-                proc.terminate()
-            else:
-                os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-    
-    start = time.time()
-    while time.time() - start < timeout:
-        if all(proc.poll() is not None for proc in processes.values() if proc):
-            break
-        time.sleep(0.1)
-
-    # Force kill if needed
-    for shard, proc in processes.items():
-        if proc and proc.poll() is None:
-            logger.info(f"💀 Force killing {shard} shard 💀")
-            if sys.platform == "win32":
-                proc.kill()
-            else:
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
 
-    SERVER_MANAGER.clear_subprocesses()
-    logger.info("✅ Dedicated server stopped ✅")
+    threads = [
+        threading.Thread(target=_stop_cluster, args=(cluster, escalation), daemon=True)
+        for cluster in clusters
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def _stop_cluster(cluster: ClusterHandle, escalation: list[tuple[str, float]]) -> None:
+    logger.info(f"🛑 STOPPING DEDICATED SERVER FOR MATCH {cluster.match_id} 🛑")
+    world_snapshot.stop_snapshots(cluster.match_id)
+
+    # The job is shared by every cluster on the host, so this is not the usage of this cluster alone
+    usage = get_job_usage()
+    if usage["cpu_seconds"] is not None:
+        memory_mb = (usage["memory_bytes"] or 0) / (1024 * 1024)
+        logger.info(
+            f"Host-wide usage of all clusters across {usage['processes']} process(es): "
+            f"{usage['cpu_seconds']:.1f} CPU seconds, {memory_mb:.0f} MB of memory"
+        )
+
+    results = shutdown_shards(
+        match_id=cluster.match_id,
+        processes=cluster.get_subprocesses(),
+        escalation=escalation
+    )
+    SERVER_MANAGER.record_shutdown(results)
+    SERVER_MANAGER.release_cluster(cluster.match_id)
+    shard_resume.forget_cluster(cluster.match_id)
+    timeline.finish_timeline(match_id=cluster.match_id, outcome="stopped")
+
+    summary = ", ".join(f"{r.shard}: {r.outcome} in {r.latency:.2f}s" for r in results)
+    logger.info(f"✅ Dedicated server for match {cluster.match_id} stopped ({summary}) ✅")
@@ -0,0 +1,238 @@
+"""
+RankedDST/dedicated_server/world_snapshot.py
+
+This module takes periodic snapshots of a cluster's `save` folders while a match is played, so a crash mid-match
+leaves a checkpoint to restore from.
+
+Snapshots live in `<cluster_path>/Ranked DST Snapshots/<cluster name>/<snapshot name>`. Files that did not change
+since the previous snapshot (same size and modification time) are hard-linked to it, so only changed files are
+copied. Only the newest `SNAPSHOT_RETENTION` snapshots of a cluster are kept.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from RankedDST.tools.logger import logger
+from RankedDST.tools.atomic_file import atomic_link_or_copy, atomic_write_json
+from RankedDST.dedicated_server.server_manager import SHARDS, ClusterHandle
+
+SNAPSHOTS_DIR_NAME = "Ranked DST Snapshots"
+SNAPSHOT_MANIFEST = "snapshot.json"
+SNAPSHOT_INTERVAL = 120 # seconds
+SNAPSHOT_RETENTION = 5
+
+_snapshot_lock = threading.Lock()
+_schedulers: dict[str, threading.Event] = {}
+
+
+def get_snapshots_dir(cluster_dir: str | Path) -> Path:
+    """
+    Returns the folder the snapshots of the cluster are kept in.
+    """
+    cluster_dir = Path(cluster_dir)
+    return cluster_dir.parent / SNAPSHOTS_DIR_NAME / cluster_dir.name
+
+
+def _scan_saves(cluster_dir: Path) -> dict[str, list[int]]:
+    """
+    Lists every file in the save folders of the shards with its size and modification time.
+    """
+    files: dict[str, list[int]] = {}
+    for shard in SHARDS:
+        save_dir = cluster_dir / shard / "save"
+        if not save_dir.is_dir():
+            continue
+        for fp in save_dir.rglob("*"):
+            if not fp.is_file():
+                continue
+            stat = fp.stat()
+            files[fp.relative_to(cluster_dir).as_posix()] = [stat.st_size, stat.st_mtime_ns]
+    return files
+
+
+def _read_manifest(snapshot_dir: Path) -> dict[str, list[int]]:
+    try:
+        with open(snapshot_dir / SNAPSHOT_MANIFEST, "r", encoding="utf-8") as file:
+            return json.load(file).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def list_snapshots(cluster_dir: str | Path) -> list[Path]:
+    """
+    Returns the complete snapshots of the cluster, oldest first.
+    """
+    snapshots_dir = get_snapshots_dir(cluster_dir)
+    if not snapshots_dir.is_dir():
+        return []
+    return sorted(
+        p for p in snapshots_dir.iterdir()
+        if p.is_dir() and not p.name.startswith(".") and (p / SNAPSHOT_MANIFEST).exists()
+    )
+
+
+def take_snapshot(cluster_dir: str | Path, retention: int = SNAPSHOT_RETENTION) -> Path | None:
+    """
+    Snapshots the save folders of the cluster. Unchanged files are hard-linked to the previous snapshot.
+
+    Parameters
+    ----------
+    cluster_dir: str | Path
+        The full path of the cluster directory
+    retention: int (default SNAPSHOT_RETENTION)
+        How many snapshots of the cluster to keep
+
+    Returns
+    -------
+    snapshot_dir: Path | None
+        The new snapshot. None if the saves did not change since the previous one or there are no saves yet.
+    """
+    cluster_dir = Path(cluster_dir)
+    with _snapshot_lock:
+        files = _scan_saves(cluster_dir)
+        if not files:
+            return None
+
+        snapshots = list_snapshots(cluster_dir)
+        previous_dir = snapshots[-1] if snapshots else None
+        previous_files = _read_manifest(previous_dir) if previous_dir else {}
+        if files == previous_files:
+            return None
+
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+        snapshot_dir = get_snapshots_dir(cluster_dir) / name
+        tmp_dir = snapshot_dir.with_name(f".{name}.tmp")
+
+        linked = copied = 0
+        for rel_path, file_stat in files.items():
+            dst = tmp_dir / rel_path
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if previous_dir is not None and previous_files.get(rel_path) == file_stat:
+                    atomic_link_or_copy(previous_dir / rel_path, dst)
+                    linked += 1
+                else:
+                    shutil.copy2(cluster_dir / rel_path, dst)
+                    copied += 1
+            except FileNotFoundError:
+                # Removed by the shard while the snapshot was taken
+                files[rel_path] = None
+
+        files = {rel_path: file_stat for rel_path, file_stat in files.items() if file_stat is not None}
+        atomic_write_json(tmp_dir / SNAPSHOT_MANIFEST, {"created_at": time.time(), "files": files})
+        os.rename(tmp_dir, snapshot_dir)
+
+        prune_snapshots(cluster_dir, retention=retention)
+
+    logger.info(f"📸 Snapshot '{name}' of '{cluster_dir.name}' taken ({copied} copied, {linked} linked) 📸")
+    return snapshot_dir
+
+
+def prune_snapshots(cluster_dir: str | Path, retention: int = SNAPSHOT_RETENTION) -> None:
+    """
+    Deletes all but the newest `retention` snapshots of the cluster, along with unfinished ones.
+    """
+    snapshots_dir = get_snapshots_dir(cluster_dir)
+    if not snapshots_dir.is_dir():
+        return
+
+    for p in snapshots_dir.glob(".*.tmp"):
+        shutil.rmtree(p, ignore_errors=True)
+    snapshots = list_snapshots(cluster_dir)
+    for p in snapshots[:max(len(snapshots) - retention, 0)]:
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def remove_snapshots(cluster_dir: str | Path) -> None:
+    """
+    Deletes every snapshot of the cluster.
+    """
+    shutil.rmtree(get_snapshots_dir(cluster_dir), ignore_errors=True)
+
+
+def restore_snapshot(cluster_dir: str | Path, snapshot_name: str | None = None) -> Path:
+    """
+    Replaces the save folders of the cluster with those of a snapshot. The shards must not be running.
+
+    Parameters
+    ----------
+    cluster_dir: str | Path
+        The full path of the cluster directory
+    snapshot_name: str | None (default None)
+        The snapshot to restore. Defaults to the newest one.
+
+    Returns
+    -------
+    snapshot_dir: Path
+        The restored snapshot
+    """
+    cluster_dir = Path(cluster_dir)
+    snapshots = list_snapshots(cluster_dir)
+    if snapshot_name is None:
+        if not snapshots:
+            raise ValueError(f"No snapshots of '{cluster_dir.name}' to restore")
+        snapshot_dir = snapshots[-1]
+    else:
+        snapshot_dir = get_snapshots_dir(cluster_dir) / snapshot_name
+        if snapshot_dir not in snapshots:
+            raise ValueError(f"No snapshot named '{snapshot_name}' for '{cluster_dir.name}'")
+
+    with _snapshot_lock:
+        for shard in SHARDS:
+            snapshot_save = snapshot_dir / shard / "save"
+            if not snapshot_save.is_dir():
+                continue
+
+            # Copied rather than linked so the shards cannot modify the snapshot in place
+            save_dir = cluster_dir / shard / "save"
+            tmp_save = save_dir.with_name("save.restore.tmp")
+            shutil.rmtree(tmp_save, ignore_errors=True)
+            shutil.copytree(snapshot_save, tmp_save)
+            shutil.rmtree(save_dir, ignore_errors=True)
+            os.rename(tmp_save, save_dir)
+
+    logger.info(f"⏪ Restored '{cluster_dir.name}' from snapshot '{snapshot_dir.name}' ⏪")
+    return snapshot_dir
+
+
+def start_snapshots(cluster: ClusterHandle, interval: float = SNAPSHOT_INTERVAL) -> None:
+    """
+    Snapshots the cluster every `interval` seconds in a background thread until `stop_snapshots` is called or
+    the shards exit.
+    """
+    if cluster.cluster_dir is None:
+        return
+
+    with _snapshot_lock:
+        if cluster.match_id in _schedulers:
+            return
+        stop_event = threading.Event()
+        _schedulers[cluster.match_id] = stop_event
+
+    def run():
+        while not stop_event.wait(timeout=interval):
+            if not cluster.is_running():
+                break
+            try:
+                take_snapshot(cluster.cluster_dir)
+            except OSError as e:
+                logger.warning(f"Failed to snapshot match {cluster.match_id}: {e}")
+
+        with _snapshot_lock:
+            if _schedulers.get(cluster.match_id) is stop_event:
+                del _schedulers[cluster.match_id]
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def stop_snapshots(match_id: str) -> None:
+    """
+    Stops the periodic snapshots of the match.
+    """
+    with _snapshot_lock:
+        stop_event = _schedulers.pop(match_id, None)
+    if stop_event is not None:
+        stop_event.set()
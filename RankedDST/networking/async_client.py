@@ -0,0 +1,70 @@
+"""
+RankedDST/networking/async_client.py
+
+This module runs the app's socket.io client on the asyncio runtime of `tools/async_runtime.py`.
+
+`AsyncClientBridge` keeps a `socketio.AsyncClient` on the runtime's event loop behind the blocking `socketio.Client`
+interface the rest of the app uses, so `ConnectionManager`, the outbox and the link monitor work the same with either
+runtime. The event handlers are plain functions that may block (they update the UI and launch shards), so they run on
+the runtime's pool instead of on the loop. Code already running on the loop, such as the asyncio proxy, awaits the
+`AsyncClient` in `client` directly.
+"""
+from typing import Any, Callable
+
+import socketio
+
+from RankedDST.tools.async_runtime import RUNTIME
+
+
+class AsyncClientBridge:
+    """
+    A `socketio.AsyncClient` with the blocking interface of `socketio.Client`.
+    """
+    reason = socketio.AsyncClient.reason
+
+    def __init__(self, **client_kwargs):
+        self.client = socketio.AsyncClient(**client_kwargs)
+
+    @property
+    def connected(self) -> bool:
+        return self.client.connected
+
+    @property
+    def reconnection_attempts(self) -> int:
+        return self.client.reconnection_attempts
+
+    @reconnection_attempts.setter
+    def reconnection_attempts(self, attempts: int) -> None:
+        self.client.reconnection_attempts = attempts
+
+    def on(self, event: str, handler: Callable | None = None, namespace: str | None = None):
+        """
+        Registers a blocking event handler. Usable as a decorator, like `socketio.Client.on`.
+        """
+        def register(handler: Callable) -> Callable:
+            async def run_handler(*args) -> Any:
+                return await RUNTIME.run_blocking(handler, *args)
+
+            self.client.on(event, run_handler, namespace=namespace)
+            return handler
+
+        if handler is None:
+            return register
+        register(handler)
+
+    def connect(self, url: str, **kwargs) -> None:
+        RUNTIME.run(self.client.connect(url, **kwargs))
+
+    def emit(
+        self, event: str, data: Any = None, namespace: str | None = None, callback: Callable | None = None
+    ) -> None:
+        RUNTIME.run(self.client.emit(event, data, namespace=namespace, callback=callback))
+
+    def call(self, event: str, data: Any = None, namespace: str | None = None, timeout: float = 60) -> Any:
+        return RUNTIME.run(self.client.call(event, data, namespace=namespace, timeout=timeout))
+
+    def disconnect(self) -> None:
+        RUNTIME.run(self.client.disconnect())
+
+    def shutdown(self) -> None:
+        RUNTIME.run(self.client.shutdown())
@@ -0,0 +1,201 @@
+"""
+RankedDST/networking/config_transfer.py
+
+This module shrinks the world configuration files sent by the backend in `generate_world`, `request_world_files` and
+the connect handshake.
+
+Every configuration file the app receives is kept in a content-addressed cache in `~/ranked_dst/config_cache`. The app
+advertises the SHA-256 hashes of the last `HASHES_PER_KEY` versions of each file it holds, along with the encodings it
+can decode. The backend can then send each file in one of three forms:
+
+- the full text, as before
+- `{"ref": <sha256>}` when the app already has that exact file
+- `{"zlib": <base64>, "sha256": <sha256>}` for a compressed file
+
+`encode_configs` builds such a payload and `decode_configs` turns one back into full texts. A payload referencing a
+file missing from the cache raises `ConfigCacheMiss`, after which the app asks for the full files again.
+"""
+import base64
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+
+from RankedDST.tools.config import get_data_dir
+from RankedDST.tools.atomic_file import atomic_write_json, atomic_write_text, hash_bytes
+from RankedDST.tools.logger import logger
+
+WORLD_CONFIG_KEYS = [
+    "ClusterIni", "MasterServerIni", "CavesServerIni",
+    "MasterWorldGenOverride", "CavesWorldGenOverride", "ModOverrides",
+]
+CACHE_DIR_NAME = "config_cache"
+CACHE_INDEX_FILE_NAME = "index.json"
+HASHES_PER_KEY = 4
+COMPRESS_MIN_BYTES = 1024 # smaller files are sent as text
+ENCODINGS = ["zlib"]
+
+
+class ConfigCacheMiss(ValueError):
+    """
+    A config payload referenced a file the cache does not have.
+    """
+
+
+def config_hash(text: str) -> str:
+    return hash_bytes(text.encode("utf-8"))
+
+
+class ConfigCache:
+    """
+    The world configuration files received so far, stored by the hash of their contents.
+    """
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self.lock = threading.Lock()
+        self._index: dict[str, list[str]] | None = None # config key -> hashes, newest first
+
+    @property
+    def index_path(self) -> Path:
+        return self.cache_dir / CACHE_INDEX_FILE_NAME
+
+    def _load_index(self) -> dict[str, list[str]]:
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as file:
+                    index = json.load(file)
+                self._index = {k: list(v) for k, v in index.items() if isinstance(v, list)}
+            except (OSError, ValueError, AttributeError):
+                self._index = {}
+        return self._index
+
+    def get(self, digest: str) -> str | None:
+        """
+        Returns the cached file with the hash, or None if it is missing or corrupt.
+        """
+        try:
+            text = (self.cache_dir / digest).read_text(encoding="utf-8")
+        except (OSError, ValueError):
+            return None
+        return text if config_hash(text) == digest else None
+
+    def put(self, key: str, text: str) -> str:
+        """
+        Caches a received file as the newest version of the config key and drops versions beyond HASHES_PER_KEY.
+
+        Returns
+        -------
+        digest: str
+            The hash of the file
+        """
+        digest = config_hash(text)
+        with self.lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not (self.cache_dir / digest).exists():
+                atomic_write_text(self.cache_dir / digest, text)
+
+            index = self._load_index()
+            hashes = [digest] + [h for h in index.get(key, []) if h != digest]
+            index[key] = hashes[:HASHES_PER_KEY]
+            if hashes[HASHES_PER_KEY:]:
+                self._remove_unreferenced(hashes[HASHES_PER_KEY:])
+            atomic_write_json(self.index_path, index, indent=None)
+        return digest
+
+    def _remove_unreferenced(self, digests: list[str]) -> None:
+        referenced = {h for hashes in self._load_index().values() for h in hashes}
+        for digest in digests:
+            if digest not in referenced:
+                (self.cache_dir / digest).unlink(missing_ok=True)
+
+    def advertise(self) -> dict[str, list[str]]:
+        """
+        The hashes of the cached versions of each config key, newest first.
+        """
+        with self.lock:
+            return {key: list(hashes) for key, hashes in self._load_index().items()}
+
+
+CONFIG_CACHE = ConfigCache(Path(get_data_dir()) / CACHE_DIR_NAME)
+
+
+def advertise_configs() -> dict:
+    """
+    What the app tells the backend about its cached configs, sent with the auth payload and `request_world_files`.
+    """
+    return {"config_hashes": CONFIG_CACHE.advertise(), "config_encodings": ENCODINGS}
+
+
+def encode_configs(configs: dict, known_hashes: dict[str, list[str]] | None, encodings: list[str] | None) -> dict:
+    """
+    Encodes the world configuration files of a payload for an app that has the `known_hashes` cached and can decode
+    the `encodings`. Keys that are not config files are left as they are.
+    """
+    known_hashes = known_hashes or {}
+    encodings = encodings or []
+    encoded = dict(configs)
+    for key in WORLD_CONFIG_KEYS:
+        text = configs.get(key)
+        if not isinstance(text, str):
+            continue
+        digest = config_hash(text)
+        if digest in known_hashes.get(key, []):
+            encoded[key] = {"ref": digest}
+        elif "zlib" in encodings and len(text) >= COMPRESS_MIN_BYTES:
+            data = base64.b64encode(zlib.compress(text.encode("utf-8"), level=6)).decode("ascii")
+            encoded[key] = {"zlib": data, "sha256": digest}
+    return encoded
+
+
+def decode_configs(payload: dict, cache: ConfigCache = CONFIG_CACHE) -> dict:
+    """
+    Turns every encoded config file of a payload back into its full text and caches the received files.
+
+    Returns
+    -------
+    decoded: dict
+        A copy of the payload with the full text of every config file
+
+    Raises
+    ------
+    ConfigCacheMiss
+        If a referenced file is not in the cache
+    ValueError
+        If a file does not match its hash or uses an unknown encoding
+    """
+    decoded = dict(payload)
+    received = 0
+    for key in WORLD_CONFIG_KEYS:
+        value = payload.get(key)
+        if isinstance(value, str) or value is None:
+            continue
+        if not isinstance(value, dict):
+            raise ValueError(f"Invalid {key} of type {type(value)}")
+
+        if "ref" in value:
+            text = cache.get(value["ref"])
+            if text is None:
+                raise ConfigCacheMiss(f"{key} {value['ref'][:12]} is not cached")
+        elif "zlib" in value:
+            try:
+                text = zlib.decompress(base64.b64decode(value["zlib"])).decode("utf-8")
+            except zlib.error as e:
+                raise ValueError(f"{key} could not be decompressed: {e}") from e
+            if config_hash(text) != value.get("sha256"):
+                raise ValueError(f"{key} does not match its hash")
+        else:
+            raise ValueError(f"Unknown encoding of {key}: {sorted(value)}")
+        decoded[key] = text
+
+    for key in WORLD_CONFIG_KEYS:
+        if isinstance(decoded.get(key), str):
+            try:
+                cache.put(key, decoded[key])
+                received += 1
+            except OSError as e:
+                logger.warning(f"Failed to cache {key}: {e}")
+
+    reused = sum(1 for key in WORLD_CONFIG_KEYS if isinstance(payload.get(key), dict) and "ref" in payload[key])
+    logger.info(f"🗜️ Received {received} world config files, {reused} of them from the cache")
+    return decoded
@@ -0,0 +1,122 @@
+"""
+RankedDST/networking/handler_executor.py
+
+This module runs the slow socket event handlers on a bounded pool of worker threads.
+
+python-socketio starts a new thread for every incoming event, so a burst of events runs all at once and in no
+particular order. Handlers wrapped with `dispatch` are instead queued under a key: handlers with the same key run one
+at a time in the order they were received, while handlers with different keys run in parallel on up to
+`MAX_HANDLER_WORKERS` threads. The match lifecycle events are keyed by their match, so a `run_complete` never runs
+before the `generate_world` of the same match finished launching its shards.
+"""
+import functools
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from RankedDST.tools.logger import logger
+
+MAX_HANDLER_WORKERS = 4
+MAX_PENDING_HANDLERS = 64 # further events wait for room before being queued
+
+
+class KeyedExecutor:
+    """
+    A bounded thread pool that runs the tasks sharing a key one at a time, in submission order.
+    """
+    def __init__(
+        self,
+        max_workers: int = MAX_HANDLER_WORKERS,
+        max_pending: int = MAX_PENDING_HANDLERS,
+        thread_name_prefix: str = "socket-handler",
+        label: str = "Socket handler",
+    ):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.label = label # names the tasks in the error log
+        self.room = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.queues: dict[str, deque[tuple[Future, Callable, tuple, dict]]] = {}
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queues `fn(*args, **kwargs)` behind the other tasks of the key. Blocks while `max_pending` tasks are waiting.
+
+        Returns
+        -------
+        future: Future
+            Resolves to the result of `fn`
+        """
+        self.room.acquire()
+        future: Future = Future()
+        with self.lock:
+            queue = self.queues.get(key)
+            if queue is not None:
+                # The key's drain is running and picks this up
+                queue.append((future, fn, args, kwargs))
+                return future
+            self.queues[key] = deque([(future, fn, args, kwargs)])
+        self.pool.submit(self._drain, key)
+        return future
+
+    def _drain(self, key: str) -> None:
+        """
+        Runs the tasks of a key until its queue is empty. Only one drain per key runs at a time.
+        """
+        while True:
+            with self.lock:
+                queue = self.queues[key]
+                if not queue:
+                    del self.queues[key]
+                    return
+                future, fn, args, kwargs = queue.popleft()
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                logger.error(f"❌ {self.label} {getattr(fn, '__name__', fn)} ({key}) failed: {e}")
+                future.set_exception(e)
+            finally:
+                self.room.release()
+
+    def pending(self) -> dict[str, int]:
+        """
+        The number of tasks waiting per key.
+        """
+        with self.lock:
+            return {key: len(queue) for key, queue in self.queues.items()}
+
+
+HANDLER_EXECUTOR = KeyedExecutor()
+
+
+def match_key(field: str = "match_id", default: Callable[[], Any] | None = None) -> Callable[[Any], str]:
+    """
+    Keys an event by the match id in its payload. Events without one are keyed by the match id `default` returns,
+    or otherwise share a key.
+    """
+    def key(data: Any) -> str:
+        match_id = data.get(field) if isinstance(data, dict) else None
+        if match_id is None and default is not None:
+            match_id = default()
+        return f"match:{match_id}"
+    return key
+
+
+def dispatch(key: str | Callable[[Any], str]):
+    """
+    Decorates a socket event handler so it runs on `HANDLER_EXECUTOR` instead of the thread socketio called it on.
+
+    Parameters
+    ----------
+    key: str | Callable[[Any], str]
+        The serialization key, or a function returning it from the event payload
+    """
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def submit(*args) -> None:
+            data = args[0] if args else None
+            HANDLER_EXECUTOR.submit(key(data) if callable(key) else key, handler, *args)
+        return submit
+    return decorator
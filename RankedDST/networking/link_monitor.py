@@ -0,0 +1,154 @@
+"""
+RankedDST/networking/link_monitor.py
+
+This module measures the quality of the connection to the backend socket.
+
+Every `PING_INTERVAL` seconds a `link_ping` event is sent on the `/proxy` namespace and the time until the backend
+acknowledges it is recorded. The last `RTT_SAMPLES` round trips are kept in memory along with the timeouts and
+disconnects, and summarized as RTT percentiles, jitter and loss. The summary is shown in the UI and sent along with
+the match events, so a slow backend can be told apart from a bad home network.
+
+A backend without a `link_ping` handler never acknowledges one. Until the first ping is acknowledged, lost pings are
+not counted, nothing is shown in the UI and the pings back off up to `MAX_PING_BACKOFF` seconds apart.
+"""
+import threading
+import time
+from collections import deque
+
+import socketio
+
+from RankedDST.tools.logger import logger
+from RankedDST.ui.updates import update_link_stats
+from RankedDST.ui.window import get_window
+
+PING_INTERVAL = 15 # seconds
+PING_TIMEOUT = 5 # seconds. A ping not acknowledged in time counts as lost.
+RTT_SAMPLES = 240 # an hour of pings
+MAX_PING_BACKOFF = 300 # seconds between pings while the backend never acknowledged one
+NAMESPACE = "/proxy"
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 1)
+
+
+class LinkMonitor:
+    """
+    Pings the backend while connected and keeps the round trip times.
+    """
+    def __init__(self, interval: float = PING_INTERVAL, timeout: float = PING_TIMEOUT, samples: int = RTT_SAMPLES):
+        self.interval = interval
+        self.timeout = timeout
+        self.rtts: deque[float] = deque(maxlen=samples) # milliseconds
+        self.jitter = 0.0 # milliseconds, smoothed like RFC 3550
+        self.timeouts = 0
+        self.disconnects = 0
+        self.acked = False # the backend acknowledged a ping, so it answers them
+        self.unacked = 0 # pings lost before the first acknowledgement
+        self.client: socketio.Client | None = None
+        self.active = False # a session is up. `client.connected` only turns True after the connect handlers ran.
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.wake = threading.Event()
+
+    def start(self, client: socketio.Client) -> None:
+        """
+        Starts pinging through the client. Called on every connect; only one pinging thread ever runs.
+        """
+        with self.lock:
+            self.client = client
+            self.active = True
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="link-monitor", daemon=True)
+                self.thread.start()
+        self.wake.set() # measure right away instead of after a full interval
+
+    def record_disconnect(self) -> None:
+        with self.lock:
+            self.active = False
+            self.disconnects += 1
+
+    def ping(self) -> float | None:
+        """
+        Sends one ping and records its round trip.
+
+        Returns
+        -------
+        rtt: float | None
+            The round trip time in milliseconds, or None if the ping was not acknowledged in time
+        """
+        client = self.client
+        if client is None or not self.active:
+            return None
+
+        start = time.perf_counter()
+        try:
+            client.call("link_ping", {"sent_at": time.time()}, namespace=NAMESPACE, timeout=self.timeout)
+        except socketio.exceptions.SocketIOError:
+            with self.lock:
+                if self.acked:
+                    self.timeouts += 1
+                else:
+                    self.unacked += 1
+            return None
+
+        rtt = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.acked = True
+            if self.rtts:
+                self.jitter += (abs(rtt - self.rtts[-1]) - self.jitter) / 16
+            self.rtts.append(rtt)
+        return rtt
+
+    def stats(self) -> dict[str, float | int | None]:
+        """
+        Summarizes the link.
+
+        Returns
+        -------
+        stats: dict[str, float | int | None]
+            `samples`, the `p50`, `p90`, `p99` and `max` RTT and the `jitter` in milliseconds, the `loss` fraction of
+            pings that timed out, and the number of `disconnects`
+        """
+        with self.lock:
+            rtts = sorted(self.rtts)
+            sent = len(self.rtts) + self.timeouts
+            return {
+                "samples": len(rtts),
+                "p50": _percentile(rtts, 50),
+                "p90": _percentile(rtts, 90),
+                "p99": _percentile(rtts, 99),
+                "max": round(rtts[-1], 1) if rtts else None,
+                "jitter": round(self.jitter, 1),
+                "loss": round(self.timeouts / sent, 3) if sent else 0.0,
+                "disconnects": self.disconnects,
+            }
+
+    def _next_interval(self) -> float:
+        with self.lock:
+            if self.acked:
+                return self.interval
+            return min(self.interval * 2 ** min(self.unacked, 10), MAX_PING_BACKOFF)
+
+    def _run(self) -> None:
+        while True:
+            self.wake.wait(timeout=self._next_interval())
+            self.wake.clear()
+
+            if self.client is None or not self.active:
+                continue
+
+            rtt = self.ping()
+            if not self.acked:
+                if self.unacked == 1:
+                    logger.info("📶 The backend does not answer pings yet. Link stats are hidden until it does")
+                continue
+            if rtt is None:
+                logger.info(f"📶 Backend ping timed out ({self.timeouts} so far)")
+            update_link_stats(stats=self.stats(), window=get_window())
+
+
+LINK_MONITOR = LinkMonitor()
@@ -0,0 +1,51 @@
+"""
+RankedDST/networking/match_transport.py
+
+This module holds how the proxy forwards match events to the backend. It is read by `networking/proxy.py`.
+
+- `http` (the default): a POST to the backend's API for every event
+- `socket`: an acknowledged `match_event` emit on the app's socket.io session, falling back to HTTP when the session
+  is down or the backend does not acknowledge the event in time. A backend that leaves an event unacknowledged most
+  likely has no `match_event` handler, so the rest of that session's events go straight to HTTP instead of each
+  waiting for the acknowledgement first.
+"""
+
+MATCH_EVENT_TRANSPORTS = ["socket", "http"]
+
+match_event_transport = "http"
+
+_session_unacked = False # the backend of the current session left a match event unacknowledged
+
+
+def set_match_event_transport(transport: str) -> None:
+    """
+    Selects how match events reach the backend.
+    """
+    if transport not in MATCH_EVENT_TRANSPORTS:
+        raise ValueError(f"Match event transport must be one of {MATCH_EVENT_TRANSPORTS}, got '{transport}'")
+
+    global match_event_transport
+    match_event_transport = transport
+
+
+def use_socket() -> bool:
+    """
+    Whether the next match event is sent on the socket session.
+    """
+    return match_event_transport == "socket" and not _session_unacked
+
+
+def record_unacked() -> None:
+    """
+    Sends the remaining match events of the socket session over HTTP.
+    """
+    global _session_unacked
+    _session_unacked = True
+
+
+def session_started() -> None:
+    """
+    Tries the socket again for the match events of a new socket session.
+    """
+    global _session_unacked
+    _session_unacked = False
@@ -0,0 +1,230 @@
+"""
+RankedDST/networking/outbox.py
+
+This module delivers the match lifecycle events (`generating_world`, `world_generated`, `world_left`) to the backend
+even when the socket is down when they happen.
+
+Events are queued in order and sent one at a time by a single sender thread with an acknowledgement. An event only
+leaves the queue once the backend acknowledged it, so events queued while disconnected are flushed in order after the
+next connection. Each event carries an `event_id` so the backend can ignore an event it receives twice because its
+acknowledgement got lost.
+
+Critical events are also written to `~/ranked_dst/outbox.json`, so they are sent after an app restart too. Events
+carry the proxy secret hash the backend identifies the player by, but it is only added when an event is sent, so it
+is never written to disk. The queue holds at most `MAX_OUTBOX_EVENTS` events; when it is full, non-critical events
+are dropped first.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+import socketio
+
+from RankedDST.tools.config import get_data_dir
+from RankedDST.tools.atomic_file import atomic_write_json
+from RankedDST.tools.logger import logger
+
+OUTBOX_FILE_NAME = "outbox.json"
+MAX_OUTBOX_EVENTS = 64
+ACK_TIMEOUT = 10 # seconds to wait for the backend to acknowledge an event
+RETRY_INTERVAL = 5 # seconds between attempts to send an unacknowledged event
+NAMESPACE = "/proxy"
+
+
+@dataclass
+class OutboxEvent:
+    """
+    An event waiting to be acknowledged by the backend.
+    """
+    event: str
+    data: dict
+    critical: bool = True
+    event_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: float = field(default_factory=time.time)
+    attempts: int = 0
+
+    def payload(self, secret_hash: str | None = None) -> dict:
+        payload = {**self.data, "event_id": self.event_id}
+        if secret_hash is not None:
+            payload["proxy_secret_hash"] = secret_hash
+        return payload
+
+
+class EventOutbox:
+    """
+    An ordered, bounded queue of outbound events and the thread that delivers them.
+    """
+    def __init__(self, persist_path: Path | None = None, max_events: int = MAX_OUTBOX_EVENTS):
+        self.persist_path = persist_path
+        self.max_events = max_events
+        self.events: deque[OutboxEvent] = deque()
+        self.client: socketio.Client | None = None
+        self.secret_hash: str | None = None # the proxy secret hash of the session, added to every event sent
+        self.ready = False # the client is connected and authenticated
+        self.cond = threading.Condition()
+        self.sender: threading.Thread | None = None
+        self.sent = 0
+        self.dropped = 0
+        self._load()
+
+    # -------------------- PERSISTENCE -------------------- #
+    def _load(self) -> None:
+        if self.persist_path is None:
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as file:
+                events = [OutboxEvent(**event) for event in json.load(file)]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring the unreadable event outbox: {e}")
+            return
+
+        # Events written by older versions carried the hash of the proxy secret. It is added again when sent.
+        stripped = [event for event in events if event.data.pop("proxy_secret_hash", None) is not None]
+
+        self.events.extend(events[-self.max_events:])
+        if stripped:
+            with self.cond:
+                self._persist()
+        if self.events:
+            logger.info(f"📬 {len(self.events)} events from the last run are waiting to be sent")
+
+    def _persist(self) -> None:
+        """
+        Writes the critical events to disk. Called with `cond` held.
+        """
+        if self.persist_path is None:
+            return
+        try:
+            atomic_write_json(self.persist_path, [asdict(e) for e in self.events if e.critical], indent=None)
+        except OSError as e:
+            logger.warning(f"Failed to save the event outbox: {e}")
+
+    # -------------------- QUEUEING -------------------- #
+    def _make_room(self) -> None:
+        """
+        Drops events until there is room for one more. Called with `cond` held.
+        """
+        while len(self.events) >= self.max_events:
+            victim = next((e for e in self.events if not e.critical), self.events[0])
+            self.events.remove(victim)
+            self.dropped += 1
+            logger.warning(f"⚠️ The event outbox is full. Dropped {victim.event} from {time.ctime(victim.created_at)}")
+
+    def emit(self, event: str, data: dict, critical: bool = True) -> OutboxEvent | None:
+        """
+        Queues an event to be sent to the backend.
+
+        Parameters
+        ----------
+        event: str
+            The socketio event name
+        data: dict
+            The event payload. An `event_id` is added to it.
+        critical: bool (default True)
+            Whether the event is kept across app restarts and dropped last when the outbox is full
+
+        Returns
+        -------
+        queued: OutboxEvent | None
+            The queued event, or None if it is not critical and an identical event was already waiting
+        """
+        with self.cond:
+            # A critical event is a transition of its own even when it repeats the previous one, such as leaving the
+            # world again after rejoining it. Repeated non-critical events add nothing.
+            last = self.events[-1] if self.events else None
+            if not critical and last is not None and last.event == event and last.data == data:
+                return None
+
+            self._make_room()
+            queued = OutboxEvent(event=event, data=dict(data), critical=critical)
+            self.events.append(queued)
+            if critical:
+                self._persist()
+            self._ensure_sender()
+            self.cond.notify_all()
+
+        if not self.ready:
+            logger.info(f"📬 Queued {event} until the socket is connected")
+        return queued
+
+    def pending(self) -> list[str]:
+        with self.cond:
+            return [e.event for e in self.events]
+
+    def clear(self) -> None:
+        """
+        Drops every waiting event, such as when the user logs out.
+        """
+        with self.cond:
+            self.events.clear()
+            self._persist()
+
+    # -------------------- CONNECTION -------------------- #
+    def connected(self, client: socketio.Client, secret_hash: str | None = None) -> None:
+        """
+        Called once the client is connected and authenticated. Starts flushing the waiting events.
+
+        Parameters
+        ----------
+        client: socketio.Client
+            The client the events are sent through
+        secret_hash: str | None (default None)
+            The hashed proxy secret of the session, sent along with every event
+        """
+        with self.cond:
+            self.client = client
+            self.secret_hash = secret_hash
+            self.ready = True
+            if self.events:
+                logger.info(f"📬 Flushing {len(self.events)} queued events")
+                self._ensure_sender()
+            self.cond.notify_all()
+
+    def disconnected(self) -> None:
+        with self.cond:
+            self.ready = False
+
+    # -------------------- SENDING -------------------- #
+    def _ensure_sender(self) -> None:
+        """
+        Starts the sender thread if it is not running. Called with `cond` held.
+        """
+        if self.sender is None or not self.sender.is_alive():
+            self.sender = threading.Thread(target=self._run_sender, name="event-outbox", daemon=True)
+            self.sender.start()
+
+    def _run_sender(self) -> None:
+        while True:
+            with self.cond:
+                while not (self.ready and self.events and self.client is not None):
+                    self.cond.wait()
+                event = self.events[0]
+                client = self.client
+                payload = event.payload(secret_hash=self.secret_hash)
+                event.attempts += 1
+
+            try:
+                client.call(event.event, payload, namespace=NAMESPACE, timeout=ACK_TIMEOUT)
+            except socketio.exceptions.SocketIOError as e:
+                # Disconnected or not acknowledged in time. The event stays first in line.
+                logger.info(f"📬 {event.event} was not acknowledged (attempt {event.attempts}): {type(e).__name__}")
+                with self.cond:
+                    self.cond.wait(timeout=RETRY_INTERVAL)
+                continue
+
+            with self.cond:
+                if self.events and self.events[0] is event:
+                    self.events.popleft()
+                    self.sent += 1
+                    if event.critical:
+                        self._persist()
+            logger.info(f"📬 Delivered {event.event} ({time.time() - event.created_at:.1f}s after it happened)")
+
+
+OUTBOX = EventOutbox(persist_path=Path(get_data_dir()) / OUTBOX_FILE_NAME)
@@ -4,30 +4,128 @@ RankedDST/networking/proxy.py
 This module establishes a proxy server that forwards requests from
 
 http://localhost:3035 -> http://localhost:5000 or https://dontgetlosttogether.com/api
+
+With the `socket` transport of `match_transport`, match events are instead sent as acknowledged
+`match_event` emits on the app's socket.io connection. The connection is already authenticated, so no proxy secret
+hash is sent, and an event only costs one websocket frame each way instead of a new HTTPS request. When the socket
+session is down or the backend does not acknowledge the event in time, the event is posted over HTTP as before. Events
+sent on the socket carry an `event_id` so the backend can ignore one that arrives through both; events only posted
+over HTTP are forwarded unchanged. After an unacknowledged event, the rest of the session's events are posted over
+HTTP right away.
+
+With the asyncio runtime of `tools/async_runtime.py`, the proxy is an aiohttp server on the runtime's event loop
+instead of a Flask server with a thread per request.
 """
 
 from flask import Flask, request, Response
 import requests
+import asyncio
+import importlib.util
 import json
+import threading
+import uuid
+from functools import lru_cache
+
+import socketio
+
+if importlib.util.find_spec("aiohttp") is not None:
+    import aiohttp
+    from aiohttp import web
 
 import RankedDST.tools.state as state
 from RankedDST.tools.secret import hash_string
 from RankedDST.tools.logger import logger
+from RankedDST.tools.async_runtime import RUNTIME, asyncio_enabled
+from RankedDST.networking.link_monitor import LINK_MONITOR
+from RankedDST.networking.socket import CONNECTION
+from RankedDST.networking import match_transport
+from RankedDST.networking.async_client import AsyncClientBridge
 
 from RankedDST.ui.window import get_window
 from RankedDST.ui.updates import show_popup
 
+SOCKET_ACK_TIMEOUT = 2 # seconds to wait for the backend to acknowledge a match event before posting it over HTTP
+HTTP_TIMEOUT = 5
+
+
+@lru_cache(maxsize=4)
+def _secret_hash(raw_secret: str) -> str:
+    # The secret rarely changes, so it is hashed once instead of for every event
+    return hash_string(raw_secret)
+
+
+def _forward_over_socket(endpoint: str, payload: dict) -> Response | None:
+    """
+    Sends a match event on the socket session and waits for the backend's acknowledgement.
+
+    The backend acknowledges with the body its HTTP endpoint would answer, optionally with a `status` code.
+
+    Returns
+    -------
+    response: Response | None
+        The backend's answer, or None if the event has to be posted over HTTP
+    """
+    client = CONNECTION.session_client()
+    if client is None:
+        return None
+
+    _stamp_event(payload)
+    try:
+        ack = client.call(
+            "match_event",
+            {"endpoint": endpoint, **payload},
+            namespace="/proxy",
+            timeout=SOCKET_ACK_TIMEOUT,
+        )
+    except socketio.exceptions.SocketIOError as e:
+        logger.info(f"⚠️ Match event {endpoint} was not acknowledged ({type(e).__name__}). Using HTTP")
+        match_transport.record_unacked()
+        return None
+
+    body, status = _ack_response(ack)
+    return Response(json.dumps(body), status=status, mimetype="application/json")
+
+
+def _ack_response(ack) -> tuple[dict, int]:
+    """
+    The body and status code of the backend's acknowledgement of a match event.
+    """
+    body = dict(ack) if isinstance(ack, dict) else {}
+    status = body.pop("status", 200)
+    return body, status if isinstance(status, int) else 200
+
+
+def _stamp_event(payload: dict) -> None:
+    # Only events sent on the socket are stamped. They keep their stamp if they are then posted over HTTP.
+    # Lets the backend tell slow reports caused by the player's network apart from its own slowness
+    payload["link_stats"] = LINK_MONITOR.stats()
+    payload["event_id"] = uuid.uuid4().hex
+
+
+def _start_run_if_ready() -> None:
+    """
+    The first match event of a ready world means the player started their run.
+    """
+    if state.get_match_state() == state.MatchWorldReady:
+        state.set_match_state(state.MatchInProgress, get_window())
+        logger.info("  Player has started their run!")
+
 
 def _forward_to_backend(endpoint: str, payload: dict) -> Response:
+    if match_transport.use_socket():
+        response = _forward_over_socket(endpoint, payload)
+        if response is not None:
+            return response
+
     # Inject secret hash
     raw_secret = state.get_user_data("proxy_secret")
-    payload["proxy_secret_hash"] = hash_string(raw_secret)
+    payload["proxy_secret_hash"] = _secret_hash(raw_secret)
 
     try:
         resp = requests.post(
             state.route_url() + endpoint,
             json=payload,
-            timeout=5,
+            timeout=HTTP_TIMEOUT,
         )
     except requests.RequestException:
         show_popup(window=get_window(), popup_msg="Failed to reach backend", button_msg="Uh oh...")
@@ -75,9 +173,7 @@ def create_proxy() -> Flask:
     
         logger.info(f"Received payload: {payload}")
 
-        if state.get_match_state() == state.MatchWorldReady:
-            state.set_match_state(state.MatchInProgress, get_window())
-            logger.info("  Player has started their run!")
+        _start_run_if_ready()
 
         endpoint = payload.pop('endpoint', None)
         if not endpoint:
@@ -101,3 +197,122 @@ def start_proxy_server(host: str, port: int) -> None:
         threaded=True, 
         use_reloader=False
     )
+
+
+async def _forward_to_backend_async(session: "aiohttp.ClientSession", endpoint: str, payload: dict) -> "web.Response":
+    """
+    `_forward_to_backend` for the asyncio proxy. Nothing blocks the event loop while waiting on the backend.
+    """
+    client = CONNECTION.session_client() if match_transport.use_socket() else None
+    if isinstance(client, AsyncClientBridge):
+        _stamp_event(payload)
+        try:
+            ack = await client.client.call(
+                "match_event",
+                {"endpoint": endpoint, **payload},
+                namespace="/proxy",
+                timeout=SOCKET_ACK_TIMEOUT,
+            )
+            body, status = _ack_response(ack)
+            return web.json_response(body, status=status)
+        except socketio.exceptions.SocketIOError as e:
+            logger.info(f"⚠️ Match event {endpoint} was not acknowledged ({type(e).__name__}). Using HTTP")
+            match_transport.record_unacked()
+
+    payload["proxy_secret_hash"] = _secret_hash(state.get_user_data("proxy_secret"))
+    try:
+        async with session.post(
+            state.route_url() + endpoint,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        ) as resp:
+            content = await resp.read()
+            content_type = resp.headers.get("Content-Type", "application/json")
+            return web.Response(body=content, status=resp.status, headers={"Content-Type": content_type})
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        await RUNTIME.run_blocking(
+            show_popup, window=get_window(), popup_msg="Failed to reach backend", button_msg="Uh oh..."
+        )
+        return web.json_response({"error": "backend unreachable"}, status=502)
+
+
+def create_async_proxy() -> "web.Application":
+    """
+    Creates the aiohttp version of the proxy created by `create_proxy`, with the same `/match_event` endpoint.
+
+    Returns
+    -------
+    proxy_app: aiohttp.web.Application
+        The aiohttp application
+    """
+    proxy_app = web.Application()
+
+    async def client_session(app: web.Application):
+        # One connection pool to the backend for every event
+        app["session"] = aiohttp.ClientSession()
+        yield
+        await app["session"].close()
+
+    async def match_event(request: web.Request) -> web.Response:
+        logger.info("Match event!")
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+        if not payload or not isinstance(payload, dict):
+            logger.warning("Received an invalid payload")
+            return web.json_response({"error": "invalid json"}, status=400)
+
+        logger.info(f"Received payload: {payload}")
+
+        if state.get_match_state() == state.MatchWorldReady:
+            # Updating the UI blocks
+            await RUNTIME.run_blocking(_start_run_if_ready)
+
+        endpoint = payload.pop('endpoint', None)
+        if not endpoint:
+            logger.warning(f"No endpoint provided")
+            return web.json_response({"error": "no endpoint provided"}, status=401)
+
+        return await _forward_to_backend_async(request.app["session"], endpoint, payload)
+
+    proxy_app.cleanup_ctx.append(client_session)
+    proxy_app.router.add_post("/match_event", match_event)
+    return proxy_app
+
+
+async def _serve_async_proxy(host: str, port: int) -> "web.AppRunner":
+    runner = web.AppRunner(create_async_proxy(), access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=host, port=port).start()
+    except OSError:
+        await runner.cleanup() # closes the backend session
+        raise
+    return runner
+
+
+def start_proxy(host: str, port: int) -> None:
+    """
+    Starts the proxy server in the background: on the event loop with the asyncio runtime, otherwise as a Flask
+    server on its own thread.
+
+    Raises
+    ------
+    OSError
+        With the asyncio runtime, if the port cannot be bound. The Flask server reports it from its own thread.
+    """
+    if asyncio_enabled():
+        RUNTIME.run(_serve_async_proxy(host=host, port=port))
+        logger.info(f"🌐 Proxy listening on {host}:{port} (asyncio)")
+        return
+
+    threading.Thread(
+        target=start_proxy_server,
+        kwargs={
+            "host": host,
+            "port": port,
+        },
+        daemon=True,
+    ).start()
+
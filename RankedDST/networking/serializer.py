@@ -0,0 +1,77 @@
+"""
+RankedDST/networking/serializer.py
+
+This module selects the packet serializer of the `/proxy` socket.
+
+Socket.IO encodes every packet as JSON text by default. With `"socket_serializer": "msgpack"` in the config, the
+client encodes its packets with MessagePack instead: smaller frames and no JSON parsing, mostly felt on the world
+files and the world config payloads. It needs the optional `msgpack` package and a backend that accepts MessagePack
+packets.
+
+Socket.IO has no way to agree on a serializer within a connection, so the choice is negotiated by trying: the client
+connects with its preferred serializer first, and if the transport opens but the namespace never connects the
+backend could not read the packets, so that serializer is dropped for the rest of the run and the next one is tried.
+JSON is always the last resort.
+"""
+import importlib.util
+import threading
+
+from RankedDST.tools.logger import logger
+
+SOCKET_SERIALIZERS = ["json", "msgpack"]
+DEFAULT_SERIALIZER = "json"
+
+socket_serializer = DEFAULT_SERIALIZER
+
+_rejected: set[str] = set() # serializers the backend did not accept this run
+_lock = threading.Lock()
+
+
+def set_socket_serializer(serializer: str) -> None:
+    """
+    Selects the serializer tried first on the next connection.
+
+    Raises
+    ------
+    ValueError
+        If the serializer is unknown, or is `msgpack` without the `msgpack` package installed
+    """
+    if serializer not in SOCKET_SERIALIZERS:
+        raise ValueError(f"Socket serializer must be one of {SOCKET_SERIALIZERS}, got '{serializer}'")
+    if serializer == "msgpack" and importlib.util.find_spec("msgpack") is None:
+        raise ValueError("The msgpack serializer needs the 'msgpack' package")
+
+    global socket_serializer
+    with _lock:
+        socket_serializer = serializer
+        _rejected.discard(serializer)
+
+
+def serializer_candidates() -> list[str]:
+    """
+    The serializers to try connecting with, in order. Always ends with JSON.
+    """
+    with _lock:
+        candidates = [socket_serializer] if socket_serializer != DEFAULT_SERIALIZER else []
+        candidates = [s for s in candidates if s not in _rejected]
+    return candidates + [DEFAULT_SERIALIZER]
+
+
+def reject_serializer(serializer: str) -> None:
+    """
+    Stops trying a serializer the backend did not accept, until it is selected again.
+    """
+    if serializer == DEFAULT_SERIALIZER:
+        return
+    with _lock:
+        if serializer in _rejected:
+            return
+        _rejected.add(serializer)
+    logger.warning(f"⚠️ The backend did not accept the {serializer} socket serializer. Using {DEFAULT_SERIALIZER}")
+
+
+def client_serializer(serializer: str) -> str:
+    """
+    The `serializer` argument of `socketio.Client` for a serializer name.
+    """
+    return "default" if serializer == "json" else serializer
@@ -4,252 +4,588 @@ RankedDST/networking/socket.py
 This module establishes a webscocket connection using flask's socketio
 
 The connection is to either http://localhost:5000/proxy or https://dontgetlosttogether.com/proxy
+
+A single client is kept for the whole run of the app. When the connection drops, the client reconnects on its own
+with an exponential backoff and jitter, and the match state is kept in the meantime so reconnecting only needs a
+light resume instead of the full startup handshake.
+
+With the asyncio runtime of `tools/async_runtime.py`, the client is a `socketio.AsyncClient` on the runtime's event
+loop, behind the same blocking interface (`networking/async_client.py`).
+
+Packets are JSON encoded unless another serializer is selected in `networking/serializer.py`. A serializer the
+backend cannot read is given up on and the connection falls back to JSON.
 """
 
+import threading
+import time
 import webview
 import socketio
-from threading import Event
+from dataclasses import dataclass
+from threading import Lock
 
 import RankedDST.tools.state as state
 
 from RankedDST.tools.secret import hash_string
 from RankedDST.tools.config import save_data
 from RankedDST.tools.logger import logger
+from RankedDST.tools.async_runtime import asyncio_enabled
 from RankedDST.ui.updates import show_popup
 
-from RankedDST.dedicated_server.world_launcher import start_dedicated_server, stop_dedicated_server
+from RankedDST.dedicated_server.world_launcher import start_dedicated_server, stop_dedicated_server, relaunch_cluster
+from RankedDST.dedicated_server.server_manager import SERVER_MANAGER
+from RankedDST.networking.outbox import OUTBOX
+from RankedDST.networking.link_monitor import LINK_MONITOR
+from RankedDST.networking import match_transport
+from RankedDST.networking.handler_executor import HANDLER_EXECUTOR, dispatch, match_key
+from RankedDST.networking.config_transfer import ConfigCacheMiss, advertise_configs, decode_configs
+from RankedDST.networking.async_client import AsyncClientBridge
+from RankedDST.networking.serializer import (
+    DEFAULT_SERIALIZER, client_serializer, reject_serializer, serializer_candidates
+)
 
 from RankedDST.ui.window import get_window
 
+RECONNECT_DELAY = 1 # seconds before the first reconnection attempt, doubled after every failed attempt
+RECONNECT_DELAY_MAX = 60
+RECONNECT_JITTER = 0.5 # every delay is randomized by up to ±50% so clients do not reconnect in lockstep
+MAX_UNANSWERED_OPENS = 2 # transports opened in a row without the namespace connecting before a serializer is dropped
+
 # Global socket client
 client_socket: socketio.Client | None = None
 
 
-def connect_websocket() -> socketio.Client | None:
+@dataclass
+class ReconnectStats:
     """
-    Attempts to establish a socketio websocket connection. The user_data's proxy secret
-    is obtained, hashed, then used for authentication.
-
-    Returns
-    -------
-    client_socket: socketio.Client
-        The global socketio client object.
+    How often the connection dropped and how long it took to come back.
     """
-    logger.info("Connecting websocket...")
-    auth_fail: bool = False
-
-    auth_ready = Event()
-
-    global client_socket
-    window_object = get_window()
-    if not isinstance(window_object, webview.Window):
-        return client_socket
-    
-    if isinstance(client_socket, socketio.Client) and client_socket.connected:
-        logger.info(" Socket is already connected")
-        return client_socket
-    
-    state.ensure_prerequisites(window=window_object)
-
-    raw_secret = state.get_user_data("proxy_secret")
-    if not raw_secret or raw_secret == "":
-        state.set_connection_state(state.ConnectionNotConnected, window_object)
-        state.set_match_state(state.MatchNone, window_object)
-        stop_dedicated_server()
-        logger.info("🕹️ No Proxy secret stored — skipping connection.")
-        return client_socket
-    
-    state.set_connection_state(state.ConnectionConnecting, window_object)
-
-    hashed = hash_string(raw_secret)
-
-    client_socket = socketio.Client(
-        reconnection=True,
-        reconnection_attempts=0,  # infinite
-        reconnection_delay=2,
-        logger=False,
-        engineio_logger=False,
-    )
-
-    @client_socket.on("connect", namespace="/proxy")
-    def connect_proxy():
+    reconnects: int = 0
+    failed_attempts: int = 0
+    last_seconds: float | None = None
+    max_seconds: float = 0.0
+    total_seconds: float = 0.0
+    disconnected_at: float | None = None # time.monotonic() of the drop being recovered from
+
+    def record_reconnect(self) -> float:
+        elapsed = time.monotonic() - self.disconnected_at if self.disconnected_at is not None else 0.0
+        self.reconnects += 1
+        self.last_seconds = elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        self.total_seconds += elapsed
+        self.disconnected_at = None
+        return elapsed
+
+    def as_dict(self) -> dict[str, int | float | None]:
+        return {
+            "reconnects": self.reconnects,
+            "failed_attempts": self.failed_attempts,
+            "last_seconds": self.last_seconds,
+            "max_seconds": self.max_seconds,
+            "average_seconds": self.total_seconds / self.reconnects if self.reconnects else None,
+        }
+
+
+class ConnectionManager:
+    """
+    Owns the app's socketio client. The client and its handlers are created once and reused by every connection.
+    """
+    def __init__(self):
+        self.client: socketio.Client | None = None
+        self.serializer: str | None = None # the serializer of `client`
+        self.unanswered_opens = 0 # transports opened since the namespace last connected
+        self.lock = Lock()
+        self.connecting = False # a `connect` call is in progress
+        self.reconnecting = False # the connection dropped and the client is reconnecting on its own
+        self.closing = False # the disconnect was asked for, so the state is reset instead of kept
+        self.auth_fail = False
+        self.prerequisites_checked = False
+        self.prerequisites_lock = Lock()
+        # The handshake of the current connection
+        self.namespace_connected = False
+        self.accepted: dict | None = None # the `connection_accepted` reply
+        self.session_started = False
+        self.stats = ReconnectStats()
+
+    def _auth(self) -> dict:
         """
-        Built in socketio event. Triggers after the initial connection succeeds, which means that
-        connection_accepted has already triggered. Therefore the in-memory user_data state is now
-        populated.
+        The auth payload, built again for every connection attempt so reconnects send the current state.
 
-        If match_id is not none in state.user_data, then the `request_world_files` event is emitted.
+        Along with the hashed proxy secret it carries the app version and the resume intent: the match the app
+        believes it is in, its match state and whether that match's world is still running. The backend answers
+        all of it in `connection_accepted`.
+        """
+        with self.lock:
+            self.namespace_connected = False
+            self.accepted = None
+            self.session_started = False
+            # Only called once the transport is open. Opening again and again without the namespace ever
+            # connecting means the backend cannot read the packets.
+            self.unanswered_opens += 1
+            give_up = self.serializer != DEFAULT_SERIALIZER and self.unanswered_opens >= MAX_UNANSWERED_OPENS
+        if give_up:
+            self._give_up_serializer()
 
-        Emits an 'app_version' event to the backend as well.
+        match_id = state.get_user_data("match_id")
+        return {
+            "proxy_secret_hash": hash_string(state.get_user_data("proxy_secret") or ""),
+            "version": state.VERSION,
+            "resume": {
+                "match_id": match_id,
+                "match_state": state.get_match_state(),
+                "world_running": bool(match_id) and SERVER_MANAGER.is_running(match_id),
+            },
+            **advertise_configs(),
+        }
+
+    def _start_session(self, client_socket: socketio.Client, window_object: webview.Window, accepted: dict) -> None:
         """
-        auth_ready.wait(timeout=2)
-        logger.info("On connect proxy")
-        print(f"Connect proxy starting with match state {state.get_match_state()}")
-        nonlocal auth_fail
-        if auth_fail:
-            logger.info("⚠️ Auth Failed so Disconnecting ⚠️")
-            return
-        logger.info("✅ Socket.IO connected to /proxy")
-        state.set_connection_state(state.ConnectionConnected, window_object)
+        Finishes the handshake once both the namespace is connected and `connection_accepted` arrived, whichever
+        came last. Runs once per connection.
+        """
+        with self.lock:
+            if self.session_started:
+                return
+            self.session_started = True
 
-        client_socket.emit(
-            "app_version",
-            {"version" : state.VERSION},
-            namespace="/proxy"
+        state.set_connection_state(state.ConnectionConnected, window_object)
+        match_transport.session_started()
+        if "version_ok" not in accepted:
+            client_socket.emit(
+                "app_version",
+                {"version" : state.VERSION},
+                namespace="/proxy"
+            )
+        OUTBOX.connected(client_socket, secret_hash=hash_string(state.get_user_data("proxy_secret") or ""))
+        LINK_MONITOR.start(client_socket)
+
+        # Resuming may relaunch the shards, so it runs in order with the other events of the match
+        HANDLER_EXECUTOR.submit(
+            match_key("match_id")(accepted),
+            self._resume_match,
+            client_socket, window_object, match_id=accepted.get("match_id"), world_files=accepted.get("world_files"),
         )
-
-        match_id = state.get_user_data("match_id")
+        logger.debug(f"Connection accepted ending with match state {state.get_match_state()}")
+
+    def _resume_match(
+        self,
+        client_socket: socketio.Client,
+        window_object: webview.Window,
+        match_id: str | None,
+        world_files: dict | None,
+    ) -> None:
+        """
+        Gets the app back into the match the backend says the user is in.
+        """
         if not match_id:
             logger.info("Not in a match")
             state.set_match_state(state.MatchNone, window_object)
             return
-        
-        current_match_state = state.get_match_state()
-        if current_match_state != state.MatchCompleted:
-            logger.info(f"In a match with state {current_match_state}! Requesting world files!")
-            client_socket.emit(
-                "request_world_files", 
-                {"match_id": match_id, "proxy_secret_hash": hashed}, 
-                namespace="/proxy"
-            )
 
-    @client_socket.on("disconnect", namespace="/proxy")
-    def on_proxy_disconnect():
-        """
-        Built in socketio event. Called when the `disconnect()` method for the socketio Client object
-        is invoked. No error is raised.
+        current_match_state = state.get_match_state()
+        if current_match_state == state.MatchCompleted:
+            return
+        if SERVER_MANAGER.is_running(match_id):
+            logger.info(f"The world of match {match_id} is still running. Not requesting world files.")
+            return
+        if relaunch_cluster(match_id=match_id, window=window_object):
+            return
 
-        Will reset all user/connection/match state to the default.
-        """
+        if isinstance(world_files, dict):
+            logger.info(f"In a match with state {current_match_state}! World files came with the handshake")
+            self._launch_world(client_socket, window_object, world_files=world_files, match_id=match_id)
+            return
 
-        logger.info(f"🛜 Proxy disconnect 🛜")
-        state.set_user_data(new_values={"user_id" : None, "username" : None, "match_id" : None})
-        state.set_connection_state(new_state=state.ConnectionNotConnected, window=window_object)
-        state.set_match_state(new_state=state.MatchNone, window=window_object)
+        logger.info(f"In a match with state {current_match_state}! Requesting world files!")
+        self._request_world_files(client_socket, match_id=match_id)
 
-    @client_socket.on("connect_error", namespace="/proxy")
-    def on_connect_error(data):
+    def _request_world_files(self, client_socket: socketio.Client, match_id: str, full: bool = False) -> None:
         """
-        Built in socketio event. Raises an error when something goes wrong on the transport level.
+        Asks the backend for the world files of the match. Unless `full`, the cached configs are advertised so
+        the backend only sends the files that changed.
+        """
+        client_socket.emit(
+            "request_world_files", 
+            {
+                "match_id": match_id,
+                "proxy_secret_hash": hash_string(state.get_user_data("proxy_secret")),
+                **(advertise_configs() if not full else {}),
+            },
+            namespace="/proxy"
+        )
 
-        Sets the connection state to `state.ConnectionServerDown`.
+    def _launch_world(
+        self,
+        client_socket: socketio.Client,
+        window_object: webview.Window,
+        world_files: dict,
+        match_id: str | None,
+    ) -> None:
+        """
+        Decodes the world files sent by the backend and starts the dedicated server with them.
         """
+        try:
+            server_configs = decode_configs(world_files)
+        except ConfigCacheMiss as e:
+            logger.info(f"⚠️ {e}. Requesting the full world files")
+            self._request_world_files(client_socket, match_id=match_id or world_files.get("MatchId"), full=True)
+            return
+        except ValueError as e:
+            logger.warning(f"❌ Received unreadable world files: {e}. Requesting the full world files")
+            self._request_world_files(client_socket, match_id=match_id or world_files.get("MatchId"), full=True)
+            return
 
-        logger.info(f"❌ Connect error: {type(data)} - {data}")
-        state.set_connection_state(new_state=state.ConnectionServerDown, window=window_object)
+        try:
+            start_dedicated_server(server_configs=server_configs, window=window_object)
+        except Exception as e:
+            show_popup(window=window_object, popup_msg=f"Failed to launch dedicated server: {e}", button_msg="Oh no...")
+            logger.info(f"❌ Failed to launch dedicated server: {e}")
 
-    @client_socket.on("connection_accepted", namespace="/proxy")
-    def on_connection_accepted(data):
+    def _give_up_serializer(self) -> None:
         """
-        Defined by us. Emitted by the backend if the hashed proxy secret is approved on connection.
-
-        Provides user data.
+        Stops the reconnection loop of a client whose serializer the backend does not read, and connects again with
+        the next serializer.
+        """
+        client = self.client
+        reject_serializer(self.serializer)
+        client.reconnection_attempts = 1 # the loop gives up after the attempt in progress
+        if self.connecting:
+            return # `connect` moves on to the next serializer when the attempt fails
+
+        def reconnect() -> None:
+            client.shutdown()
+            self.reconnecting = False
+            self.connect()
+        threading.Thread(target=reconnect, name="socket-renegotiate", daemon=True).start()
+
+    def _try_connect(self, window_object: webview.Window, serializer: str) -> bool:
+        """
+        Connects with a serializer, creating a new client if the current one uses another serializer.
 
-        Payload
+        Returns
         -------
-        user_id: str
-            The user id of the user.
-        username: str
-            The username for the user. Will be displayed on the UI
-        match_id : int | None
-            The match id of the live match the user is in. If the user in not in a live match, then None
-            is provided.
+        done: bool
+            False if the backend did not accept the serializer and the next one should be tried
         """
+        with self.lock:
+            if self.client is None or self.serializer != serializer:
+                self.client = self._create_client(window_object, serializer=serializer)
+                self.serializer = serializer
+            self.unanswered_opens = 0
 
-        logger.info("On connection accepted")
-        logger.info("✅ Auth successful")
-
-        user_id = data.get("user_id")
-        username = data.get("username")
-        match_id = data.get("match_id", None)
-        match_status = data.get("match_status", None)
-
-        print(f"Connection accepted returned: {data}")
+        try:
+            logger.info(f"🔌 Connecting Socket.IO client ({serializer}) 🔌")
+            self.client.connect(
+                state.socket_url(),
+                namespaces=["/proxy"],
+                auth=self._auth,
+                transports=["websocket"],
+                retry=True
+            )
+        except Exception as e:
+            # Exceptions are raised for issues at the transport level
+            logger.info(f"❌ Socket connect failed: {type(e)} - {e}")
+            if serializer != DEFAULT_SERIALIZER and self.unanswered_opens > 0 and not self.auth_fail:
+                reject_serializer(serializer)
+                return False
+        return True
+
+    def connect(self) -> socketio.Client | None:
+        """
+        Attempts to establish a socketio websocket connection. The user_data's proxy secret
+        is obtained, hashed, then used for authentication.
 
-        state.set_user_data(
-            new_values={"user_id" : user_id, "username" : username, "match_id" : match_id},
-            window=window_object
-        )
-        if match_status == "completed":
-            state.set_match_state(state.MatchCompleted, window=window_object)
+        Returns
+        -------
+        client_socket: socketio.Client
+            The global socketio client object.
+        """
+        logger.info("Connecting websocket...")
+
+        window_object = get_window()
+        if not isinstance(window_object, webview.Window):
+            return self.client
+
+        # The paths and versions only need to be checked once per run. Checking can wait on the user for as long as
+        # it takes, so it has a lock of its own instead of holding up every other user of `lock`.
+        with self.prerequisites_lock:
+            if not self.prerequisites_checked:
+                state.ensure_prerequisites(window=window_object)
+                self.prerequisites_checked = True
+
+        with self.lock:
+            if self.client is not None and (self.client.connected or self.connecting or self.reconnecting):
+                logger.info(" Socket is already connected")
+                return self.client
+
+            raw_secret = state.get_user_data("proxy_secret")
+            has_secret = bool(raw_secret)
+            if has_secret:
+                state.set_connection_state(state.ConnectionConnecting, window_object)
+                self.connecting = True
+                self.closing = False
+                self.auth_fail = False
+            else:
+                state.set_connection_state(state.ConnectionNotConnected, window_object)
+                state.set_match_state(state.MatchNone, window_object)
+
+        if not has_secret:
+            # Stopping waits on the shards, so it is done without holding the lock
+            stop_dedicated_server()
+            logger.info("🕹️ No Proxy secret stored — skipping connection.")
+            return self.client
 
-        print(f"Connection accepted ending with match state {state.get_match_state()}")
-        auth_ready.set()
+        try:
+            for serializer in serializer_candidates():
+                if self._try_connect(window_object, serializer):
+                    break
+        finally:
+            self.connecting = False
+        return self.client
+
+    def session_client(self) -> socketio.Client | None:
+        """
+        The client if its session is up: connected to the namespace and accepted by the backend. Events emitted
+        through it are authenticated by the connection, so they need no proxy secret hash.
+        """
+        with self.lock:
+            if self.session_started and self.namespace_connected:
+                return self.client
+        return None
 
-    # Auth rejection
-    @client_socket.on("connection_denied", namespace="/proxy")
-    def on_connection_denied(_):
+    def disconnect(self) -> socketio.Client | None:
         """
-        Defined by us. Emitted by the backend during initial connection if the provided hashed secret did
-        not exist in the database. Raises an error?
+        Closes the connection and stops any reconnection in progress.
         """
+        if self.client is None:
+            logger.warning("Cannot disconnect a socket that was never created")
+            return self.client
+
+        self.closing = True
+        OUTBOX.clear() # the queued events belong to the account being logged out of
+        if self.client.connected or self.reconnecting:
+            logger.info("Disconnecting socket connection")
+            self.reconnecting = False
+            self.client.shutdown()
+        else:
+            logger.warning("Can't disconnect a connection that doesn't exist")
+        return self.client
 
-        logger.info("On connection denied")
-        nonlocal auth_fail
-        auth_fail = True
-        logger.info("❌ Auth failed. Resetting secret + state.")
-        state.set_user_data(
-            new_values={"proxy_secret": ""}, 
-            window=window_object,
+    def _create_client(self, window_object: webview.Window, serializer: str = DEFAULT_SERIALIZER) -> socketio.Client:
+        """
+        Creates the socketio client and registers its handlers. With the asyncio runtime the client runs on the
+        runtime's event loop.
+        """
+        client_class = AsyncClientBridge if asyncio_enabled() else socketio.Client
+        client_socket = client_class(
+            serializer=client_serializer(serializer),
+            reconnection=True,
+            reconnection_attempts=0,  # infinite
+            reconnection_delay=RECONNECT_DELAY,
+            reconnection_delay_max=RECONNECT_DELAY_MAX,
+            randomization_factor=RECONNECT_JITTER,
+            logger=False,
+            engineio_logger=False,
         )
-        show_popup(window=window_object, popup_msg="Invalid Proxy Secret")
-        # Our saved secret doesn't work, so we will delete it
-        secret_key = state.get_secret_key()
-        save_data({secret_key : ""})
-        state.set_connection_state(state.ConnectionNotConnected, window_object)
-        client_socket.disconnect()
 
-
-    @client_socket.on("generate_world", namespace="/proxy")
-    def on_generate_world(data):
-        logger.info("🎉 Received generate_world from backend")
+        @client_socket.on("connect", namespace="/proxy")
+        def connect_proxy():
+            """
+            Built in socketio event. Triggers once the transport and namespace are connected. The session itself
+            is set up by `connection_accepted`, the backend's reply to the auth payload, which may arrive before
+            or after this event. Nothing here waits for it.
+            """
+            logger.info("On connect proxy")
+            resumed = self.reconnecting
+            self.reconnecting = False
+            if resumed:
+                elapsed = self.stats.record_reconnect()
+                logger.info(f"✅ Socket.IO reconnected to /proxy after {elapsed:.1f}s (reconnect #{self.stats.reconnects})")
+            else:
+                logger.info("✅ Socket.IO connected to /proxy")
+
+            with self.lock:
+                self.namespace_connected = True
+                self.unanswered_opens = 0
+                accepted = self.accepted
+            if accepted is not None:
+                self._start_session(client_socket, window_object, accepted)
+
+        @client_socket.on("disconnect", namespace="/proxy")
+        def on_proxy_disconnect(reason=None):
+            """
+            Built in socketio event. Called when the connection is closed. No error is raised.
+
+            If the transport dropped, the client reconnects on its own and the user and match state are kept.
+            Otherwise all user/connection/match state is reset to the default.
+            """
+            OUTBOX.disconnected()
+            LINK_MONITOR.record_disconnect()
+            with self.lock:
+                self.namespace_connected = False
+                self.accepted = None
+                self.session_started = False
+            dropped = reason not in (socketio.Client.reason.CLIENT_DISCONNECT, socketio.Client.reason.SERVER_DISCONNECT)
+            if dropped and not self.closing and not self.auth_fail:
+                logger.info(f"🛜 Proxy connection lost ({reason}). Reconnecting 🛜")
+                self.reconnecting = True
+                if self.stats.disconnected_at is None:
+                    self.stats.disconnected_at = time.monotonic()
+                state.set_connection_state(new_state=state.ConnectionConnecting, window=window_object)
+                return
+
+            logger.info(f"🛜 Proxy disconnect 🛜")
+            self.reconnecting = False
+            self.stats.disconnected_at = None
+            state.set_user_data(new_values={"user_id" : None, "username" : None, "match_id" : None})
+            state.set_connection_state(new_state=state.ConnectionNotConnected, window=window_object)
+            state.set_match_state(new_state=state.MatchNone, window=window_object)
+
+        @client_socket.on("connect_error", namespace="/proxy")
+        def on_connect_error(data):
+            """
+            Built in socketio event. Raises an error when something goes wrong on the transport level.
+
+            Sets the connection state to `state.ConnectionServerDown`.
+            """
+
+            logger.info(f"❌ Connect error: {type(data)} - {data}")
+            if self.reconnecting:
+                self.stats.failed_attempts += 1
+            state.set_connection_state(new_state=state.ConnectionServerDown, window=window_object)
+
+        @client_socket.on("connection_accepted", namespace="/proxy")
+        def on_connection_accepted(data):
+            """
+            Defined by us. Emitted by the backend if the hashed proxy secret is approved on connection. This is
+            the whole reply to the handshake: it answers the app version and resume intent sent in the auth
+            payload, so no other round trip is needed before the session is ready.
+
+            Payload
+            -------
+            user_id: str
+                The user id of the user.
+            username: str
+                The username for the user. Will be displayed on the UI
+            match_id : int | None
+                The match id of the live match the user is in. If the user in not in a live match, then None
+                is provided.
+            match_status: str | None
+                'completed' if the user's run of the match is over.
+            version_ok: bool | None
+                Whether the backend read the app version from the auth payload. Optional; older backends
+                leave it out and get an `app_version` event instead.
+            world_files: dict | None
+                The `generate_world` payload of the match, included when the resume intent showed the app has
+                no world running for it. Optional; without it, the files are requested with
+                `request_world_files`.
+            """
+
+            logger.info("On connection accepted")
+            logger.info("✅ Auth successful")
+
+            user_id = data.get("user_id")
+            username = data.get("username")
+            match_id = data.get("match_id", None)
+            match_status = data.get("match_status", None)
+
+            logger.debug(f"Connection accepted returned: {data}")
+
+            state.set_user_data(
+                new_values={"user_id" : user_id, "username" : username, "match_id" : match_id},
+                window=window_object
+            )
+            if match_status == "completed":
+                state.set_match_state(state.MatchCompleted, window=window_object)
+
+            # The reply can arrive before the namespace is connected, when nothing can be emitted yet
+            with self.lock:
+                self.accepted = data
+                namespace_connected = self.namespace_connected
+            if namespace_connected:
+                self._start_session(client_socket, window_object, data)
+
+        # Auth rejection
+        @client_socket.on("connection_denied", namespace="/proxy")
+        def on_connection_denied(_):
+            """
+            Defined by us. Emitted by the backend during initial connection if the provided hashed secret did
+            not exist in the database. Raises an error?
+            """
+
+            logger.info("On connection denied")
+            self.auth_fail = True
+            self.closing = True
+            logger.info("❌ Auth failed. Resetting secret + state.")
+            state.set_user_data(
+                new_values={"proxy_secret": ""}, 
+                window=window_object,
+            )
+            show_popup(window=window_object, popup_msg="Invalid Proxy Secret")
+            # Our saved secret doesn't work, so we will delete it
+            secret_key = state.get_secret_key()
+            save_data({secret_key : ""})
+            state.set_connection_state(state.ConnectionNotConnected, window_object)
+            client_socket.disconnect()
+
+
+        @client_socket.on("generate_world", namespace="/proxy")
+        @dispatch(match_key("MatchId"))
+        def on_generate_world(data):
+            logger.info("🎉 Received generate_world from backend")
+            self._launch_world(client_socket, window_object, world_files=data, match_id=data.get("MatchId"))
+
+        # The backend may leave the match id out of the completion events, which are then about the current match
+        current_match_key = match_key("match_id", default=lambda: state.get_user_data("match_id"))
+
+        @client_socket.on("run_complete", namespace="/proxy")
+        @dispatch(current_match_key)
+        def on_run_complete(data):
+            logger.info("Player's run is complete! Shutting down server")
+            match_id = data.get("match_id", None) if isinstance(data, dict) else None
+            stop_dedicated_server(match_id=match_id if match_id is not None else state.get_user_data("match_id"))
+
+            if state.get_match_state() != state.MatchNone:
+                state.set_match_state(state.MatchCompleted, window_object)
+
+        @client_socket.on("match_complete", namespace="/proxy")
+        @dispatch(current_match_key)
+        def on_match_complete(data):
+            logger.info("Match complete. Shutting down server")
+            match_id = data.get("match_id", None) if isinstance(data, dict) else None
+            stop_dedicated_server(match_id=match_id if match_id is not None else state.get_user_data("match_id"))
+            state.set_match_state(state.MatchNone, window_object)
+    
+        @client_socket.on("show_popup", namespace="/proxy")
+        def on_show_popup(data):
+            show_message = data.get('message', None)
+            button_message = data.get('button_message', None)
+
+            if show_message is None or not isinstance(show_message, str):
+                logger.warning(f"Show popup was given with an incorrect show_message; {type(show_message)}\n\tdata: {type(data)}")
+                return
         
-        try:
-            start_dedicated_server(server_configs=data, window=window_object, client_socket=client_socket)
-        except Exception as e:
-            show_popup(window=window_object, popup_msg=f"Failed to launch dedicated server: {e}", button_msg="Oh no...")
-            logger.info(f"❌ Failed to launch dedicated server: {e}")
+            if isinstance(button_message, str):
+                show_popup(window=window_object, popup_msg=show_message, button_msg=button_message)
+            else:
+                show_popup(window=window_object, popup_msg=show_message)
+
+        return client_socket
 
-    @client_socket.on("run_complete", namespace="/proxy")
-    def on_run_complete(_):
-        logger.info("Player's run is complete! Shutting down server")
-        stop_dedicated_server()
 
-        if state.get_match_state() != state.MatchNone:
-            state.set_match_state(state.MatchCompleted, window_object)
+CONNECTION = ConnectionManager()
 
-    @client_socket.on("match_complete", namespace="/proxy")
-    def on_match_complete(_):
-        logger.info("Match complete. Shutting down server")
-        stop_dedicated_server()
-        state.set_match_state(state.MatchNone, window_object)
-    
-    @client_socket.on("show_popup", namespace="/proxy")
-    def on_show_popup(data):
-        show_message = data.get('message', None)
-        button_message = data.get('button_message', None)
 
-        if show_message is None or not isinstance(show_message, str):
-            logger.warning(f"Show popup was given with an incorrect show_message; {type(show_message)}\n\tdata: {type(data)}")
-            return
-        
-        if isinstance(button_message, str):
-            show_popup(window=window_object, popup_msg=show_message, button_msg=button_message)
-        else:
-            show_popup(window=window_object, popup_msg=show_message)
-
-    try:
-        logger.info("🔌 Connecting Socket.IO client 🔌")
-        client_socket.connect(
-            state.socket_url(),
-            namespaces=["/proxy"],
-            auth={"proxy_secret_hash": hashed},
-            transports=["websocket"],
-            retry=True
-        )
-    except Exception as e:
-        # Exceptions are raised for issues at the transport level
-        logger.info(f"❌ Socket connect failed: {type(e)} - {e}")
+def connect_websocket() -> socketio.Client | None:
+    """
+    Connects the app's socketio client. See `ConnectionManager.connect`.
+
+    Returns
+    -------
+    client_socket: socketio.Client
+        The global socketio client object.
+    """
+    global client_socket
+    client_socket = CONNECTION.connect()
     return client_socket
 
 def disconnect_websocket() -> socketio.Client | None:
@@ -261,14 +597,10 @@ def disconnect_websocket() -> socketio.Client | None:
     client_socket: socketio.Client | None
         The client socketio object
     """
-    global client_socket
-
-    if not isinstance(client_socket, socketio.Client):
-        logger.warning(f"Cannot disconnect an object of type '{type(client_socket)}'")
-    if client_socket.connected:
-        logger.info("Disconnecting socket connection")
-        client_socket.disconnect()
-    else:
-        logger.warning("Can't disconnect a connection that doesn't exist")
+    return CONNECTION.disconnect()
 
-    return client_socket
+def get_reconnect_stats() -> dict[str, int | float | None]:
+    """
+    Returns how often the connection dropped this run and how long reconnecting took.
+    """
+    return CONNECTION.stats.as_dict()
@@ -0,0 +1,172 @@
+"""
+RankedDST/tools/async_runtime.py
+
+This module holds the app's optional asyncio core.
+
+By default (`"runtime": "threads"`) every part of the app runs its own threads: the Flask proxy serves each request on
+a new thread, the socket.io client starts a thread per received event and every shard has a thread reading its output.
+With `"runtime": "asyncio"` in the config, one event loop on one thread hosts the proxy server, the socket.io client,
+the shard output pipes and the log followers of adopted shards. The blocking work they lead to, such as updating the
+UI or saving a cluster, runs on a pool of at most `MAX_BLOCKING_WORKERS` threads. The webview keeps its own thread.
+
+The asyncio runtime needs the optional `aiohttp` package, which the asyncio socket.io client and proxy server use.
+"""
+import asyncio
+import functools
+import importlib.util
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Coroutine
+
+if sys.platform == "win32":
+    import msvcrt
+    from asyncio import windows_utils
+
+RUNTIMES = ["threads", "asyncio"]
+MAX_BLOCKING_WORKERS = 4
+PIPE_LINE_LIMIT = 1024 * 1024 # bytes. A longer shard output line is an error.
+
+runtime = "threads"
+
+
+def set_runtime(name: str) -> None:
+    """
+    Selects the runtime. Only takes effect for the parts of the app started afterwards, so it is set while loading
+    the config, before the proxy and the socket are started.
+
+    Raises
+    ------
+    ValueError
+        If the runtime is unknown, or is `asyncio` without the `aiohttp` package installed
+    """
+    if name not in RUNTIMES:
+        raise ValueError(f"Runtime must be one of {RUNTIMES}, got '{name}'")
+    if name == "asyncio" and importlib.util.find_spec("aiohttp") is None:
+        raise ValueError("The asyncio runtime needs the 'aiohttp' package")
+
+    global runtime
+    runtime = name
+
+
+def asyncio_enabled() -> bool:
+    return runtime == "asyncio"
+
+
+class AsyncRuntime:
+    """
+    An event loop running on its own thread, started on first use, with a bounded pool for blocking work.
+    """
+    def __init__(self, max_workers: int = MAX_BLOCKING_WORKERS):
+        self.max_workers = max_workers
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.thread: threading.Thread | None = None
+        self.executor: ThreadPoolExecutor | None = None
+        self.lock = threading.Lock()
+        # The loop only keeps weak references to its tasks. A task waiting on a pipe is otherwise only referenced by
+        # itself and gets garbage collected mid-read.
+        self.pending: set[Future] = set()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """
+        Starts the loop thread if it is not running yet.
+
+        Returns
+        -------
+        loop: asyncio.AbstractEventLoop
+            The runtime's event loop
+        """
+        with self.lock:
+            if self.loop is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="async-blocking")
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(self.executor)
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.run_forever()
+
+                self.thread = threading.Thread(target=run, name="async-runtime", daemon=True)
+                self.thread.start()
+                self.loop = loop
+        return self.loop
+
+    def in_loop(self) -> bool:
+        """
+        Whether the caller runs on the loop thread, where blocking on the loop would deadlock.
+        """
+        return self.thread is not None and threading.current_thread() is self.thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Schedules a coroutine on the loop from any thread.
+
+        Returns
+        -------
+        future: concurrent.futures.Future
+            Resolves to the result of the coroutine
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.start())
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        return future
+
+    def run(self, coro: Coroutine, timeout: float | None = None) -> Any:
+        """
+        Runs a coroutine on the loop and blocks the calling thread until it finishes.
+
+        Raises
+        ------
+        RuntimeError
+            If called from the loop thread
+        """
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("Cannot block the event loop thread on a coroutine it has to run")
+        return self.submit(coro).result(timeout=timeout)
+
+    async def run_blocking(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Runs a blocking function on the runtime's pool and waits for its result without blocking the loop.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+
+RUNTIME = AsyncRuntime()
+
+
+def open_output_pipe() -> tuple[Any, int]:
+    """
+    Creates a pipe for the output of a child process that the event loop can read.
+
+    The event loop on Windows can only read overlapped pipes, which `subprocess.PIPE` pipes are not, so the pipe is
+    created the way asyncio creates the pipes of its own subprocesses.
+
+    Returns
+    -------
+    read_end: Any
+        The end to pass to `read_lines`
+    write_fd: int
+        The file descriptor to pass to `subprocess.Popen` as `stdout`. Close it once the process is spawned.
+    """
+    if sys.platform == "win32":
+        read_handle, write_handle = windows_utils.pipe(overlapped=(True, False), duplex=False)
+        return windows_utils.PipeHandle(read_handle), msvcrt.open_osfhandle(write_handle, 0)
+
+    read_fd, write_fd = os.pipe()
+    return os.fdopen(read_fd, "rb", buffering=0), write_fd
+
+
+async def read_lines(read_end: Any) -> AsyncIterator[str]:
+    """
+    Yields the lines written to a pipe from `open_output_pipe` until its write end is closed.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=PIPE_LINE_LIMIT)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), read_end)
+    try:
+        while line := await reader.readline():
+            yield line.decode("utf-8", errors="replace").replace("\r\n", "\n")
+    finally:
+        transport.close()
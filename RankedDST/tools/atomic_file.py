@@ -0,0 +1,94 @@
+"""
+RankedDST/tools/atomic_file.py
+
+This module contains helpers to replace files atomically. The new contents are written to a temporary file in the same
+directory which is then moved over the destination, so readers only ever see the old or the new file.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Returns the hex-encoded SHA-256 digest of the data.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Returns the hex-encoded SHA-256 digest of the file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _temp_path(path: Path) -> Path:
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(fd)
+    return Path(tmp)
+
+
+def atomic_write_bytes(path: str | Path, data: bytes) -> None:
+    """
+    Atomically replaces the file at the path with the data. The parent directory must exist.
+    """
+    path = Path(path)
+    tmp = _temp_path(path)
+    try:
+        with open(tmp, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def atomic_write_text(path: str | Path, text: str, encoding: str = "utf-8") -> None:
+    """
+    Atomically replaces the file at the path with the text.
+    """
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+def atomic_write_json(path: str | Path, data, indent: int | None = 4) -> None:
+    """
+    Atomically replaces the file at the path with the data encoded as json.
+    """
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+def atomic_link_or_copy(src: str | Path, dst: str | Path) -> bool:
+    """
+    Atomically replaces dst with a hard link to src. Falls back to a copy when hard links are not supported,
+    such as across file systems.
+
+    Returns
+    -------
+    linked: bool
+        True if a hard link was made, false if the file was copied.
+    """
+    src, dst = Path(src), Path(dst)
+    tmp = _temp_path(dst)
+    tmp.unlink()
+    try:
+        try:
+            os.link(src, tmp)
+            linked = True
+        except OSError:
+            shutil.copy2(src, tmp)
+            linked = False
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return linked
@@ -1,6 +1,24 @@
 import os, json
 
-CONFIG_KEYS = ["proxy_secret_dev", "proxy_secret_local", "proxy_secret", "dedi_path", "cluster_path"]
+CONFIG_KEYS = ["proxy_secret_dev", "proxy_secret_local", "proxy_secret", "dedi_path", "cluster_path", "max_clusters",
+               "shard_memory_limit_mb", "shard_cpu_limit", "archive_backend",
+               "archive_max_count", "archive_max_mb", "archive_max_age_days",
+               "socket_serializer", "match_event_transport", "runtime", "resume_shards"]
+
+def get_data_dir() -> str:
+    """
+    Returns the directory the app keeps its own files in (`~/ranked_dst`). Creates it if not already present.
+
+    Returns
+    -------
+    data_dir: str
+        The full path to the app's data directory.
+    """
+    home = os.path.expanduser("~")
+    data_dir = os.path.join(home, "ranked_dst")
+    os.makedirs(data_dir, exist_ok=True)
+
+    return data_dir
 
 def get_config_path() -> str:
     """
@@ -13,13 +31,7 @@ def get_config_path() -> str:
         The full file path to the configuration json file.
     """
 
-    home = os.path.expanduser("~")
-    base_path = os.path.join(home, "ranked_dst")
-    config_fp = os.path.join(base_path, "config.json")
-
-    os.makedirs(base_path, exist_ok=True)
-
-    return config_fp
+    return os.path.join(get_data_dir(), "config.json")
 
 def save_data(save_values: dict[str, str]) -> None:
     """
@@ -1,8 +1,26 @@
+"""
+RankedDST/tools/job_object.py
+
+This module makes sure the processes started by the app (the dedicated server shards) die with it.
+
+- Windows: a Job Object with `JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE`
+- Linux: a dedicated cgroup v2 group (killed through `cgroup.kill` on exit) plus `PR_SET_PDEATHSIG`, which also
+  covers the app crashing. Falls back to PR_SET_PDEATHSIG alone when no cgroup can be created.
+- macOS: process groups + atexit cleanup
+
+Child processes should be started with `spawn_process`, which applies the platform's setup and assigns the process.
+Processes spawned with `outlive_app=True` (shards the app can adopt again after it crashed, see `shard_resume.py`) are
+only stopped when the app exits cleanly: they are kept out of the Windows job and get no PR_SET_PDEATHSIG, the two
+mechanisms that also fire when the app crashes.
+`get_job_usage` returns the aggregate CPU and memory use of the assigned processes and `set_job_limits` caps them.
+"""
 import sys
 import os
 import signal
 import subprocess
+import threading
 import atexit
+from queue import Queue
 
 _job = None
 _children: list[subprocess.Popen] = []
@@ -15,10 +33,17 @@ if sys.platform == "win32":
     import win32api
     import win32con
 
-    def create_kill_on_close_job():
+    def create_kill_on_close_job(memory_max: int | None = None, cpu_max: float | None = None):
         """
         Creates a Windows Job Object that kills all assigned
         processes if this parent process exits.
+
+        Parameters
+        ----------
+        memory_max: int | None (default None)
+            The most memory in bytes all assigned processes may commit together
+        cpu_max: float | None (default None)
+            Not supported on Windows. Ignored.
         """
         global _job
         if _job is not None:
@@ -41,8 +66,21 @@ if sys.platform == "win32":
         )
 
         _job = job
+        set_job_limits(memory_max=memory_max, cpu_max=cpu_max)
         return job
 
+    def set_job_limits(memory_max: int | None = None, cpu_max: float | None = None) -> None:
+        """
+        Limits the memory all processes in the job may commit together. CPU limits are not supported.
+        """
+        if _job is None or memory_max is None:
+            return
+
+        info = win32job.QueryInformationJobObject(_job, win32job.JobObjectExtendedLimitInformation)
+        info["BasicLimitInformation"]["LimitFlags"] |= win32job.JOB_OBJECT_LIMIT_JOB_MEMORY
+        info["JobMemoryLimit"] = int(memory_max)
+        win32job.SetInformationJobObject(_job, win32job.JobObjectExtendedLimitInformation, info)
+
     def assign_process(proc: subprocess.Popen) -> None:
         """
         Assigns subprocess to the Windows job object.
@@ -58,19 +96,284 @@ if sys.platform == "win32":
 
         win32job.AssignProcessToJobObject(_job, handle)
 
+    def spawn_process(cmd: list[str], outlive_app: bool = False, **popen_kwargs) -> subprocess.Popen:
+        """
+        Starts the process without a console window and assigns it to the job object. A process that should outlive
+        a crash of the app is registered for cleanup on exit instead, since the job kills it when the app crashes.
+        """
+        popen_kwargs.setdefault("creationflags", 0x08000000)  # CREATE_NO_WINDOW
+        proc = subprocess.Popen(cmd, **popen_kwargs)
+        if outlive_app:
+            _children.append(proc)
+        else:
+            assign_process(proc)
+        return proc
+
+    def get_job_usage() -> dict[str, float | int | None]:
+        """
+        Returns the aggregate usage of the processes in the job object.
+
+        Returns
+        -------
+        usage: dict[str, float | int | None]
+            `cpu_seconds` (user + kernel time), `memory_bytes` (peak committed memory) and `processes` (active count).
+        """
+        if _job is None:
+            return {"cpu_seconds": None, "memory_bytes": None, "processes": 0}
+
+        accounting = win32job.QueryInformationJobObject(_job, win32job.JobObjectBasicAccountingInformation)
+        limits = win32job.QueryInformationJobObject(_job, win32job.JobObjectExtendedLimitInformation)
+        return {
+            "cpu_seconds": (accounting["TotalUserTime"] + accounting["TotalKernelTime"]) / 10_000_000,
+            "memory_bytes": limits["PeakJobMemoryUsed"],
+            "processes": accounting["ActiveProcesses"],
+        }
+
+    def _cleanup():
+        """
+        Terminate the processes kept out of the job object on a clean exit.
+        """
+        for proc in _children:
+            try:
+                if proc.poll() is None:
+                    proc.terminate()
+            except Exception:
+                pass
+
+    atexit.register(_cleanup)
+
 
 # -------------------------------------------------------
-# UNIX IMPLEMENTATION (macOS + Linux)
+# LINUX IMPLEMENTATION
+# -------------------------------------------------------
+elif sys.platform.startswith("linux"):
+    import ctypes
+
+    CGROUP_ROOT = "/sys/fs/cgroup"
+    PR_SET_PDEATHSIG = 1
+
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _parent_pid = os.getpid()
+    _spawn_requests: Queue = Queue()
+    _spawner: threading.Thread | None = None
+    _spawner_lock = threading.Lock()
+
+    def _own_cgroup() -> str | None:
+        try:
+            with open("/proc/self/cgroup", "r") as file:
+                for line in file:
+                    if line.startswith("0::"):
+                        return line[3:].strip()
+        except OSError:
+            pass
+        return None
+
+    def _resident_memory(pid: int) -> int:
+        try:
+            with open(f"/proc/{pid}/statm", "r") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return 0
+
+    def create_kill_on_close_job(memory_max: int | None = None, cpu_max: float | None = None):
+        """
+        Creates a cgroup v2 group next to the app's own cgroup for the child processes. Every process in it is
+        killed when the app exits. Returns None if the cgroup cannot be created (no cgroup v2 or no delegation),
+        in which case children still die with the app through PR_SET_PDEATHSIG.
+
+        Parameters
+        ----------
+        memory_max: int | None (default None)
+            The most memory in bytes all assigned processes may use together
+        cpu_max: float | None (default None)
+            The most CPUs all assigned processes may use together, such as 1.5
+        """
+        global _job
+        if _job is not None:
+            return _job
+
+        own_cgroup = _own_cgroup()
+        if own_cgroup is None or not os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+            return None
+
+        # A sibling of our own group, since a group with processes in it cannot delegate controllers
+        parent = os.path.dirname(own_cgroup.rstrip("/")) or "/"
+        job_path = os.path.join(CGROUP_ROOT, parent.lstrip("/"), f"ranked-dst-{os.getpid()}")
+        try:
+            os.makedirs(job_path, exist_ok=True)
+        except OSError:
+            return None
+
+        _job = job_path
+        set_job_limits(memory_max=memory_max, cpu_max=cpu_max)
+        return job_path
+
+    def set_job_limits(memory_max: int | None = None, cpu_max: float | None = None) -> None:
+        """
+        Writes the limits to the cgroup. Limits whose controller is not delegated to the app are skipped.
+        """
+        if _job is None:
+            return
+
+        limits = {"memory.max": memory_max, "cpu.max": None}
+        if cpu_max is not None:
+            period = 100_000
+            limits["cpu.max"] = f"{int(cpu_max * period)} {period}"
+
+        for limit_file, value in limits.items():
+            if value is None:
+                continue
+            try:
+                with open(os.path.join(_job, limit_file), "w") as file:
+                    file.write(str(value))
+            except OSError:
+                pass
+
+    def _child_preexec() -> None:
+        """
+        Runs in the child between fork and exec. Creates a process group and asks the kernel to kill the child
+        when the thread that spawned it exits, which includes the app crashing.
+        """
+        os.setsid()
+        _libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0)
+        if os.getppid() != _parent_pid:
+            # The app died before prctl took effect
+            os._exit(1)
+
+    def assign_process(proc: subprocess.Popen) -> None:
+        """
+        Moves the subprocess into the app's cgroup, if one exists, and registers it for cleanup on exit.
+        """
+        if proc is None:
+            return
+
+        _children.append(proc)
+        if _job is None:
+            return
+
+        try:
+            with open(os.path.join(_job, "cgroup.procs"), "w") as file:
+                file.write(str(proc.pid))
+        except OSError:
+            pass
+
+    def _run_spawner() -> None:
+        while True:
+            cmd, preexec_fn, popen_kwargs, result = _spawn_requests.get()
+            try:
+                result.put(subprocess.Popen(cmd, preexec_fn=preexec_fn, **popen_kwargs))
+            except BaseException as e:
+                result.put(e)
+
+    def spawn_process(cmd: list[str], outlive_app: bool = False, **popen_kwargs) -> subprocess.Popen:
+        """
+        Starts the process in its own process group and assigns it to the cgroup.
+
+        PR_SET_PDEATHSIG fires when the *thread* that forked the child exits, not the process. Every child is
+        therefore forked from one spawner thread that lives as long as the app. A process that should outlive a
+        crash of the app gets no PR_SET_PDEATHSIG; the cgroup is only killed on a clean exit.
+        """
+        global _spawner
+        with _spawner_lock:
+            if _spawner is None:
+                _spawner = threading.Thread(target=_run_spawner, daemon=True)
+                _spawner.start()
+
+        result: Queue = Queue(maxsize=1)
+        preexec_fn = os.setsid if outlive_app else _child_preexec
+        _spawn_requests.put((cmd, preexec_fn, popen_kwargs, result))
+        proc = result.get()
+        if isinstance(proc, BaseException):
+            raise proc
+
+        assign_process(proc)
+        return proc
+
+    def get_job_usage() -> dict[str, float | int | None]:
+        """
+        Returns the aggregate usage of the assigned processes. Read from the cgroup if one exists, otherwise summed
+        from /proc for the registered children.
+
+        Returns
+        -------
+        usage: dict[str, float | int | None]
+            `cpu_seconds` (user + system time), `memory_bytes` (current memory use) and `processes` (running count).
+        """
+        if _job is not None:
+            usage: dict[str, float | int | None] = {"cpu_seconds": None, "memory_bytes": None, "processes": 0}
+            try:
+                with open(os.path.join(_job, "cpu.stat"), "r") as file:
+                    for line in file:
+                        key, value = line.split()
+                        if key == "usage_usec":
+                            usage["cpu_seconds"] = int(value) / 1_000_000
+                with open(os.path.join(_job, "cgroup.procs"), "r") as file:
+                    usage["processes"] = len(file.read().split())
+                with open(os.path.join(_job, "memory.current"), "r") as file:
+                    usage["memory_bytes"] = int(file.read())
+            except (OSError, ValueError):
+                pass
+            return usage
+
+        cpu_seconds, memory_bytes, processes = 0.0, 0, 0
+        ticks = os.sysconf("SC_CLK_TCK")
+        for proc in _children:
+            if proc.poll() is not None:
+                continue
+            try:
+                with open(f"/proc/{proc.pid}/stat", "r") as file:
+                    fields = file.read().rsplit(")", 1)[1].split()
+                cpu_seconds += (int(fields[11]) + int(fields[12])) / ticks
+            except (OSError, ValueError, IndexError):
+                continue
+            memory_bytes += _resident_memory(proc.pid)
+            processes += 1
+        return {"cpu_seconds": cpu_seconds, "memory_bytes": memory_bytes, "processes": processes}
+
+    def _cleanup():
+        """
+        Kill every process in the cgroup and remove it. Only runs on a clean exit.
+        """
+        for proc in _children:
+            try:
+                if proc.poll() is None:
+                    os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+            except Exception:
+                pass
+
+        if _job is None:
+            return
+        try:
+            with open(os.path.join(_job, "cgroup.kill"), "w") as file:
+                file.write("1")
+        except OSError:
+            pass
+        try:
+            os.rmdir(_job)
+        except OSError:
+            pass
+
+    atexit.register(_cleanup)
+
+
+# -------------------------------------------------------
+# MACOS IMPLEMENTATION
 # -------------------------------------------------------
 else:
 
-    def create_kill_on_close_job():
+    def create_kill_on_close_job(memory_max: int | None = None, cpu_max: float | None = None):
         """
-        No-op on Unix.
+        No-op on macOS. Limits are not supported.
         We use process groups + atexit cleanup instead.
         """
         return None
 
+    def set_job_limits(memory_max: int | None = None, cpu_max: float | None = None) -> None:
+        """
+        No-op on macOS.
+        """
+        return
+
     def assign_process(proc: subprocess.Popen) -> None:
         """
         Register subprocess for cleanup on exit.
@@ -81,6 +384,22 @@ else:
 
         _children.append(proc)
 
+    def spawn_process(cmd: list[str], outlive_app: bool = False, **popen_kwargs) -> subprocess.Popen:
+        """
+        Starts the process in its own process group and registers it for cleanup. The cleanup only runs on a clean
+        exit, so every process outlives a crash of the app and `outlive_app` changes nothing.
+        """
+        proc = subprocess.Popen(cmd, preexec_fn=os.setsid, **popen_kwargs)
+        assign_process(proc)
+        return proc
+
+    def get_job_usage() -> dict[str, float | int | None]:
+        """
+        Process accounting is not available on macOS without extra dependencies.
+        """
+        running = sum(1 for proc in _children if proc.poll() is None)
+        return {"cpu_seconds": None, "memory_bytes": None, "processes": running}
+
     def _cleanup():
         """
         Kill all registered child process groups on parent exit.
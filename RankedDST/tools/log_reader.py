@@ -0,0 +1,162 @@
+"""
+RankedDST/tools/log_reader.py
+
+This module reads the app's logs without loading whole files.
+
+- `tail` reads the active log backwards in blocks until it has the last N lines, only opening rotated files when the
+  active one is too short.
+- `read_range` uses the log index to skip every rotated file outside of the time range. Within the active log it binary
+  searches for the first record of the range, as records are written in time order.
+"""
+import gzip
+import os
+from pathlib import Path
+from typing import IO, Iterator
+
+from RankedDST.tools.logger import LOG_DIR
+from RankedDST.tools.log_rotation import ROTATED_RE, load_log_index, parse_record_time
+
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def _rotated_logs(name: str, log_dir: Path) -> list[tuple[Path, dict]]:
+    """
+    The compressed rotated files of a log with their index entries, oldest first.
+    """
+    index = load_log_index(log_dir)
+    files: list[tuple[Path, dict]] = []
+    for file_name, entry in index.items():
+        m = ROTATED_RE.match(file_name)
+        if m and m.group("name") == name and (log_dir / file_name).exists():
+            files.append((log_dir / file_name, entry))
+    return sorted(files, key=lambda item: item[1].get("start") or 0)
+
+
+def _tail_file(file: IO[bytes], n: int) -> list[bytes]:
+    """
+    The last n lines of a seekable binary file, read backwards in blocks.
+    """
+    end = file.seek(0, os.SEEK_END)
+    data = b""
+    position = end
+    while position > 0 and data.count(b"\n") <= n:
+        read_size = min(TAIL_BLOCK_SIZE, position)
+        position -= read_size
+        file.seek(position)
+        data = file.read(read_size) + data
+    return data.splitlines()[-n:] if n > 0 else []
+
+
+def tail(name: str = "app", n: int = 100, log_dir: str | Path = LOG_DIR) -> list[str]:
+    """
+    Returns the last n lines of a log.
+
+    Parameters
+    ----------
+    name: str (default 'app')
+        The logger name, such as 'app' or 'dedi-server'
+    n: int (default 100)
+        How many lines to return
+    log_dir: str | Path (default LOG_DIR)
+        The directory the logs are in
+    """
+    log_dir = Path(log_dir)
+    lines: list[bytes] = []
+
+    active_fp = log_dir / f"{name}.log"
+    if active_fp.exists():
+        with open(active_fp, "rb") as file:
+            lines = _tail_file(file, n)
+
+    # Newest rotated files first until there are enough lines
+    for rotated_fp, _ in reversed(_rotated_logs(name, log_dir)):
+        if len(lines) >= n:
+            break
+        try:
+            with gzip.open(rotated_fp, "rb") as file:
+                older = file.read().splitlines()
+        except OSError:
+            continue
+        lines = older[-(n - len(lines)):] + lines
+
+    return [line.decode("utf-8", errors="replace") for line in lines]
+
+
+def _seek_time(file: IO[bytes], start: float) -> int:
+    """
+    Binary searches for the offset of the first record at or after `start`.
+    """
+    lo, hi = 0, file.seek(0, os.SEEK_END)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        file.seek(mid)
+        if mid:
+            file.readline() # partial line
+
+        record_time = None
+        record_offset = file.tell()
+        while record_offset < hi:
+            line = file.readline()
+            if not line:
+                break
+            record_time = parse_record_time(line[:32].decode("utf-8", errors="replace"))
+            if record_time is not None:
+                break
+            record_offset = file.tell()
+
+        if record_time is None or record_time >= start:
+            hi = mid
+        else:
+            lo = record_offset + 1
+    file.seek(lo)
+    if lo:
+        file.readline()
+    return file.tell()
+
+
+def _read_records(file: IO[bytes], start: float, end: float) -> Iterator[str]:
+    in_range = False
+    for raw_line in file:
+        record_time = parse_record_time(raw_line[:32].decode("utf-8", errors="replace"))
+        if record_time is not None:
+            if record_time > end:
+                return
+            in_range = record_time >= start
+        # Lines without a timestamp (tracebacks) belong to the record before them
+        if in_range:
+            yield raw_line.decode("utf-8", errors="replace").rstrip("\n")
+
+
+def read_range(name: str = "app", start: float = 0.0, end: float | None = None, log_dir: str | Path = LOG_DIR) -> Iterator[str]:
+    """
+    Yields the lines of the records logged between `start` and `end`, oldest first.
+
+    Parameters
+    ----------
+    name: str (default 'app')
+        The logger name, such as 'app' or 'dedi-server'
+    start: float (default 0.0)
+        The unix timestamp of the start of the range
+    end: float | None (default None)
+        The unix timestamp of the end of the range. Defaults to now.
+    log_dir: str | Path (default LOG_DIR)
+        The directory the logs are in
+    """
+    log_dir = Path(log_dir)
+    end = end if end is not None else float("inf")
+
+    for rotated_fp, entry in _rotated_logs(name, log_dir):
+        file_start, file_end = entry.get("start"), entry.get("end")
+        if file_start is None or file_end is None or file_end < start or file_start > end:
+            continue
+        try:
+            with gzip.open(rotated_fp, "rb") as file:
+                yield from _read_records(file, start, end)
+        except OSError:
+            continue
+
+    active_fp = log_dir / f"{name}.log"
+    if active_fp.exists():
+        with open(active_fp, "rb") as file:
+            _seek_time(file, start)
+            yield from _read_records(file, start, end)
@@ -0,0 +1,254 @@
+"""
+RankedDST/tools/log_rotation.py
+
+This module contains the file handler used by the app's loggers.
+
+Each logger writes to `<log dir>/<name>.log`. The file is rotated when it would grow past `MAX_LOG_BYTES` or when the
+day changes, becoming `<name>-<YYYY-MM-DD-HHMMSS>.log`. A background thread then gzips the rotated file, records the
+time span it covers in `<log dir>/log_index.json` and deletes the oldest rotated files until every log fits in
+`LOG_DISK_BUDGET`. The index lets `log_reader` skip every file outside of a requested time range.
+
+Nothing here logs, as the handler would end up logging to itself.
+"""
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from queue import Queue
+
+from RankedDST.tools.atomic_file import atomic_write_json
+
+MAX_LOG_BYTES = 20 * 1024 * 1024
+LOG_DISK_BUDGET = 200 * 1024 * 1024
+LOG_INDEX_FILE_NAME = "log_index.json"
+
+# Every record starts with "[2026-01-31 12:34:56,789]"
+RECORD_TIME_RE = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3})\]")
+ROTATED_RE = re.compile(r"^(?P<name>.+)-(?P<stamp>\d{4}-\d{2}-\d{2}-\d{6}(?:-\d+)?)\.log(?P<gz>\.gz)?$")
+
+_index_lock = threading.Lock()
+_compress_queue: Queue = Queue()
+_compressor: threading.Thread | None = None
+_compressor_lock = threading.Lock()
+
+
+def parse_record_time(line: str) -> float | None:
+    """
+    Returns the timestamp of a log line, or None if the line does not start a record (such as traceback lines).
+    """
+    m = RECORD_TIME_RE.match(line)
+    if not m:
+        return None
+    try:
+        return datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%S").timestamp() + int(m.group(2)) / 1000
+    except ValueError:
+        return None
+
+
+# -------------------- LOG INDEX -------------------- #
+def load_log_index(log_dir: str | Path) -> dict[str, dict]:
+    """
+    Reads the index of the rotated log files.
+
+    Returns
+    -------
+    index: dict[str, dict]
+        `{file name: {"name", "start", "end", "size", "raw_size"}}`. `start` and `end` are the timestamps of the
+        first and last record in the file.
+    """
+    try:
+        with open(Path(log_dir) / LOG_INDEX_FILE_NAME, "r", encoding="utf-8") as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return index if isinstance(index, dict) else {}
+
+
+def _update_log_index(log_dir: Path, add: dict[str, dict] | None = None, remove: list[str] | None = None) -> None:
+    with _index_lock:
+        index = load_log_index(log_dir)
+        index.update(add or {})
+        for file_name in remove or []:
+            index.pop(file_name, None)
+        try:
+            atomic_write_json(log_dir / LOG_INDEX_FILE_NAME, index, indent=None)
+        except OSError as e:
+            print(f"Failed to save the log index: {e}", file=sys.stderr)
+
+
+# -------------------- COMPRESSION AND BUDGET -------------------- #
+def compress_rotated(rotated_fp: Path) -> Path:
+    """
+    Gzips a rotated log file and records the time span it covers in the log index.
+
+    Returns
+    -------
+    gz_fp: Path
+        The compressed file
+    """
+    m = ROTATED_RE.match(rotated_fp.name)
+    gz_fp = rotated_fp.with_name(rotated_fp.name + ".gz")
+    tmp_fp = gz_fp.with_name(gz_fp.name + ".tmp")
+
+    start = end = None
+    with open(rotated_fp, "rb") as src, gzip.open(tmp_fp, "wb") as dst:
+        for raw_line in src:
+            dst.write(raw_line)
+            record_time = parse_record_time(raw_line[:32].decode("utf-8", errors="replace"))
+            if record_time is not None:
+                start = record_time if start is None else start
+                end = record_time
+    os.replace(tmp_fp, gz_fp)
+
+    raw_size = rotated_fp.stat().st_size
+    rotated_fp.unlink()
+    _update_log_index(rotated_fp.parent, add={gz_fp.name: {
+        "name": m.group("name") if m else rotated_fp.stem,
+        "start": start,
+        "end": end,
+        "size": gz_fp.stat().st_size,
+        "raw_size": raw_size,
+    }})
+    return gz_fp
+
+
+def _rotated_files(log_dir: Path) -> list[Path]:
+    """
+    Rotated and legacy (`<YYYY-MM-DD>-<name>.log`) log files, oldest first. Active logs are never included.
+    """
+    files = [
+        p for p in log_dir.iterdir()
+        if p.is_file() and (ROTATED_RE.match(p.name) or re.match(r"^\d{4}-\d{2}-\d{2}-.+\.log$", p.name))
+    ]
+    return sorted(files, key=lambda p: p.stat().st_mtime)
+
+
+def enforce_disk_budget(log_dir: str | Path, budget: int = LOG_DISK_BUDGET) -> list[Path]:
+    """
+    Deletes the oldest rotated log files until all log files together take up at most `budget` bytes.
+
+    Returns
+    -------
+    deleted: list[Path]
+        The deleted files
+    """
+    log_dir = Path(log_dir)
+    total = sum(p.stat().st_size for p in log_dir.glob("*.log*") if p.is_file())
+
+    deleted: list[Path] = []
+    for p in _rotated_files(log_dir):
+        if total <= budget:
+            break
+        total -= p.stat().st_size
+        p.unlink(missing_ok=True)
+        deleted.append(p)
+
+    if deleted:
+        _update_log_index(log_dir, remove=[p.name for p in deleted])
+    return deleted
+
+
+def prune_logs(log_dir: str | Path, max_age_days: float | None = 7, budget: int = LOG_DISK_BUDGET) -> list[Path]:
+    """
+    Deletes rotated log files older than `max_age_days`, then enforces the disk budget.
+
+    Returns
+    -------
+    deleted: list[Path]
+        The deleted files
+    """
+    log_dir = Path(log_dir)
+    deleted: list[Path] = []
+    if max_age_days is not None:
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        for p in _rotated_files(log_dir):
+            if p.stat().st_mtime < cutoff:
+                p.unlink(missing_ok=True)
+                deleted.append(p)
+        if deleted:
+            _update_log_index(log_dir, remove=[p.name for p in deleted])
+
+    return deleted + enforce_disk_budget(log_dir, budget=budget)
+
+
+def _run_compressor() -> None:
+    while True:
+        rotated_fp, budget = _compress_queue.get()
+        try:
+            if rotated_fp.exists():
+                compress_rotated(rotated_fp)
+            # Files still waiting to be compressed would count at their uncompressed size
+            if _compress_queue.empty():
+                enforce_disk_budget(rotated_fp.parent, budget=budget)
+        except OSError as e:
+            print(f"Failed to compress '{rotated_fp}': {e}", file=sys.stderr)
+
+
+def _queue_compression(rotated_fp: Path, budget: int) -> None:
+    global _compressor
+    with _compressor_lock:
+        if _compressor is None:
+            _compressor = threading.Thread(target=_run_compressor, daemon=True)
+            _compressor.start()
+    _compress_queue.put((rotated_fp, budget))
+
+
+# -------------------- HANDLER -------------------- #
+class RotatingCompressedFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    Writes to `<log_dir>/<name>.log` and rotates by size and by day. Rotated files are compressed in the background.
+    """
+    def __init__(self, log_dir: str | Path, name: str, max_bytes: int = MAX_LOG_BYTES, budget: int = LOG_DISK_BUDGET):
+        self.log_dir = Path(log_dir)
+        self.log_name = name
+        self.max_bytes = max_bytes
+        self.budget = budget
+
+        log_fp = self.log_dir / f"{name}.log"
+        self.opened_on = datetime.fromtimestamp(log_fp.stat().st_mtime).date() if log_fp.exists() else datetime.now().date()
+        super().__init__(log_fp, mode="a", encoding="utf-8")
+
+        # Rotated files the app exited before compressing
+        for p in self.log_dir.glob(f"{name}-*.log"):
+            if ROTATED_RE.match(p.name):
+                _queue_compression(p, self.budget)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+
+        if datetime.fromtimestamp(record.created).date() != self.opened_on:
+            return self.stream.tell() > 0
+
+        # Checked before the record is written, so a file ends at most one record past the limit
+        return self.max_bytes > 0 and self.stream.tell() >= self.max_bytes
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        stamp = datetime.now().strftime("%Y-%m-%d-%H%M%S")
+        rotated_fp = self.log_dir / f"{self.log_name}-{stamp}.log"
+        suffix = 1
+        while rotated_fp.exists() or rotated_fp.with_name(rotated_fp.name + ".gz").exists():
+            # Rotated more than once within a second
+            rotated_fp = self.log_dir / f"{self.log_name}-{stamp}-{suffix}.log"
+            suffix += 1
+
+        try:
+            os.replace(self.baseFilename, rotated_fp)
+        except OSError as e:
+            print(f"Failed to rotate '{self.baseFilename}': {e}", file=sys.stderr)
+        else:
+            _queue_compression(rotated_fp, self.budget)
+
+        self.opened_on = datetime.now().date()
+        self.stream = self._open()
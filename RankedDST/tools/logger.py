@@ -7,9 +7,10 @@ This module contains the global logger object to be imported by the rest of the
 # RankedDST/tools/logger.py
 import logging
 import sys
-from datetime import datetime
 from pathlib import Path
 
+from RankedDST.tools.log_rotation import RotatingCompressedFileHandler
+
 sys.stdout.reconfigure(encoding="utf-8")
 sys.stderr.reconfigure(encoding="utf-8")
 
@@ -19,12 +20,11 @@ LOG_DIR.mkdir(parents=True, exist_ok=True)
 def initialize_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
 
-    log_file = LOG_DIR / f"{datetime.now().date()}-{name}.log"
-
     if not logger.handlers:
         logger.setLevel(logging.INFO)
 
-        fh = logging.FileHandler(log_file, encoding="utf-8")
+        # Rotated by size and by day, see log_rotation
+        fh = RotatingCompressedFileHandler(log_dir=LOG_DIR, name=name)
 
         fmt = logging.Formatter(
             "[%(asctime)s] [%(levelname)s]: %(message)s"
@@ -13,6 +13,26 @@ from tkinter import filedialog
 
 from RankedDST.tools.logger import logger
 
+def get_nullrender_path(dedi_path: str | Path) -> Path:
+    """
+    Returns the path to the nullrenderer binary that hosts DST worlds for the current platform.
+
+    Parameters
+    ----------
+    dedi_path: str | Path
+        The full path to the dedicated server tools folder
+    """
+    if sys.platform.startswith("win"):
+        return Path(dedi_path) / "bin64" / "dontstarve_dedicated_server_nullrenderer_x64.exe"
+
+    elif sys.platform.startswith("linux"):
+        return Path(dedi_path) / "bin64" / "dontstarve_dedicated_server_nullrenderer_x64"
+
+    elif sys.platform == "darwin":  # macOS
+        return Path(dedi_path) / "macOS" / "dontstarve_dedicated_server_nullrenderer"
+
+    raise RuntimeError(f"Unsupported platform: {sys.platform}")
+
 def required_files_exist(search_path: str | Path, mute_logs: bool = False, dedi_path: bool = True) -> bool:
     """
     The dedicated server path must contain the following files:
@@ -46,18 +66,7 @@ def required_files_exist(search_path: str | Path, mute_logs: bool = False, dedi_
     if dedi_path:
         mods_setup_fp = Path(search_path) / "mods" / "dedicated_server_mods_setup.lua"
 
-        
-        if sys.platform.startswith("win"):
-            nullrender_fp = Path(search_path) / "bin64" / "dontstarve_dedicated_server_nullrenderer_x64.exe"
-
-        elif sys.platform.startswith("linux"):
-            nullrender_fp = Path(search_path) / "bin64" / "dontstarve_dedicated_server_nullrenderer_x64"
-
-        elif sys.platform == "darwin":  # macOS
-            nullrender_fp = Path(search_path) / "macOS" / "dontstarve_dedicated_server_nullrenderer"
-
-        else:
-            raise RuntimeError(f"Unsupported platform: {sys.platform}")
+        nullrender_fp = get_nullrender_path(search_path)
         
         search_files = [mods_setup_fp, nullrender_fp]
 
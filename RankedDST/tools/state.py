@@ -12,6 +12,15 @@ from RankedDST.tools.logger import logger
 from RankedDST.tools.config import get_config_path, save_data
 from RankedDST.tools.path_checker import try_find_prerequisite_path, check_dst_versions
 
+from RankedDST.dedicated_server.server_manager import SERVER_MANAGER
+from RankedDST.tools.job_object import set_job_limits
+from RankedDST.dedicated_server.world_archive import set_archive_backend
+from RankedDST.dedicated_server.archive_index import DEFAULT_MAX_COUNT, set_retention_policy
+from RankedDST.networking.serializer import set_socket_serializer
+from RankedDST.networking.match_transport import set_match_event_transport
+from RankedDST.tools.async_runtime import set_runtime
+from RankedDST.dedicated_server.shard_resume import set_resume_shards
+
 from RankedDST.ui.updates import update_match_state, update_connection_state, update_user_data, show_popup
 
 # False - prod
@@ -319,6 +328,79 @@ def load_initial_state() -> None:
             file.write("{}")
             config_data: dict[str, str] = {}
     
+    max_clusters = config_data.pop('max_clusters', None)
+    if max_clusters is not None:
+        try:
+            SERVER_MANAGER.set_max_clusters(max_clusters)
+            logger.info(f"Hosting up to {max_clusters} cluster(s) at once")
+        except ValueError as e:
+            logger.warning(f"Ignoring the saved max_clusters: {e}")
+
+    memory_limit_mb = config_data.pop('shard_memory_limit_mb', None)
+    cpu_limit = config_data.pop('shard_cpu_limit', None)
+    if memory_limit_mb is not None or cpu_limit is not None:
+        try:
+            set_job_limits(
+                memory_max=int(memory_limit_mb) * 1024 * 1024 if memory_limit_mb is not None else None,
+                cpu_max=float(cpu_limit) if cpu_limit is not None else None,
+            )
+            logger.info(f"Limiting the shards to {memory_limit_mb} MB of memory and {cpu_limit} CPU(s)")
+        except (ValueError, TypeError, OSError) as e:
+            logger.warning(f"Ignoring the saved shard limits: {e}")
+
+    archive_backend = config_data.pop('archive_backend', None)
+    if archive_backend is not None:
+        try:
+            set_archive_backend(archive_backend)
+            logger.info(f"Archiving past matches with the '{archive_backend}' backend")
+        except ValueError as e:
+            logger.warning(f"Ignoring the saved archive_backend: {e}")
+
+    max_count = config_data.pop('archive_max_count', DEFAULT_MAX_COUNT)
+    max_mb = config_data.pop('archive_max_mb', None)
+    max_age_days = config_data.pop('archive_max_age_days', None)
+    try:
+        set_retention_policy(
+            max_count=int(max_count) if max_count is not None else None,
+            max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb is not None else None,
+            max_age=float(max_age_days) * 24 * 60 * 60 if max_age_days is not None else None,
+        )
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Ignoring the saved archive retention policy: {e}")
+
+    socket_serializer = config_data.pop('socket_serializer', None)
+    if socket_serializer is not None:
+        try:
+            set_socket_serializer(socket_serializer)
+            logger.info(f"Encoding socket packets with {socket_serializer}")
+        except ValueError as e:
+            logger.warning(f"Ignoring the saved socket_serializer: {e}")
+
+    match_event_transport = config_data.pop('match_event_transport', None)
+    if match_event_transport is not None:
+        try:
+            set_match_event_transport(match_event_transport)
+            logger.info(f"Sending match events over {match_event_transport}")
+        except ValueError as e:
+            logger.warning(f"Ignoring the saved match_event_transport: {e}")
+
+    runtime = config_data.pop('runtime', None)
+    if runtime is not None:
+        try:
+            set_runtime(runtime)
+            logger.info(f"Running the proxy, socket and shard output on the {runtime} runtime")
+        except ValueError as e:
+            logger.warning(f"Ignoring the saved runtime: {e}")
+
+    resume_shards = config_data.pop('resume_shards', None)
+    if resume_shards is not None:
+        try:
+            set_resume_shards(resume_shards)
+            if resume_shards:
+                logger.info("Shards outlive the app so they can be adopted again after a crash")
+        except ValueError as e:
+            logger.warning(f"Ignoring the saved resume_shards: {e}")
+
     dev_secret = config_data.pop('proxy_secret_dev', None)
     local_secret = config_data.pop('proxy_secret_local', None)
     if DEVELOPING:
@@ -3,12 +3,20 @@ RankedDST/ui/actions.py
 
 This module contains the UIActions class; an instance of which is passed into the window object.
 
-The methods of this class are called by the javascript functions under resources/ui_actions.js
+The methods of this class are called by the javascript functions under resources/ui_actions.js. The ones that wait on
+the backend, the disk or a file dialog start their work with `ui/tasks.py` and return a task id, which the javascript
+awaits with `runTask`.
 """
+import os
+import threading
 import webbrowser
 
 import requests
 from RankedDST.dedicated_server.world_launcher import stop_dedicated_server
+from RankedDST.dedicated_server.queue_prefetch import start_queue_prefetch
+from RankedDST.dedicated_server.world_snapshot import restore_snapshot
+from RankedDST.dedicated_server.server_manager import SERVER_MANAGER, SHARDS
+from RankedDST.dedicated_server.shard_output import read_output
 
 from RankedDST.tools.secret import hash_string
 from RankedDST.tools.logger import logger
@@ -16,6 +24,9 @@ import RankedDST.tools.state as state
 from RankedDST.tools.config import save_data
 from RankedDST.tools.path_checker import required_files_exist, open_file_explorer
 from RankedDST.ui.updates import show_popup
+from RankedDST.ui.tasks import UITaskRunner
+
+LOGIN_TIMEOUT = 10 # seconds
 
 class UIActions:
     """
@@ -26,15 +37,25 @@ class UIActions:
         self._window_getter = window_getter
         self._connect_socket = socket_connect_func
         self._disconnect_socket = socket_disconnect_func
+        self._tasks = UITaskRunner(window_getter=window_getter)
 
 
-    def login_clicked(self, username: str, password: str) -> None:
+    def login_clicked(self, username: str, password: str) -> str:
         """
         Triggered when the `login-button` is clicked on the UI.
+
+        Returns
+        -------
+        task_id: str
+            Resolves to whether the login succeeded, once the proxy secret is saved. The socket connects afterwards.
         """
         logger.debug("Login button clicked")
+        return self._tasks.start("login", self._login, username, password)
+
+    def _login(self, username: str, password: str) -> bool:
         hashed_password = hash_string(password)
 
+        self._tasks.progress("Logging in...")
         try:
             response = requests.post(
                 url=f"{state.route_url()}/login",
@@ -42,21 +63,22 @@ class UIActions:
                     "username" : username, 
                     "hashed_password" : hashed_password,
                     "proxy": True
-                }
+                },
+                timeout=LOGIN_TIMEOUT,
             )
+            data: dict = response.json()
         except Exception as e:
             show_popup(window=self._window_getter(), popup_msg=f"Error logging in: {e}", button_msg="Dang")
-            return
+            return False
 
-        data: dict = response.json()
-        if not data.get("success", False):
-            message = data.get("message", None)
+        if not isinstance(data, dict) or not data.get("success", False):
+            message = data.get("message", None) if isinstance(data, dict) else None
             if not message:
                 show_popup(window=self._window_getter(), popup_msg="Critical Error", button_msg="That's not good...")
-                return
+                return False
             
             show_popup(window=self._window_getter(), popup_msg=message, button_msg="Okay")
-            return
+            return False
         
 
         proxy_secret = data.get('auth_token')
@@ -64,17 +86,73 @@ class UIActions:
         secret_key = state.get_secret_key()
         save_data({secret_key: proxy_secret})
 
-        self._connect_socket()
+        # Connecting retries until the backend answers, so the login task settles without waiting for it. The
+        # connection state shows its progress instead.
+        threading.Thread(target=self._connect_socket, name="socket-connect", daemon=True).start()
+        return True
 
-    def stop_server_button(self) -> None:
-        stop_dedicated_server()
+    def stop_server_button(self) -> str:
+        return self._tasks.start("server", stop_dedicated_server)
+
+    def restore_snapshot(self, match_id: str, snapshot_name: str | None = None) -> str:
+        """
+        Restores the saves of a match from one of its in-match snapshots. Defaults to the newest snapshot.
+        The match's shards must be stopped; they load the restored saves the next time they are launched.
+
+        Returns
+        -------
+        task_id: str
+            Resolves to whether the snapshot was restored
+        """
+        return self._tasks.start("server", self._restore_snapshot, match_id, snapshot_name)
+
+    def _restore_snapshot(self, match_id: str, snapshot_name: str | None) -> bool:
+        if SERVER_MANAGER.is_running(match_id):
+            show_popup(window=self._window_getter(), popup_msg="Stop the server before restoring a snapshot")
+            return False
+
+        base_dir = state.get_user_data(get_key="cluster_path")
+        cluster_dir = os.path.join(base_dir or "", f"Ranked DST Match {match_id}")
+        if not base_dir or not os.path.isdir(cluster_dir):
+            show_popup(window=self._window_getter(), popup_msg=f"No world found for match {match_id}")
+            return False
+
+        self._tasks.progress("Restoring the snapshot...")
+        try:
+            snapshot_dir = restore_snapshot(cluster_dir=cluster_dir, snapshot_name=snapshot_name)
+        except (ValueError, OSError) as e:
+            logger.warning(f"Failed to restore a snapshot of match {match_id}: {e}")
+            show_popup(window=self._window_getter(), popup_msg=f"Failed to restore the snapshot: {e}")
+            return False
 
-    def logout_button(self) -> None:
+        show_popup(window=self._window_getter(), popup_msg=f"Restored the world from {snapshot_dir.name}", button_msg="Okay")
+        return True
+
+    def read_shard_output(self, shard: str, cursor: int | None = None, limit: int = 200, match_id: str | None = None) -> dict:
+        """
+        Returns the output lines of a shard since `cursor`, so the UI can tail the live server logs.
+        Pass the returned `cursor` to the next call; a new `match_id` means the UI should clear its view.
+
+        Answers directly instead of starting a task: it only copies lines out of memory.
+        """
+        if shard not in SHARDS:
+            raise ValueError(f"Invalid shard: {shard}")
+        return read_output(shard=shard, cursor=cursor, limit=limit, match_id=match_id)
+
+    def logout_button(self) -> str:
         """
         Triggered when the `logout-button` is clicked on the UI's header.
 
         Disconnects the websocket connection and changes state to not connected.
+
+        Returns
+        -------
+        task_id: str
+            Resolves once the server is stopped and the socket disconnected
         """
+        return self._tasks.start("logout", self._logout)
+
+    def _logout(self) -> None:
         window = self._window_getter()
         state.set_connection_state(new_state=state.ConnectionNotConnected, window=window)
         state.set_match_state(new_state=state.MatchNone, window=window)
@@ -83,10 +161,11 @@ class UIActions:
         secret_key = state.get_secret_key()
         save_data(save_values={secret_key: ""})
         
+        self._tasks.progress("Stopping the server...")
         stop_dedicated_server()
         self._disconnect_socket()
 
-    def open_website(self, page: str = "") -> None:
+    def open_website(self, page: str = "") -> str:
         """
         Opens the website for the given page.
 
@@ -95,30 +174,42 @@ class UIActions:
         assert page in ["", "stats", "leaderboard", "queue", "history", "profile", "setup?tab=no-dedi", "setup?tab=no-cluster", "setup?tab=need-update"], f"Invalid page: {page}"
         
         url = f"{state.site_url()}/{page}"
+
+        if page == "queue":
+            # The player is about to queue, so the mods of the coming match are fetched while they wait
+            start_queue_prefetch()
         
-        webbrowser.open(url, new=2)
+        # Starting the browser can take a while
+        return self._tasks.start("website", webbrowser.open, url, 2)
 
-    def open_file_explorer_ui(self, dedi_path: bool) -> None:
+    def open_file_explorer_ui(self, dedi_path: bool) -> str:
         """
         Opens the file explorer and checks if the provided path contains necessary files. If it does,
         then the path is saved, stored in memory, and connect_socket is run.
 
         If dedi_path is true, then the dedicated server tools are being searched for. Otherwise the
         cluster folder is searched for.
+
+        Returns
+        -------
+        task_id: str
+            Resolves to whether a correct path was provided
         """
+        return self._tasks.start("paths", self._open_file_explorer, dedi_path)
 
+    def _open_file_explorer(self, dedi_path: bool) -> bool:
         path = open_file_explorer()
 
         if not path:
             logger.info("No path provided")
             show_popup(window=self._window_getter(), popup_msg="No Path Provided")
-            return
+            return False
         
         files_exist = required_files_exist(search_path=path, dedi_path=dedi_path)
         if not files_exist:
             logger.info(f"Incorrect path. Files do not exist at '{path}'")
             show_popup(window=self._window_getter(), popup_msg="Incorrect Path")
-            return
+            return False
         
         write_key = 'dedi_path' if dedi_path else 'cluster_path'
         
@@ -129,18 +220,28 @@ class UIActions:
 
         # if dedi_path:
         #     self._connect_socket()
+        return True
+
+    def submit_path(self, path: str, dedi_path: bool) -> str:
+        """
+        Returns
+        -------
+        task_id: str
+            Resolves to whether the path was correct
+        """
+        return self._tasks.start("paths", self._submit_path, path, dedi_path)
 
-    def submit_path(self, path: str, dedi_path: bool) -> None:
+    def _submit_path(self, path: str, dedi_path: bool) -> bool:
         if not isinstance(path, str):
             logger.info("User did not provide a string")
             show_popup(window=self._window_getter(), popup_msg="Invalid Input")
-            return
+            return False
         
         files_exist = required_files_exist(search_path=path, dedi_path=dedi_path)
         if not files_exist:
             logger.info(f"Incorrect path. Files do not exist at '{path}'")
             show_popup(window=self._window_getter(), popup_msg="Incorrect Path")
-            return
+            return False
         
         logger.info("User provided the correct path!")
         write_key = 'dedi_path' if dedi_path else 'cluster_path'
@@ -150,3 +251,4 @@ class UIActions:
 
         # if dedi_path:
         #     self._connect_socket()
+        return True
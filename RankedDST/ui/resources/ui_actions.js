@@ -10,13 +10,67 @@ function sleep(ms) {
     return new Promise(resolve => setTimeout(resolve, ms));
 }
 
+/*
+    The python methods that wait on the backend or the disk return a task id right away and finish in the
+    background (see RankedDST/ui/tasks.py). runTask turns that id into a promise of the task's result.
+*/
+const runningTasks = {};  // task id -> the { resolve, reject, onProgress } of every caller waiting on it
+const finishedTasks = {}; // task id -> its result, kept for callers whose task id arrives after it
+const FINISHED_TASK_KEEP_MS = 60 * 1000;
+
+function settleTask(task, result, error) {
+    if (error !== null) {
+        task.reject(new Error(error));
+    } else {
+        task.resolve(result);
+    }
+}
+
+async function runTask(apiCall, onProgress = null) {
+    const taskId = await apiCall;
+    return new Promise((resolve, reject) => {
+        const task = { resolve, reject, onProgress };
+        if (taskId in finishedTasks) {
+            const { result, error } = finishedTasks[taskId];
+            settleTask(task, result, error);
+            return;
+        }
+        // A repeated click joins the running task and gets its id again
+        if (!(taskId in runningTasks)) {
+            runningTasks[taskId] = [];
+        }
+        runningTasks[taskId].push(task);
+    });
+}
+
+function taskProgress(taskId, message) {
+    for (const task of runningTasks[taskId] || []) {
+        if (task.onProgress) {
+            task.onProgress(message);
+        }
+    }
+}
+
+function taskFinished(taskId, result, error) {
+    // A repeated click can get the task id right before the task finishes
+    finishedTasks[taskId] = { result, error };
+    setTimeout(() => { delete finishedTasks[taskId]; }, FINISHED_TASK_KEEP_MS);
+
+    const tasks = runningTasks[taskId] || [];
+    delete runningTasks[taskId];
+    for (const task of tasks) {
+        settleTask(task, result, error);
+    }
+}
+
 var loginButtonLocked = false;
-async function lockLoginButton(lockDurationSeconds) {
+async function lockLoginButton(lockDurationSeconds, loginTask) {
     if (loginButtonLocked) {
         return
     };
 
     const btn = document.getElementById("login-button");
+    const buttonText = btn ? btn.textContent : "";
     if (btn) {
         btn.style.opacity = "0.5";
         btn.style.pointerEvents = "none";
@@ -24,11 +78,13 @@ async function lockLoginButton(lockDurationSeconds) {
 
     loginButtonLocked = true;
 
-    await sleep(lockDurationSeconds * 1000);
+    // Locked for at least the duration, and until the login finished
+    await Promise.allSettled([sleep(lockDurationSeconds * 1000), loginTask]);
     
     if (btn) {
         btn.style.opacity = "";
         btn.style.pointerEvents = "";
+        btn.textContent = buttonText;
     }
     loginButtonLocked = false;
 }
@@ -54,8 +110,13 @@ function handleLoginClicked() {
 
     if (!passwordValue) return;
     
-    lockLoginButton(5);
-    window.pywebview.api.login_clicked(usernameValue, passwordValue);
+    const btn = document.getElementById("login-button");
+    const loginTask = runTask(
+        window.pywebview.api.login_clicked(usernameValue, passwordValue),
+        message => { if (btn) btn.textContent = message; },
+    );
+    loginTask.catch(error => console.error("Login failed", error));
+    lockLoginButton(5, loginTask);
 }
 
 function onLogoutClicked() {
@@ -64,7 +125,7 @@ function onLogoutClicked() {
         return;
     }
 
-    window.pywebview.api.logout_button();
+    runTask(window.pywebview.api.logout_button()).catch(error => console.error("Logout failed", error));
 }
 
 function onStopServerClicked() {
@@ -73,7 +134,8 @@ function onStopServerClicked() {
         return
     }
     
-    window.pywebview.api.stop_server_button();
+    runTask(window.pywebview.api.stop_server_button())
+        .catch(error => console.error("Failed to stop the server", error));
 }
 
 
@@ -84,7 +146,7 @@ function onOpenWebsite(page) {
         return
     }
     
-    window.pywebview.api.open_website(page);
+    runTask(window.pywebview.api.open_website(page)).catch(error => console.error("Failed to open the website", error));
 }
 
 function onOpenFileExplorer(searchType){
@@ -99,7 +161,8 @@ function onOpenFileExplorer(searchType){
     }
     const dediPath = searchType === 'dedi_path';
     
-    window.pywebview.api.open_file_explorer_ui(dediPath);
+    runTask(window.pywebview.api.open_file_explorer_ui(dediPath))
+        .catch(error => console.error("Failed to open the file explorer", error));
 }
 
 const dediPathInput = document.getElementById("dedi-path-input");
@@ -130,8 +193,79 @@ function onSubmitPath(path, searchType){
     }
     const dediPath = searchType === 'dedi_path';
     
-    window.pywebview.api.submit_path(path, dediPath);
+    runTask(window.pywebview.api.submit_path(path, dediPath))
+        .catch(error => console.error("Failed to check the path", error));
+}
+const SHARD_LOG_POLL_MS = 1000;
+const SHARD_LOG_PAGE_LINES = 200;
+const SHARD_LOG_VIEW_LINES = 500;
+const shardLogs = {
+    Master: { cursor: null, matchId: null, lines: [], element: document.getElementById("shard-log-master") },
+    Caves: { cursor: null, matchId: null, lines: [], element: document.getElementById("shard-log-caves") },
+};
+let shardLogTimer = null;
+
+async function pollShardLog(shard) {
+    const log = shardLogs[shard];
+    while (true) {
+        const page = await window.pywebview.api.read_shard_output(shard, log.cursor, SHARD_LOG_PAGE_LINES);
+        if (page.match_id !== log.matchId) {
+            // A new match: start over from its latest lines
+            log.matchId = page.match_id;
+            log.lines = [];
+            if (log.cursor !== null) {
+                log.cursor = null;
+                continue;
+            }
+        }
+        if (page.missed > 0) {
+            log.lines.push(`... ${page.missed} lines skipped ...`);
+        }
+        log.lines.push(...page.lines);
+        log.cursor = page.cursor;
+        if (!page.more || shardLogTimer === null) {
+            break;
+        }
+    }
+
+    if (log.lines.length > SHARD_LOG_VIEW_LINES) {
+        log.lines.splice(0, log.lines.length - SHARD_LOG_VIEW_LINES);
+    }
+
+    const atBottom = log.element.scrollTop + log.element.clientHeight >= log.element.scrollHeight - 5;
+    log.element.textContent = log.lines.join("\n");
+    if (atBottom) {
+        log.element.scrollTop = log.element.scrollHeight;
+    }
+}
+
+async function pollShardLogs() {
+    try {
+        await Promise.all(Object.keys(shardLogs).map(pollShardLog));
+    } catch (error) {
+        console.error("Failed to read the server logs", error);
+    }
+    if (shardLogTimer !== null) {
+        shardLogTimer = setTimeout(pollShardLogs, SHARD_LOG_POLL_MS);
+    }
 }
+
+function onShardLogToggled(open) {
+    if (!window.pywebview) {
+        console.error("pywebview not ready");
+        return
+    }
+
+    // Only poll while the panel is open
+    if (open && shardLogTimer === null) {
+        shardLogTimer = 0;
+        pollShardLogs();
+    } else if (!open && shardLogTimer !== null) {
+        clearTimeout(shardLogTimer);
+        shardLogTimer = null;
+    }
+}
+
 // Expose this to the window
 window.handleLoginClicked = handleLoginClicked;
 window.onStopServerClicked = onStopServerClicked;
@@ -139,3 +273,6 @@ window.onLogoutClicked = onLogoutClicked;
 window.onOpenWebsite = onOpenWebsite;
 window.onOpenFileExplorer = onOpenFileExplorer;
 window.onSubmitPath = onSubmitPath;
+window.onShardLogToggled = onShardLogToggled;
+window.taskProgress = taskProgress;
+window.taskFinished = taskFinished;
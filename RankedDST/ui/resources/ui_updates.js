@@ -112,6 +112,20 @@ function setUserData(username) {
     usernameElement.textContent = `Logged in as ${username}`;
 }
 
+function setLinkStats(stats) {
+    const linkElement = document.getElementById("link-stats");
+    if (!linkElement || !stats || stats.p50 === null) {
+        return
+    }
+
+    let text = `Ping ${Math.round(stats.p50)} ms · jitter ${Math.round(stats.jitter)} ms`;
+    if (stats.loss > 0) {
+        text += ` · ${Math.round(stats.loss * 100)}% lost`;
+    }
+    linkElement.textContent = text;
+    linkElement.title = `p90 ${Math.round(stats.p90)} ms, p99 ${Math.round(stats.p99)} ms, ${stats.disconnects} disconnects`;
+}
+
 function showPopup(popupMsg, buttonMsg) {
     if (!popupMsg || !buttonMsg) {
         return
@@ -144,6 +158,7 @@ initializeState();
 // Expose this to the window
 window.connectionStateChanged = connectionStateChanged;
 window.setUserData = setUserData;
+window.setLinkStats = setLinkStats;
 window.matchStateChanged = matchStateChanged;
 window.hidePopup = hidePopup;
 window.showPopup = showPopup;
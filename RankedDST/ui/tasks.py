@@ -0,0 +1,100 @@
+"""
+RankedDST/ui/tasks.py
+
+This module runs the work of the UI's buttons off pywebview's JS bridge thread.
+
+pywebview only answers a call from the UI once the `UIActions` method returns, so a method that waits on the backend,
+the disk or a file dialog keeps the UI waiting with nothing to show, and every impatient click starts the work again.
+The methods instead start their work with `UITaskRunner.start` and return its task id right away. The work runs on
+`UI_EXECUTOR`, and when it is done its result or error is sent to the UI through `update_task_finished`, where
+`runTask` in resources/ui_actions.js resolves the promise of that task id. Work can report its progress in between.
+
+Tasks sharing a key run one at a time in the order they were started (a snapshot is never restored while the server
+is being stopped), and an action started again while it is still running joins the running task instead of queueing
+a second one.
+"""
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from RankedDST.tools.logger import logger
+from RankedDST.networking.handler_executor import KeyedExecutor
+from RankedDST.ui.updates import update_task_finished, update_task_progress
+
+MAX_UI_WORKERS = 4 # logging in can wait a long time on the socket and the path prompts
+MAX_PENDING_UI_TASKS = 16
+
+UI_EXECUTOR = KeyedExecutor(
+    max_workers=MAX_UI_WORKERS,
+    max_pending=MAX_PENDING_UI_TASKS,
+    thread_name_prefix="ui-action",
+    label="UI action",
+)
+
+
+class UITaskRunner:
+    """
+    Starts the work of UI actions on `UI_EXECUTOR` and reports its progress and result to the UI.
+    """
+    def __init__(self, window_getter: Callable):
+        self._window_getter = window_getter
+        self._lock = threading.Lock()
+        self._running: dict[str, str] = {} # action name -> task id
+        self._current = threading.local() # the task id of the work running on this thread
+
+    def start(self, key: str, action: Callable, *args) -> str:
+        """
+        Queues `action(*args)` behind the other tasks of the key.
+
+        Parameters
+        ----------
+        key: str
+            The serialization key. Tasks with the same key run one at a time.
+        action: Callable
+            The work to run. Its return value is sent to the UI and must be JSON serializable.
+
+        Returns
+        -------
+        task_id: str
+            The id the UI waits on. The id of the running task if the action is already running.
+        """
+        name = action.__name__
+        with self._lock:
+            if name in self._running:
+                logger.debug(f"UI action {name} is already running")
+                return self._running[name]
+            task_id = uuid.uuid4().hex
+            self._running[name] = task_id
+
+        def run() -> Any:
+            self._current.task_id = task_id
+            try:
+                return action(*args)
+            finally:
+                self._current.task_id = None
+
+        run.__name__ = name
+        future = UI_EXECUTOR.submit(key, run)
+        future.add_done_callback(lambda f: self._finish(name, task_id, f))
+        return task_id
+
+    def progress(self, message: str) -> None:
+        """
+        Reports the progress of the task running on the calling thread. Does nothing outside of a task.
+        """
+        task_id = getattr(self._current, "task_id", None)
+        if task_id is not None:
+            update_task_progress(task_id=task_id, message=message, window=self._window_getter())
+
+    def _finish(self, name: str, task_id: str, future: Future) -> None:
+        with self._lock:
+            self._running.pop(name, None)
+
+        error = future.exception()
+        update_task_finished(
+            task_id=task_id,
+            result=None if error is not None else future.result(),
+            error=None if error is None else str(error) or type(error).__name__,
+            window=self._window_getter(),
+        )
@@ -52,6 +52,21 @@ def update_user_data(username: str, window: webview.Window | None) -> None:
     if window and isinstance(window, webview.Window):
         window.evaluate_js(f"setUserData({json.dumps(username)})")
 
+def update_link_stats(stats: dict, window: webview.Window | None) -> None:
+    """
+    Evaluates the `setLinkStats` function for the UI.
+
+    Parameters
+    ----------
+    stats: dict
+        The connection quality summary from `LinkMonitor.stats`
+    window: webview.Window | None
+        The webview window object containing the javascript code to be invoked.
+    """
+
+    if window and isinstance(window, webview.Window):
+        window.evaluate_js(f"setLinkStats({json.dumps(stats)})")
+
 def show_popup(window: webview.Window | None, popup_msg: str, button_msg: str = "Okay") -> None:
     """
     Reveal a popup on the UI by running the `showPopup` javascript function.
@@ -70,3 +85,40 @@ def show_popup(window: webview.Window | None, popup_msg: str, button_msg: str =
     
     if window and isinstance(window, webview.Window):
         window.evaluate_js(f"showPopup({json.dumps(popup_msg)}, {json.dumps(button_msg)})")
+
+def update_task_progress(task_id: str, message: str, window: webview.Window | None) -> None:
+    """
+    Evaluates the `taskProgress` function for the UI.
+
+    Parameters
+    ----------
+    task_id: str
+        The id of the running UI task, as returned by the `UIActions` method that started it
+    message: str
+        What the task is doing
+    window: webview.Window | None
+        The webview window object containing the javascript code to be invoked.
+    """
+
+    if window and isinstance(window, webview.Window):
+        window.evaluate_js(f"taskProgress({json.dumps(task_id)}, {json.dumps(message)})")
+
+def update_task_finished(task_id: str, result, error: str | None, window: webview.Window | None) -> None:
+    """
+    Evaluates the `taskFinished` function for the UI, which settles the promise of the task.
+
+    Parameters
+    ----------
+    task_id: str
+        The id of the finished UI task
+    result: Any
+        The JSON serializable return value of the task. None if it failed.
+    error: str | None
+        Why the task failed. None if it succeeded.
+    window: webview.Window | None
+        The webview window object containing the javascript code to be invoked.
+    """
+
+    if window and isinstance(window, webview.Window):
+        result_js = json.dumps(result, default=str)
+        window.evaluate_js(f"taskFinished({json.dumps(task_id)}, {result_js}, {json.dumps(error)})")
@@ -0,0 +1,124 @@
+"""
+benchmarks/archive_backends.py
+
+Compares the disk use and archive time of the `zip` and `store` archive backends of
+RankedDST/dedicated_server/world_archive.py.
+
+By default it generates a run of consecutive synthetic matches that share their cluster, mod and worldgen files and
+change a fraction of their save chunks between matches. Pass `--cluster-path` to archive real
+`Ranked DST Match *` folders instead (they are only read).
+
+    python -m benchmarks.archive_backends
+    python -m benchmarks.archive_backends --matches 10 --changed 0.2
+    python -m benchmarks.archive_backends --cluster-path "~/Documents/Klei/DoNotStarveTogether"
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from RankedDST.dedicated_server.world_archive import (
+    STORE_DIR_NAME, archive_directory, extract_stored, list_stored,
+)
+
+
+def _directory_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _text_chunk(rng: random.Random, size: int) -> bytes:
+    # Lua save data compresses about as well as repeated key/value text
+    words = [b"prefab", b"x", b"z", b"health", b"data", b"ents", b"{", b"}", b"=", b","]
+    out = bytearray()
+    while len(out) < size:
+        out += rng.choice(words) + str(rng.randint(0, 9999)).encode() + b" "
+    return bytes(out[:size])
+
+
+def generate_matches(root: Path, matches: int, chunks: int, chunk_size: int, changed: float, seed: int) -> list[Path]:
+    """
+    Writes `matches` synthetic match folders. Each match rewrites `changed` of the previous match's save chunks.
+    """
+    rng = random.Random(seed)
+    shared = {
+        "cluster.ini": _text_chunk(rng, 2_000),
+        "Master/server.ini": _text_chunk(rng, 300),
+        "Caves/server.ini": _text_chunk(rng, 300),
+        "Master/worldgenoverride.lua": _text_chunk(rng, 4_000),
+        "Caves/worldgenoverride.lua": _text_chunk(rng, 4_000),
+        "Master/modoverrides.lua": _text_chunk(rng, 8_000),
+        "Caves/modoverrides.lua": _text_chunk(rng, 8_000),
+    }
+    saves = {
+        f"{shard}/save/session/{i:04d}": _text_chunk(rng, chunk_size)
+        for shard in ["Master", "Caves"] for i in range(chunks)
+    }
+
+    folders: list[Path] = []
+    for m in range(matches):
+        if m:
+            for key in rng.sample(sorted(saves), k=int(len(saves) * changed)):
+                saves[key] = _text_chunk(rng, chunk_size)
+
+        folder = root / f"Ranked DST Match {m + 1}"
+        for rel_path, data in {**shared, **saves}.items():
+            fp = folder / rel_path
+            fp.parent.mkdir(parents=True, exist_ok=True)
+            fp.write_bytes(data)
+        folders.append(folder)
+    return folders
+
+
+def run_backend(backend: str, folders: list[Path], past_dir: Path) -> tuple[float, int]:
+    past_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    for folder in folders:
+        archive_directory(folder, past_dir, backend)
+    return time.perf_counter() - start, _directory_size(past_dir)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--cluster-path", type=str, default=None)
+    parser.add_argument("--matches", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=60)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--changed", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="ranked_dst_archive_bench_"))
+    try:
+        if args.cluster_path:
+            folders = sorted(Path(os.path.expanduser(args.cluster_path)).glob("Ranked DST Match *"))
+            folders = [p for p in folders if p.is_dir()]
+        else:
+            folders = generate_matches(
+                work_dir / "clusters", args.matches, args.chunks, args.chunk_size, args.changed, args.seed
+            )
+        if not folders:
+            print("No match folders to archive")
+            return
+
+        raw_size = sum(_directory_size(p) for p in folders)
+        print(f"{len(folders)} match folder(s), {raw_size / 1e6:.1f} MB uncompressed\n")
+        print(f"{'backend':<8} {'time (s)':>9} {'disk (MB)':>10} {'ratio':>7}")
+
+        for backend in ["zip", "store"]:
+            elapsed, size = run_backend(backend, folders, work_dir / backend)
+            print(f"{backend:<8} {elapsed:>9.2f} {size / 1e6:>10.2f} {size / raw_size:>7.1%}")
+
+        store_dir = work_dir / "store" / STORE_DIR_NAME
+        start = time.perf_counter()
+        for name in list_stored(store_dir):
+            extract_stored(store_dir, name, work_dir / "extracted" / name)
+        print(f"\nExtracted every stored match in {time.perf_counter() - start:.2f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+benchmarks/runtime_threads.py
+
+Compares the `threads` and `asyncio` runtimes of RankedDST/tools/async_runtime.py: thread count, CPU time and context
+switches while busy, and wakeups per second while idle.
+
+Each runtime runs in its own worker process with the parts of the app the runtime changes: the proxy server, a
+socket.io client connected to the stand-in backend, fake shards whose output is read through pipes, and log followers
+on the shards' log files. The benchmark posts match events to the worker's proxy (forwarded over HTTP to the stand-in)
+while the worker pings the backend and reads the shard output. Then everything goes quiet: the shards stay alive
+without printing, like a world nobody is playing on, and the worker idles.
+
+Context switches are read with `resource.getrusage`, so they are only reported on Linux and macOS. The asyncio runtime
+needs the optional `aiohttp` package.
+
+    python -m benchmarks.runtime_threads
+    python -m benchmarks.runtime_threads --events 500 --shards 4 --idle 10
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+import requests
+import socketio
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+import RankedDST.tools.state as state
+from RankedDST.tools.async_runtime import RUNTIME, open_output_pipe, read_lines, set_runtime
+from RankedDST.tools.job_object import spawn_process
+from RankedDST.dedicated_server.shard_resume import follow_log, follow_log_async
+from RankedDST.networking.async_client import AsyncClientBridge
+from RankedDST.networking.match_transport import set_match_event_transport
+from RankedDST.networking.proxy import start_proxy
+
+STANDIN_PORT = 5000 # the port the app uses in local mode
+SAMPLE_INTERVAL = 0.05 # seconds between the worker's thread count samples and pings
+SHARD_SCRIPT = """
+import sys, time
+log = open(sys.argv[1], "a", encoding="utf-8")
+for i in range(int(sys.argv[2])):
+    line = f"[{i:05d}]: Sim tick {i}"
+    print(line, flush=True)
+    log.write(line + "\\n")
+    log.flush()
+    time.sleep(float(sys.argv[3]))
+time.sleep(3600) # a quiet, running world
+"""
+
+
+def _thread_count() -> int:
+    # Native threads, including the ones Python does not know about
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+def _usage() -> tuple[float, int | None]:
+    """
+    The CPU seconds and context switches of the process so far.
+    """
+    if resource is None:
+        return time.process_time(), None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return time.process_time(), usage.ru_nvcsw + usage.ru_nivcsw
+
+
+def run_worker(args) -> None:
+    """
+    Runs the workload in one runtime and prints its measurements as a JSON line.
+    """
+    set_runtime(args.worker)
+    set_match_event_transport("http")
+    state.set_user_data({"proxy_secret": "benchmark"})
+    work_dir = Path(args.work_dir)
+    counts = {"shard_lines": 0, "followed_lines": 0}
+    counts_lock = threading.Lock()
+
+    def count(key: str) -> None:
+        with counts_lock:
+            counts[key] += 1
+
+    def read_shard(lines) -> None:
+        for _ in lines:
+            count("shard_lines")
+
+    def follow(lines) -> None:
+        for _ in lines:
+            count("followed_lines")
+
+    async def read_shard_async(lines) -> None:
+        async for _ in lines:
+            count("shard_lines")
+
+    async def follow_async(lines) -> None:
+        async for _ in lines:
+            count("followed_lines")
+
+    start_proxy(host="127.0.0.1", port=args.proxy_port)
+
+    client_class = AsyncClientBridge if args.worker == "asyncio" else socketio.Client
+    client = client_class(reconnection=False)
+    accepted = threading.Event()
+    client.on("connection_accepted", lambda data: accepted.set(), namespace="/proxy")
+    client.connect(
+        f"http://127.0.0.1:{args.standin_port}",
+        namespaces=["/proxy"],
+        auth={"proxy_secret_hash": "benchmark"},
+        transports=["websocket"],
+    )
+    accepted.wait(timeout=5)
+
+    procs = []
+    for shard in range(args.shards):
+        log_fp = work_dir / f"shard_{args.worker}_{shard}.txt"
+        log_fp.touch()
+        cmd = [sys.executable, "-c", SHARD_SCRIPT, str(log_fp), str(args.lines), str(args.line_interval)]
+        popen_kwargs = {"stdin": subprocess.PIPE, "stderr": subprocess.STDOUT, "text": True, "bufsize": 1}
+        if args.worker == "asyncio":
+            read_end, write_fd = open_output_pipe()
+            proc = spawn_process(cmd, stdout=write_fd, **popen_kwargs)
+            os.close(write_fd)
+            RUNTIME.submit(read_shard_async(read_lines(read_end)))
+            RUNTIME.submit(follow_async(follow_log_async(log_fp, proc)))
+        else:
+            proc = spawn_process(cmd, stdout=subprocess.PIPE, **popen_kwargs)
+            threading.Thread(target=read_shard, args=(proc.stdout,), daemon=True).start()
+            threading.Thread(target=follow, args=(follow_log(log_fp, proc),), daemon=True).start()
+        procs.append(proc)
+
+    print(json.dumps({"ready": True}), flush=True)
+
+    # Busy: until the benchmark posted every event and every shard line was read
+    cpu_start, switches_start = _usage()
+    wall_start = time.perf_counter()
+    peak_threads = _thread_count()
+    pings = 0
+    expected_lines = args.shards * args.lines
+    while True:
+        peak_threads = max(peak_threads, _thread_count())
+        client.call("link_ping", {"sent_at": time.time()}, namespace="/proxy", timeout=5)
+        pings += 1
+        with counts_lock:
+            lines_done = counts["shard_lines"] >= expected_lines and counts["followed_lines"] >= expected_lines
+        if lines_done and (work_dir / f"done_{args.worker}").exists():
+            break
+        if time.perf_counter() - wall_start > args.timeout:
+            raise RuntimeError(f"The {args.worker} workload did not finish in {args.timeout}s: {counts}")
+        time.sleep(SAMPLE_INTERVAL)
+    cpu_end, switches_end = _usage()
+    busy_seconds = time.perf_counter() - wall_start
+
+    # Idle: the shards are alive but silent
+    idle_threads = _thread_count()
+    time.sleep(args.idle)
+    cpu_idle, switches_idle = _usage()
+
+    for proc in procs:
+        proc.kill()
+    print(json.dumps({
+        "runtime": args.worker,
+        "peak_threads": peak_threads,
+        "idle_threads": idle_threads,
+        "busy_seconds": busy_seconds,
+        "busy_cpu": cpu_end - cpu_start,
+        "busy_switches": None if switches_start is None else switches_end - switches_start,
+        "idle_cpu": cpu_idle - cpu_end,
+        "idle_wakeups": None if switches_idle is None else (switches_idle - switches_end) / args.idle,
+        "pings": pings,
+        **counts,
+    }), flush=True)
+    os._exit(0)
+
+
+def run_runtime(runtime: str, args, work_dir: Path) -> dict:
+    """
+    Runs a worker process for the runtime and posts the match events to its proxy.
+    """
+    proxy_port = args.proxy_port
+    worker = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.runtime_threads", "--worker", runtime,
+            "--work-dir", str(work_dir), "--proxy-port", str(proxy_port), "--standin-port", str(args.standin_port),
+            "--shards", str(args.shards), "--lines", str(args.lines), "--line-interval", str(args.line_interval),
+            "--idle", str(args.idle), "--timeout", str(args.timeout),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    results = []
+    for line in worker.stdout:
+        if not line.startswith("{"):
+            continue
+        result = json.loads(line)
+        if result.get("ready"):
+            with requests.Session() as session:
+                for day in range(args.events):
+                    session.post(
+                        f"http://127.0.0.1:{proxy_port}/match_event",
+                        json={"endpoint": "/day_reached", "day": day},
+                        timeout=10,
+                    )
+            (work_dir / f"done_{runtime}").touch()
+        else:
+            results.append(result)
+    if worker.wait() != 0 or not results:
+        raise RuntimeError(f"The {runtime} worker failed with exit code {worker.returncode}")
+    return results[-1]
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--events", type=int, default=200, help="Match events posted to the proxy")
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--lines", type=int, default=500, help="Output lines per shard")
+    parser.add_argument("--line-interval", type=float, default=0.002)
+    parser.add_argument("--idle", type=float, default=5.0, help="Seconds measured while idle")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--proxy-port", type=int, default=3135)
+    parser.add_argument("--standin-port", type=int, default=STANDIN_PORT)
+    # Internal: run one runtime's workload
+    parser.add_argument("--worker", type=str, default=None, choices=["threads", "asyncio"])
+    parser.add_argument("--work-dir", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    standin = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.standin_backend", "--port", str(args.standin_port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    work_dir = Path(tempfile.mkdtemp(prefix="ranked_dst_runtime_bench_"))
+    try:
+        time.sleep(1.5) # the stand-in starting up
+        results = [run_runtime(runtime, args, work_dir) for runtime in ["threads", "asyncio"]]
+    finally:
+        standin.kill()
+
+    print(f"{args.events} match events, {args.shards} shards x {args.lines} lines, {args.idle:.0f}s idle\n")
+    print(f"{'runtime':<8} {'threads':>8} {'idle thr':>9} {'busy (s)':>9} {'busy CPU':>9} {'switches':>9} "
+          f"{'idle CPU':>9} {'wakeups/s':>10}")
+    for r in results:
+        switches = "n/a" if r["busy_switches"] is None else str(r["busy_switches"])
+        wakeups = "n/a" if r["idle_wakeups"] is None else f"{r['idle_wakeups']:.1f}"
+        print(f"{r['runtime']:<8} {r['peak_threads']:>8} {r['idle_threads']:>9} {r['busy_seconds']:>9.2f} "
+              f"{r['busy_cpu']:>9.2f} {switches:>9} {r['idle_cpu']:>9.3f} {wakeups:>10}")
+
+
+if __name__ == "__main__":
+    main()
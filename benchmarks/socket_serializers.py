@@ -0,0 +1,154 @@
+"""
+benchmarks/socket_serializers.py
+
+Compares the JSON and MessagePack packet serializers of the `/proxy` socket: bytes on the wire and encode/decode CPU
+time per packet, for the payloads the app sends and receives.
+
+By default the world configuration files are synthetic, sized like a ranked match with a modded cluster. Pass
+`--world-files` to use a real `generate_world` payload instead. MessagePack needs the optional `msgpack` package.
+
+    python -m benchmarks.socket_serializers
+    python -m benchmarks.socket_serializers --world-files world_files.json --rounds 2000
+"""
+import json
+import random
+import time
+from argparse import ArgumentParser
+
+from socketio.packet import EVENT, Packet
+from socketio.msgpack_packet import MsgPackPacket
+
+from RankedDST.networking.config_transfer import WORLD_CONFIG_KEYS, config_hash, encode_configs
+
+NAMESPACE = "/proxy"
+SERIALIZERS = {"json": Packet, "msgpack": MsgPackPacket}
+
+
+def generate_world_files(seed: int) -> dict:
+    """
+    A synthetic `generate_world` payload: Lua tables of overrides and mod options plus the ini files.
+    """
+    rng = random.Random(seed)
+    values = ["default", "never", "rare", "often", "always", "true", "false"]
+
+    def overrides(count: int) -> str:
+        keys = ["season", "res", "mob"] * count
+        entries = ", ".join(f"{key}_{i}='{rng.choice(values)}'" for i, key in enumerate(keys))
+        return f"return {{ override_enabled = true, preset = 'SURVIVAL_TOGETHER', overrides = {{ {entries} }} }}"
+
+    mods = []
+    for _ in range(25):
+        options = ", ".join(f"opt_{i}={rng.choice(['true', 'false', str(rng.randint(0, 100))])}" for i in range(40))
+        workshop_id = rng.randint(10**8, 10**10)
+        mods.append(f'["workshop-{workshop_id}"] = {{ enabled = true, configuration_options = {{ {options} }} }}')
+
+    return {
+        "MatchId": 12,
+        "ModIds": [str(rng.randint(10**8, 10**10)) for _ in range(25)],
+        "ClusterIni": "[GAMEPLAY]\ngame_mode = survival\nmax_players = 6\npvp = false\n\n"
+                      "[NETWORK]\ncluster_name = Ranked DST\ncluster_password = secret\n\n"
+                      "[MISC]\nconsole_enabled = true\n\n[SHARD]\nshard_enabled = true\nbind_ip = 127.0.0.1\n",
+        "MasterServerIni": "[NETWORK]\nserver_port = 10999\n\n[SHARD]\nis_master = true\n",
+        "CavesServerIni": "[NETWORK]\nserver_port = 10998\n\n[SHARD]\nis_master = false\nname = Caves\n",
+        "MasterWorldGenOverride": overrides(40),
+        "CavesWorldGenOverride": overrides(25),
+        "ModOverrides": "return {\n" + ",\n".join(mods) + "\n}",
+    }
+
+
+def typical_payloads(world_files: dict) -> dict[str, tuple[str, dict]]:
+    """
+    The payloads benchmarked, as (event, data) pairs.
+    """
+    hashes = {
+        key: [config_hash(world_files[key])] for key in WORLD_CONFIG_KEYS if isinstance(world_files.get(key), str)
+    }
+    auth = {
+        "proxy_secret_hash": config_hash("proxy secret"),
+        "version": "1.4.0",
+        "resume": {"match_id": 12, "match_state": "running", "world_running": False},
+        "config_hashes": hashes,
+        "config_encodings": ["zlib"],
+    }
+    accepted = {
+        "user_id": "64b7f0c2a9e1", "username": "Wilson", "match_id": 12, "match_status": None, "version_ok": True,
+    }
+    link_stats = {"samples": 240, "p50": 38.2, "p90": 61.0, "p99": 140.7, "max": 212.3, "jitter": 4.1, "loss": 0.004,
+                  "disconnects": 1}
+    return {
+        "connect auth": ("connect", auth),
+        "world files (plain)": ("generate_world", world_files),
+        "world files (zlib)": ("generate_world", encode_configs(world_files, None, ["zlib"])),
+        "world files (cached)": ("generate_world", encode_configs(world_files, hashes, ["zlib"])),
+        "connection_accepted": ("connection_accepted", accepted),
+        "link_ping": ("link_ping", {"sent_at": time.time()}),
+        "world_generated": ("world_generated", {"proxy_secret_hash": auth["proxy_secret_hash"], "match_id": 12,
+                                                "event_id": "5f0c7d1e-2b9a-4e1f-8c3d-7a6b5e4d3c2b"}),
+        "match event": ("match_event", {"event": "day_reached", "day": 21, "match_id": 12, "link_stats": link_stats}),
+    }
+
+
+def _wire_size(encoded) -> int:
+    # JSON packets encode to text, MessagePack packets to bytes
+    return len(encoded.encode("utf-8")) if isinstance(encoded, str) else len(encoded)
+
+
+def measure(packet_class: type[Packet], event: str, data: dict, rounds: int) -> tuple[int, float, float]:
+    """
+    Returns
+    -------
+    size: int
+        The encoded packet's bytes on the wire
+    encode_us: float
+        Microseconds per encode
+    decode_us: float
+        Microseconds per decode
+    """
+    encoded = packet_class(EVENT, data=[event, data], namespace=NAMESPACE).encode()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        packet_class(EVENT, data=[event, data], namespace=NAMESPACE).encode()
+    encode_us = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        packet_class(encoded_packet=encoded)
+    decode_us = (time.perf_counter() - start) / rounds * 1e6
+
+    decoded = packet_class(encoded_packet=encoded)
+    if decoded.data != [event, data]:
+        raise RuntimeError(f"{packet_class.__name__} did not round trip the {event} payload")
+    return _wire_size(encoded), encode_us, decode_us
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--world-files", type=str, default=None, help="A JSON file with a generate_world payload")
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.world_files:
+        with open(args.world_files, "r", encoding="utf-8") as file:
+            world_files = json.load(file)
+    else:
+        world_files = generate_world_files(args.seed)
+
+    print(f"{'payload':<22} {'serializer':<10} {'bytes':>8} {'encode (us)':>12} {'decode (us)':>12}")
+    totals = {name: [0, 0.0, 0.0] for name in SERIALIZERS}
+    for label, (event, data) in typical_payloads(world_files).items():
+        for name, packet_class in SERIALIZERS.items():
+            size, encode_us, decode_us = measure(packet_class, event, data, args.rounds)
+            totals[name] = [totals[name][0] + size, totals[name][1] + encode_us, totals[name][2] + decode_us]
+            print(f"{label:<22} {name:<10} {size:>8} {encode_us:>12.1f} {decode_us:>12.1f}")
+
+    print()
+    json_size = totals["json"][0]
+    for name, (size, encode_us, decode_us) in totals.items():
+        print(f"{'all payloads':<22} {name:<10} {size:>8} {encode_us:>12.1f} {decode_us:>12.1f}  "
+              f"{size / json_size:.1%} of the JSON bytes")
+
+
+if __name__ == "__main__":
+    main()
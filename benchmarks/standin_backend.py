@@ -0,0 +1,207 @@
+"""
+benchmarks/standin_backend.py
+
+A local stand-in for the backend's `/proxy` socket.io namespace, to run the app and the socket benchmarks against
+without the real backend.
+
+It implements the combined connect handshake: the auth payload (proxy secret hash, app version and resume intent) is
+answered with a single `connection_accepted` that includes the world files when the app has no world running for the
+match. World files are encoded against the config hashes the app advertised, so files it has cached are only
+referenced. It also acknowledges `link_ping`, `match_event` and the outbox's lifecycle events, answers match events
+posted over HTTP, and prints everything it receives. With `--complete-after`, it ends the match that many seconds after
+the app reports its world as generated by sending `run_complete` and `match_complete`, with or without the match id.
+
+Run it on the port the app uses in local mode, then start the app without `--dev` or `--prod`:
+
+    python -m benchmarks.standin_backend
+    python -m benchmarks.standin_backend --match-id 12 --world-files world_files.json
+    python -m benchmarks.standin_backend --ack-delay 2 --drop-acks 0.3
+    python -m benchmarks.standin_backend --serializer msgpack
+    python -m benchmarks.standin_backend --match-id 12 --world-files world_files.json --complete-after 30
+"""
+import json
+import random
+import time
+from argparse import ArgumentParser
+
+import socketio
+from werkzeug.serving import run_simple
+
+from RankedDST.networking.config_transfer import WORLD_CONFIG_KEYS, config_hash, encode_configs
+
+NAMESPACE = "/proxy"
+
+
+def create_standin(
+    match_id: int | None = None,
+    world_files: dict | None = None,
+    deny: bool = False,
+    ack_delay: float = 0.0,
+    drop_acks: float = 0.0,
+    serializer: str = "json",
+    complete_after: float | None = None,
+    omit_match_id: bool = False,
+) -> socketio.Server:
+    """
+    Creates the stand-in socket.io server.
+
+    Parameters
+    ----------
+    match_id: int | None (default None)
+        The match the user is in
+    world_files: dict | None (default None)
+        The `generate_world` payload of the match
+    deny: bool (default False)
+        Rejects every proxy secret
+    ack_delay: float (default 0.0)
+        Seconds to wait before acknowledging an event
+    drop_acks: float (default 0.0)
+        The fraction of lifecycle events and pings left unacknowledged
+    serializer: str (default "json")
+        The packet serializer, `json` or `msgpack`. A client using the other one cannot connect.
+    complete_after: float | None (default None)
+        Seconds after `world_generated` to send `run_complete` and `match_complete`. Never sent if None.
+    omit_match_id: bool (default False)
+        Leaves the match id out of `run_complete` and `match_complete`
+    """
+    sio = socketio.Server(
+        async_mode="threading", cors_allowed_origins="*", serializer="default" if serializer == "json" else serializer
+    )
+    received: dict[str, int] = {}
+    client_configs: dict[str, dict] = {} # sid -> the config hashes and encodings the app advertised
+
+    def world_files_for(sid: str) -> dict:
+        advertised = client_configs.get(sid, {})
+        known = advertised.get("config_hashes") or {}
+        payload = encode_configs({**world_files, "MatchId": match_id}, known, advertised.get("config_encodings"))
+        # The app caches what it receives
+        for key in WORLD_CONFIG_KEYS:
+            if isinstance(world_files.get(key), str):
+                known.setdefault(key, []).insert(0, config_hash(world_files[key]))
+        client_configs[sid] = {**advertised, "config_hashes": known}
+        print(f"    sent {len(json.dumps(payload))} bytes of world files", flush=True)
+        return payload
+
+    def log(sid: str, event: str, data) -> None:
+        received[event] = received.get(event, 0) + 1
+        print(f"[{time.strftime('%H:%M:%S')}] {sid[:6]} {event}: {json.dumps(data, default=str)[:200]}", flush=True)
+
+    def acknowledge(event: str):
+        def handler(sid, data=None):
+            log(sid, event, data)
+            if random.random() < drop_acks:
+                time.sleep(60) # the client times out first
+                return None
+            time.sleep(ack_delay)
+            return {"ok": True, "received_at": time.time()}
+        return handler
+
+    @sio.on("connect", namespace=NAMESPACE)
+    def connect(sid, environ, auth):
+        log(sid, "connect", auth)
+        auth = auth if isinstance(auth, dict) else {}
+        if deny or not auth.get("proxy_secret_hash"):
+            sio.emit("connection_denied", {}, to=sid, namespace=NAMESPACE)
+            return
+
+        resume = auth.get("resume") or {}
+        client_configs[sid] = {k: auth.get(k) for k in ["config_hashes", "config_encodings"]}
+        reply = {
+            "user_id": "standin-user",
+            "username": "Stand-in",
+            "match_id": match_id,
+            "match_status": None,
+            "version_ok": "version" in auth,
+        }
+        if match_id is not None and world_files is not None and not resume.get("world_running"):
+            reply["world_files"] = world_files_for(sid)
+        sio.emit("connection_accepted", reply, to=sid, namespace=NAMESPACE)
+
+    @sio.on("disconnect", namespace=NAMESPACE)
+    def disconnect(sid, reason=None):
+        log(sid, "disconnect", reason)
+
+    @sio.on("request_world_files", namespace=NAMESPACE)
+    def request_world_files(sid, data):
+        log(sid, "request_world_files", data)
+        data = data if isinstance(data, dict) else {}
+        # Without advertised hashes the app wants the full files
+        client_configs[sid] = {k: data.get(k) for k in ["config_hashes", "config_encodings"]}
+        if world_files is not None:
+            sio.emit("generate_world", world_files_for(sid), to=sid, namespace=NAMESPACE)
+
+    @sio.on("app_version", namespace=NAMESPACE)
+    def app_version(sid, data):
+        log(sid, "app_version", data)
+
+    for event in ["link_ping", "match_event", "generating_world", "world_left"]:
+        sio.on(event, acknowledge(event), namespace=NAMESPACE)
+
+    def complete_match(sid: str) -> None:
+        sio.sleep(complete_after)
+        payload = {} if omit_match_id else {"match_id": match_id}
+        for event in ["run_complete", "match_complete"]:
+            print(f"[{time.strftime('%H:%M:%S')}] {sid[:6]} sending {event}: {json.dumps(payload)}", flush=True)
+            sio.emit(event, payload, to=sid, namespace=NAMESPACE)
+
+    acknowledge_world_generated = acknowledge("world_generated")
+
+    @sio.on("world_generated", namespace=NAMESPACE)
+    def world_generated(sid, data=None):
+        if complete_after is not None:
+            sio.start_background_task(complete_match, sid)
+        return acknowledge_world_generated(sid, data)
+
+    sio.received = received
+    return sio
+
+
+def standin_api(environ, start_response) -> list[bytes]:
+    """
+    A WSGI app answering the match events the proxy posts over HTTP.
+    """
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    body = environ["wsgi.input"].read(length)
+    request_line = f"{environ['REQUEST_METHOD']} {environ['PATH_INFO']}"
+    print(f"[{time.strftime('%H:%M:%S')}] HTTP {request_line}: {body[:200]!r}", flush=True)
+
+    if environ["REQUEST_METHOD"] != "POST":
+        start_response("405 Method Not Allowed", [("Content-Type", "application/json")])
+        return [b'{"error": "method not allowed"}']
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps({"ok": True, "received_at": time.time()}).encode("utf-8")]
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--match-id", type=int, default=None)
+    parser.add_argument("--world-files", type=str, default=None, help="A JSON file with a generate_world payload")
+    parser.add_argument("--deny", action="store_true")
+    parser.add_argument("--ack-delay", type=float, default=0.0)
+    parser.add_argument("--drop-acks", type=float, default=0.0)
+    parser.add_argument("--serializer", type=str, default="json", choices=["json", "msgpack"])
+    parser.add_argument("--complete-after", type=float, default=None)
+    parser.add_argument("--omit-match-id", action="store_true")
+    args = parser.parse_args()
+
+    world_files = None
+    if args.world_files:
+        with open(args.world_files, "r", encoding="utf-8") as file:
+            world_files = json.load(file)
+
+    sio = create_standin(
+        match_id=args.match_id, world_files=world_files, deny=args.deny,
+        ack_delay=args.ack_delay, drop_acks=args.drop_acks, serializer=args.serializer,
+        complete_after=args.complete_after, omit_match_id=args.omit_match_id,
+    )
+    print(f"Stand-in backend listening on http://{args.host}:{args.port}{NAMESPACE}")
+    run_simple(args.host, args.port, socketio.WSGIApp(sio, standin_api), threaded=True)
+
+
+if __name__ == "__main__":
+    main()
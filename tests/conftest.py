@@ -0,0 +1,12 @@
+"""
+tests/conftest.py
+
+Several RankedDST modules create their files in `~/ranked_dst` as they are imported, so the home directory is pointed
+at a temporary folder before any of them is.
+"""
+import os
+import tempfile
+
+_home = tempfile.mkdtemp(prefix="ranked_dst_tests_")
+os.environ["HOME"] = _home
+os.environ["USERPROFILE"] = _home
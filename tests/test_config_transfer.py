@@ -0,0 +1,97 @@
+"""
+tests/test_config_transfer.py
+
+Round-trips world configuration files through `encode_configs` and `decode_configs`: full text, cache references and
+zlib-compressed files, along with the cache misses and corrupt files that make the app ask for the full files again.
+"""
+import pytest
+
+from RankedDST.networking.config_transfer import (
+    COMPRESS_MIN_BYTES, ENCODINGS, HASHES_PER_KEY, WORLD_CONFIG_KEYS,
+    ConfigCache, ConfigCacheMiss, config_hash, decode_configs, encode_configs,
+)
+
+CONFIGS = {key: f"[{key}]\n" + "option = true\n" * 200 for key in WORLD_CONFIG_KEYS}
+CONFIGS["ModOverrides"] = "return {}\n"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ConfigCache(tmp_path / "config_cache")
+
+
+def payload(**overrides) -> dict:
+    return {**CONFIGS, "MatchId": 3, **overrides}
+
+
+def test_full_text_is_sent_without_advertised_encodings(cache):
+    encoded = encode_configs(payload(), known_hashes=None, encodings=None)
+    assert encoded == payload()
+    assert decode_configs(encoded, cache=cache) == payload()
+
+
+def test_large_files_are_compressed(cache):
+    encoded = encode_configs(payload(), known_hashes=None, encodings=ENCODINGS)
+
+    assert all("zlib" in encoded[key] for key in WORLD_CONFIG_KEYS if len(CONFIGS[key]) >= COMPRESS_MIN_BYTES)
+    assert encoded["ModOverrides"] == CONFIGS["ModOverrides"]
+    assert encoded["MatchId"] == 3
+    assert decode_configs(encoded, cache=cache) == payload()
+
+
+def test_only_changed_files_are_sent_after_the_first_match(cache):
+    decode_configs(encode_configs(payload(), None, ENCODINGS), cache=cache)
+
+    changed = CONFIGS["MasterWorldGenOverride"] + "season = winter\n"
+    encoded = encode_configs(payload(MasterWorldGenOverride=changed), cache.advertise(), ENCODINGS)
+
+    delta = [key for key in WORLD_CONFIG_KEYS if "ref" not in encoded[key]]
+    assert delta == ["MasterWorldGenOverride"]
+    assert decode_configs(encoded, cache=cache) == payload(MasterWorldGenOverride=changed)
+    previous = config_hash(CONFIGS["MasterWorldGenOverride"])
+    assert cache.advertise()["MasterWorldGenOverride"][:2] == [config_hash(changed), previous]
+
+
+def test_reference_missing_from_the_cache_is_a_miss(cache):
+    encoded = encode_configs(payload(), {"ClusterIni": [config_hash(CONFIGS["ClusterIni"])]}, ENCODINGS)
+    with pytest.raises(ConfigCacheMiss):
+        decode_configs(encoded, cache=cache)
+
+
+def test_corrupt_cached_file_is_a_miss(cache):
+    digest = cache.put("ClusterIni", CONFIGS["ClusterIni"])
+    (cache.cache_dir / digest).write_text("tampered", encoding="utf-8")
+
+    with pytest.raises(ConfigCacheMiss):
+        decode_configs({"ClusterIni": {"ref": digest}}, cache=cache)
+
+
+@pytest.mark.parametrize("value", [
+    {"zlib": "bm90IHpsaWI=", "sha256": "0" * 64},
+    {"gzip": "..."},
+    ["not", "a", "file"],
+])
+def test_unreadable_files_are_rejected(cache, value):
+    with pytest.raises(ValueError):
+        decode_configs({"ClusterIni": value}, cache=cache)
+
+
+def test_compressed_file_must_match_its_hash(cache):
+    encoded = encode_configs({"ClusterIni": CONFIGS["ClusterIni"]}, None, ENCODINGS)
+    encoded["ClusterIni"]["sha256"] = config_hash("something else")
+    with pytest.raises(ValueError, match="hash"):
+        decode_configs(encoded, cache=cache)
+
+
+def test_cache_keeps_the_latest_versions_of_each_key(cache):
+    versions = [f"version {i}\n" for i in range(HASHES_PER_KEY + 2)]
+    for text in versions:
+        cache.put("ClusterIni", text)
+
+    kept = cache.advertise()["ClusterIni"]
+    assert kept == [config_hash(text) for text in reversed(versions)][:HASHES_PER_KEY]
+    assert cache.get(config_hash(versions[0])) is None
+    assert cache.get(config_hash(versions[-1])) == versions[-1]
+
+    # The index is read back by the next run
+    assert ConfigCache(cache.cache_dir).advertise() == cache.advertise()
@@ -0,0 +1,104 @@
+"""
+tests/test_handler_executor.py
+
+Checks that `KeyedExecutor` runs the tasks of a key one at a time in submission order, runs different keys in
+parallel, and blocks submitters once `max_pending` tasks are waiting.
+"""
+import threading
+import time
+
+import pytest
+
+from RankedDST.networking.handler_executor import KeyedExecutor, dispatch, match_key
+import RankedDST.networking.handler_executor as handler_executor
+
+
+@pytest.fixture
+def executor():
+    executor = KeyedExecutor(max_workers=4, max_pending=8, thread_name_prefix="test-handler", label="Test task")
+    yield executor
+    executor.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def test_tasks_of_a_key_run_in_order_one_at_a_time(executor):
+    ran: list[int] = []
+    running = 0
+    overlap = False
+    lock = threading.Lock()
+
+    def task(i: int) -> int:
+        nonlocal running, overlap
+        with lock:
+            running += 1
+            overlap = overlap or running > 1
+        time.sleep(0.005)
+        with lock:
+            ran.append(i)
+            running -= 1
+        return i
+
+    futures = [executor.submit("match:1", task, i) for i in range(8)]
+    assert [future.result(timeout=5) for future in futures] == list(range(8))
+    assert ran == list(range(8))
+    assert not overlap
+    assert executor.pending() == {}
+
+
+def test_different_keys_run_in_parallel(executor):
+    barrier = threading.Barrier(3, timeout=5)
+    futures = [executor.submit(f"match:{i}", barrier.wait) for i in range(3)]
+    # Each task only returns once all three are running at the same time
+    assert sorted(future.result(timeout=5) for future in futures) == [0, 1, 2]
+
+
+def test_failing_task_does_not_stop_its_key(executor):
+    def fail():
+        raise RuntimeError("boom")
+
+    failed = executor.submit("match:1", fail)
+    after = executor.submit("match:1", lambda: "ran")
+
+    with pytest.raises(RuntimeError):
+        failed.result(timeout=5)
+    assert after.result(timeout=5) == "ran"
+
+
+def test_submit_blocks_while_max_pending_tasks_wait():
+    executor = KeyedExecutor(max_workers=1, max_pending=2, thread_name_prefix="test-handler")
+    release = threading.Event()
+    executor.submit("match:1", release.wait)
+    executor.submit("match:1", lambda: None)
+
+    submitted = threading.Event()
+    def submit_third():
+        executor.submit("match:1", lambda: None).result(timeout=5)
+        submitted.set()
+
+    submitter = threading.Thread(target=submit_third, daemon=True)
+    submitter.start()
+    assert not submitted.wait(timeout=0.2)
+    assert executor.pending() == {"match:1": 1}
+
+    release.set()
+    assert submitted.wait(timeout=5)
+    submitter.join(timeout=5)
+    executor.pool.shutdown(wait=True)
+
+
+def test_dispatch_keys_handlers_by_match(monkeypatch, executor):
+    monkeypatch.setattr(handler_executor, "HANDLER_EXECUTOR", executor)
+    seen: list[tuple[str, dict]] = []
+    done = threading.Event()
+
+    @dispatch(match_key("match_id", default=lambda: 7))
+    def handler(data):
+        seen.append((threading.current_thread().name, data))
+        if len(seen) == 2:
+            done.set()
+
+    handler({"match_id": 3})
+    handler({})
+    assert done.wait(timeout=5)
+    assert all(name.startswith("test-handler") for name, _ in seen)
+    assert match_key("match_id")({"match_id": 3}) == "match:3"
+    assert match_key("match_id", default=lambda: 7)({}) == "match:7"
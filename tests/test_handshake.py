@@ -0,0 +1,109 @@
+"""
+tests/test_handshake.py
+
+Connects a socketio client to the stand-in backend of `benchmarks/standin_backend.py` with the app's combined
+auth payload and checks the single `connection_accepted` reply, including world files sent against the config
+hashes the client advertised.
+"""
+import hashlib
+import queue
+import threading
+
+import pytest
+import socketio
+from werkzeug.serving import make_server
+
+from benchmarks.standin_backend import NAMESPACE, create_standin, standin_api
+from RankedDST.networking.config_transfer import ENCODINGS, WORLD_CONFIG_KEYS, ConfigCache, decode_configs
+
+MATCH_ID = 12
+WORLD_FILES = {key: f"[{key}]\n" + "setting = value\n" * 100 for key in WORLD_CONFIG_KEYS}
+WORLD_FILES["ModOverrides"] = "return {}\n" # too small to be compressed
+
+
+@pytest.fixture
+def standin():
+    """
+    Serves the stand-in on a free local port. Returns its url.
+    """
+    sio = create_standin(match_id=MATCH_ID, world_files=WORLD_FILES)
+    server = make_server("127.0.0.1", 0, socketio.WSGIApp(sio, standin_api), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join(timeout=5)
+
+
+def handshake(url: str, auth: dict) -> tuple[str, dict]:
+    """
+    Connects with the auth payload and returns the backend's reply: the event and its payload.
+    """
+    replies: queue.Queue = queue.Queue()
+    client = socketio.Client(reconnection=False)
+    for event in ["connection_accepted", "connection_denied"]:
+        client.on(event, lambda data, event=event: replies.put((event, data)), namespace=NAMESPACE)
+
+    client.connect(url, namespaces=[NAMESPACE], auth=auth, transports=["polling"], wait_timeout=5)
+    try:
+        return replies.get(timeout=5)
+    finally:
+        client.disconnect()
+
+
+def app_auth(world_running: bool = False, config_hashes: dict | None = None) -> dict:
+    """
+    The auth payload `ConnectionManager._auth` builds.
+    """
+    return {
+        "proxy_secret_hash": hashlib.sha256(b"secret").hexdigest(),
+        "version": "1.0.0",
+        "resume": {"match_id": MATCH_ID, "match_state": "world_ready", "world_running": world_running},
+        "config_hashes": config_hashes or {},
+        "config_encodings": ENCODINGS,
+    }
+
+
+def test_reply_answers_version_and_resume_with_world_files(standin, tmp_path):
+    event, reply = handshake(standin, app_auth())
+
+    assert event == "connection_accepted"
+    assert reply["match_id"] == MATCH_ID
+    assert reply["version_ok"] is True
+
+    world_files = reply["world_files"]
+    assert world_files["MatchId"] == MATCH_ID
+    assert "zlib" in world_files["ClusterIni"]
+    assert world_files["ModOverrides"] == WORLD_FILES["ModOverrides"]
+
+    decoded = decode_configs(world_files, cache=ConfigCache(tmp_path / "config_cache"))
+    assert all(decoded[key] == WORLD_FILES[key] for key in WORLD_CONFIG_KEYS)
+
+
+def test_reply_leaves_out_world_files_of_a_running_world(standin):
+    event, reply = handshake(standin, app_auth(world_running=True))
+    assert event == "connection_accepted"
+    assert "world_files" not in reply
+
+
+def test_cached_configs_are_sent_as_references(standin, tmp_path):
+    cache = ConfigCache(tmp_path / "config_cache")
+    decode_configs(handshake(standin, app_auth())[1]["world_files"], cache=cache)
+
+    _, reply = handshake(standin, app_auth(config_hashes=cache.advertise()))
+    world_files = reply["world_files"]
+    assert all(set(world_files[key]) == {"ref"} for key in WORLD_CONFIG_KEYS)
+
+    decoded = decode_configs(world_files, cache=cache)
+    assert all(decoded[key] == WORLD_FILES[key] for key in WORLD_CONFIG_KEYS)
+
+
+def test_missing_secret_is_denied(standin):
+    event, _ = handshake(standin, {**app_auth(), "proxy_secret_hash": ""})
+    assert event == "connection_denied"
+
+
+def test_older_auth_payload_gets_no_version_ok(standin):
+    event, reply = handshake(standin, {"proxy_secret_hash": hashlib.sha256(b"secret").hexdigest()})
+    assert event == "connection_accepted"
+    assert reply["version_ok"] is False
@@ -0,0 +1,143 @@
+"""
+tests/test_mod_cache.py
+
+Runs `prefetch_mods` against a fake nullrenderer that installs the mods of the setup file the way the dedicated server
+tools do, and checks when `is_cache_warm` lets the shards skip updating their mods.
+"""
+import stat
+import sys
+import textwrap
+import time
+
+import pytest
+
+import RankedDST.dedicated_server.mod_cache as mod_cache
+
+MOD_IDS = ["1234567", "7654321"]
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the fake nullrenderer is a script with a shebang")
+
+FAKE_NULLRENDERER = textwrap.dedent('''
+    import os
+    import re
+    import sys
+    import time
+
+    args = sys.argv[1:]
+    assert "-only_update_server_mods" in args
+    ugc_dir = args[args.index("-ugc_directory") + 1]
+    dedi_path = os.path.dirname(ugc_dir)
+
+    if os.environ.get("FAKE_DST_HANG"):
+        time.sleep(60)
+
+    with open(os.path.join(dedi_path, "mods", "dedicated_server_mods_setup.lua"), encoding="utf-8") as file:
+        mod_ids = re.findall(r'ServerModSetup\\("(\\d+)"\\)', file.read())
+
+    manifest = os.environ.get("FAKE_DST_MANIFEST", "111")
+    items = ""
+    for mod_id in mod_ids:
+        os.makedirs(os.path.join(ugc_dir, "content", "322330", mod_id), exist_ok=True)
+        items += f'"{mod_id}" {{ "size" "2048" "timeupdated" "1700000000" "manifest" "{manifest}" }}\\n'
+    with open(os.path.join(ugc_dir, "appworkshop_322330.acf"), "w", encoding="utf-8") as file:
+        file.write(f'"AppWorkshop" {{ "appid" "322330" "WorkshopItemsInstalled" {{ {items} }} }}')
+
+    print("Mods updated")
+    sys.exit(int(os.environ.get("FAKE_DST_EXIT", "0")))
+''')
+
+
+@pytest.fixture
+def dedi(tmp_path, monkeypatch):
+    """
+    Fake dedicated server tools with a mod cache record kept in the test's folder. Returns the tools path and the
+    fake nullrenderer.
+    """
+    data_dir = tmp_path / "ranked_dst"
+    data_dir.mkdir()
+    monkeypatch.setattr(mod_cache, "get_data_dir", lambda: str(data_dir))
+
+    dedi_path = tmp_path / "dedi"
+    (dedi_path / "bin").mkdir(parents=True)
+    (dedi_path / "mods").mkdir()
+
+    nullrender_fp = dedi_path / "bin" / "dontstarve_dedicated_server_nullrenderer"
+    nullrender_fp.write_text(f"#!{sys.executable}\n{FAKE_NULLRENDERER}", encoding="utf-8")
+    nullrender_fp.chmod(nullrender_fp.stat().st_mode | stat.S_IXUSR)
+    return str(dedi_path), str(nullrender_fp)
+
+
+def test_prefetch_installs_and_records_mods(dedi):
+    dedi_path, nullrender_fp = dedi
+    cache = mod_cache.prefetch_mods(MOD_IDS, dedi_path=dedi_path, nullrender_fp=nullrender_fp)
+
+    assert sorted(cache) == MOD_IDS
+    assert all(mod.installed and mod.manifest == "111" and mod.size == 2048 for mod in cache.values())
+
+    record = mod_cache.load_cache_record()
+    assert record["returncode"] == 0
+    assert record["dedi_path"] == dedi_path
+    assert sorted(record["mods"]) == MOD_IDS
+    assert mod_cache.is_cache_warm(dedi_path, MOD_IDS)
+
+
+def test_cache_is_cold_without_a_prefetch(dedi):
+    dedi_path, _ = dedi
+    assert not mod_cache.is_cache_warm(dedi_path, MOD_IDS)
+
+
+def test_failed_prefetch_leaves_the_cache_cold(dedi, monkeypatch):
+    dedi_path, nullrender_fp = dedi
+    monkeypatch.setenv("FAKE_DST_EXIT", "1")
+    cache = mod_cache.prefetch_mods(MOD_IDS, dedi_path=dedi_path, nullrender_fp=nullrender_fp)
+
+    # The folders exist, but the update did not succeed
+    assert all(mod.installed for mod in cache.values())
+    assert mod_cache.load_cache_record()["returncode"] == 1
+    assert not mod_cache.is_cache_warm(dedi_path, MOD_IDS)
+
+
+def test_old_prefetch_leaves_the_cache_cold(dedi):
+    dedi_path, nullrender_fp = dedi
+    mod_cache.prefetch_mods(MOD_IDS, dedi_path=dedi_path, nullrender_fp=nullrender_fp)
+
+    later = time.time() + mod_cache.CACHE_MAX_AGE + 1
+    assert mod_cache.is_cache_warm(dedi_path, MOD_IDS, now=time.time())
+    assert not mod_cache.is_cache_warm(dedi_path, MOD_IDS, now=later)
+
+
+def test_mod_outside_the_prefetch_leaves_the_cache_cold(dedi):
+    dedi_path, nullrender_fp = dedi
+    mod_cache.prefetch_mods(MOD_IDS[:1], dedi_path=dedi_path, nullrender_fp=nullrender_fp)
+
+    assert mod_cache.is_cache_warm(dedi_path, MOD_IDS[:1])
+    assert not mod_cache.is_cache_warm(dedi_path, MOD_IDS)
+
+
+def test_updated_mod_leaves_the_cache_cold(dedi):
+    dedi_path, nullrender_fp = dedi
+    mod_cache.prefetch_mods(MOD_IDS, dedi_path=dedi_path, nullrender_fp=nullrender_fp)
+
+    # The shards of a match updated the mods since the prefetch
+    acf_fp = mod_cache.get_ugc_path(dedi_path) / "appworkshop_322330.acf"
+    acf_fp.write_text(acf_fp.read_text(encoding="utf-8").replace('"111"', '"222"'), encoding="utf-8")
+    assert not mod_cache.is_cache_warm(dedi_path, MOD_IDS)
+
+
+def test_prefetch_of_other_tools_leaves_the_cache_cold(dedi, tmp_path):
+    dedi_path, nullrender_fp = dedi
+    mod_cache.prefetch_mods(MOD_IDS, dedi_path=dedi_path, nullrender_fp=nullrender_fp)
+    assert not mod_cache.is_cache_warm(str(tmp_path / "other_dedi"), MOD_IDS)
+
+
+def test_prefetch_is_killed_after_the_timeout(dedi, monkeypatch):
+    dedi_path, nullrender_fp = dedi
+    monkeypatch.setenv("FAKE_DST_HANG", "1")
+
+    start = time.perf_counter()
+    cache = mod_cache.prefetch_mods(MOD_IDS, dedi_path=dedi_path, nullrender_fp=nullrender_fp, timeout=1)
+
+    assert time.perf_counter() - start < 10
+    assert not any(mod.installed for mod in cache.values())
+    assert mod_cache.load_cache_record()["returncode"] != 0
+    assert not mod_cache.is_cache_warm(dedi_path, MOD_IDS)
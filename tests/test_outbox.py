@@ -0,0 +1,169 @@
+"""
+tests/test_outbox.py
+
+Drives `EventOutbox` with a fake socketio client that acknowledges, drops or times out each call, and checks the
+ack, flush and persist cycle.
+"""
+import json
+import threading
+import time
+from dataclasses import asdict
+
+import pytest
+import socketio
+
+import RankedDST.networking.outbox as outbox
+from RankedDST.networking.outbox import EventOutbox
+
+SECRET_HASH = "f" * 64
+
+
+class FakeClient:
+    """
+    Stands in for `socketio.Client`. Every call is recorded, and unless the client is offline the backend
+    acknowledges it.
+    """
+    def __init__(self, online: bool = True):
+        self.online = online
+        self.connected = True
+        self.calls: list[tuple[str, dict]] = []
+        self.acked = threading.Condition()
+
+    def call(self, event, data=None, namespace=None, timeout=None):
+        with self.acked:
+            self.calls.append((event, data))
+            self.acked.notify_all()
+        if not self.online:
+            raise socketio.exceptions.TimeoutError()
+        return {"ok": True}
+
+    def wait_for_calls(self, count: int, timeout: float = 5.0) -> list[tuple[str, dict]]:
+        with self.acked:
+            assert self.acked.wait_for(lambda: len(self.calls) >= count, timeout=timeout), self.calls
+            return list(self.calls)
+
+
+def wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(outbox, "RETRY_INTERVAL", 0.05)
+
+
+@pytest.fixture
+def persist_path(tmp_path):
+    return tmp_path / outbox.OUTBOX_FILE_NAME
+
+
+def read_persisted(persist_path) -> list[dict]:
+    with open(persist_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def test_events_queued_while_disconnected_are_flushed_in_order(persist_path):
+    box = EventOutbox(persist_path=persist_path)
+    box.emit("generating_world", {"match_id": 1})
+    box.emit("world_generated", {"match_id": 1})
+    box.emit("world_left", {"match_id": 1})
+    assert box.pending() == ["generating_world", "world_generated", "world_left"]
+
+    client = FakeClient()
+    box.connected(client, secret_hash=SECRET_HASH)
+    calls = client.wait_for_calls(3)
+    wait_until(lambda: not box.pending())
+
+    assert [event for event, _ in calls] == ["generating_world", "world_generated", "world_left"]
+    assert all(data["proxy_secret_hash"] == SECRET_HASH and data["match_id"] == 1 for _, data in calls)
+    assert len({data["event_id"] for _, data in calls}) == 3
+    assert box.sent == 3
+    assert read_persisted(persist_path) == []
+
+
+def test_unacknowledged_event_is_retried_with_the_same_id(persist_path):
+    box = EventOutbox(persist_path=persist_path)
+    client = FakeClient(online=False)
+    box.connected(client, secret_hash=SECRET_HASH)
+    box.emit("world_left", {"match_id": 2})
+
+    calls = client.wait_for_calls(2)
+    assert box.pending() == ["world_left"]
+
+    client.online = True
+    wait_until(lambda: not box.pending())
+    assert len({data["event_id"] for _, data in client.calls}) == 1
+    assert box.sent == 1
+
+
+def test_critical_events_persist_without_the_secret_hash(persist_path):
+    box = EventOutbox(persist_path=persist_path)
+    box.emit("world_left", {"match_id": 3})
+    box.emit("world_left", {"match_id": 3})
+    box.emit("link_stats", {"rtt": 1}, critical=False)
+
+    persisted = read_persisted(persist_path)
+    assert [event["event"] for event in persisted] == ["world_left", "world_left"]
+    assert all("proxy_secret_hash" not in event["data"] for event in persisted)
+
+    # The next run sends them, with the hash of its own session
+    restarted = EventOutbox(persist_path=persist_path)
+    assert restarted.pending() == ["world_left", "world_left"]
+    client = FakeClient()
+    restarted.connected(client, secret_hash=SECRET_HASH)
+    calls = client.wait_for_calls(2)
+    assert [data["event_id"] for _, data in calls] == [event["event_id"] for event in persisted]
+    assert all(data["proxy_secret_hash"] == SECRET_HASH for _, data in calls)
+
+
+def test_secret_hash_of_older_versions_is_stripped(persist_path):
+    old = outbox.OutboxEvent(event="world_left", data={"match_id": 4, "proxy_secret_hash": "old"})
+    persist_path.write_text(json.dumps([asdict(old)]), encoding="utf-8")
+
+    box = EventOutbox(persist_path=persist_path)
+    assert box.events[0].data == {"match_id": 4}
+    assert "proxy_secret_hash" not in read_persisted(persist_path)[0]["data"]
+
+
+def test_only_repeated_non_critical_events_are_dropped(persist_path):
+    box = EventOutbox(persist_path=persist_path)
+    assert box.emit("world_left", {"match_id": 5}) is not None
+    assert box.emit("world_left", {"match_id": 5}) is not None
+    assert box.emit("link_stats", {"rtt": 1}, critical=False) is not None
+    assert box.emit("link_stats", {"rtt": 1}, critical=False) is None
+    assert box.pending() == ["world_left", "world_left", "link_stats"]
+
+
+def test_full_outbox_drops_non_critical_events_first(persist_path):
+    box = EventOutbox(persist_path=persist_path, max_events=3)
+    box.emit("generating_world", {"match_id": 6})
+    box.emit("link_stats", {"rtt": 1}, critical=False)
+    box.emit("world_generated", {"match_id": 6})
+    box.emit("world_left", {"match_id": 6})
+    assert box.pending() == ["generating_world", "world_generated", "world_left"]
+
+    box.emit("generating_world", {"match_id": 7})
+    assert box.pending() == ["world_generated", "world_left", "generating_world"]
+    assert box.dropped == 2
+
+
+def test_disconnect_holds_events_until_the_next_connection(persist_path):
+    box = EventOutbox(persist_path=persist_path)
+    first = FakeClient()
+    box.connected(first, secret_hash=SECRET_HASH)
+    box.emit("generating_world", {"match_id": 8})
+    first.wait_for_calls(1)
+    wait_until(lambda: not box.pending())
+
+    box.disconnected()
+    box.emit("world_generated", {"match_id": 8})
+    time.sleep(0.2)
+    assert len(first.calls) == 1
+    assert box.pending() == ["world_generated"]
+
+    second = FakeClient()
+    box.connected(second, secret_hash=SECRET_HASH)
+    assert [event for event, _ in second.wait_for_calls(1)] == ["world_generated"]